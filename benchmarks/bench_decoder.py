@@ -0,0 +1,141 @@
+"""Compares the shared decoder against the previous per-module parsing
+
+Run from the repository root:
+
+    python -m benchmarks.bench_decoder
+"""
+import json
+import timeit
+from datetime import datetime, timedelta
+from pymailtm import decoder
+from pymailtm.models.common import View, Search, Mapping
+from pymailtm.models.messages import To, From, Message, Messages
+
+PAGE_SIZE = 30
+ROUNDS = 2000
+
+
+def make_page(size: int = PAGE_SIZE) -> bytes:
+    start = datetime(2022, 5, 1, 10, 0, 0)
+    members = []
+    for i in range(size):
+        created = (start + timedelta(minutes=i)).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+        members.append({
+            '@id': f'/messages/m{i}',
+            '@type': 'Message',
+            'id': f'm{i}',
+            'accountId': '/accounts/a1',
+            'msgid': f'<m{i}@example.com>',
+            'from': {'name': 'Sender', 'address': 'sender@example.com'},
+            'to': [{'name': 'User', 'address': 'user@example.com'}],
+            'subject': f'Message {i}',
+            'intro': 'Hello there, this is the start of the message',
+            'seen': False,
+            'isDeleted': False,
+            'hasAttachments': False,
+            'size': 2048,
+            'downloadUrl': f'/messages/m{i}/download',
+            'createdAt': created,
+            'updatedAt': created,
+        })
+    return json.dumps({
+        '@context': '/contexts/Message',
+        '@id': '/messages',
+        '@type': 'hydra:Collection',
+        'hydra:member': members,
+        'hydra:totalItems': size * 3,
+        'hydra:view': {
+            '@id': '/messages?page=1',
+            '@type': 'hydra:PartialCollectionView',
+            'hydra:first': '/messages?page=1',
+            'hydra:last': '/messages?page=3',
+            'hydra:next': '/messages?page=2',
+        },
+        'hydra:search': {
+            '@type': 'hydra:IriTemplate',
+            'hydra:template': '/messages{?page}',
+            'hydra:variableRepresentation': 'BasicRepresentation',
+            'hydra:mapping': [{'@type': 'IriTemplateMapping', 'variable': 'page', 'property': None, 'required': False}],
+        },
+    }).encode()
+
+
+def legacy_message(member: dict) -> Message:
+    to_s = [To(name=_to.get('name'), address=_to.get('address')) for _to in member.get('to', [])]
+    return Message(
+        _id=member.get('@id'),
+        _type=member.get('@type'),
+        _context=member.get('@context'),
+        id=member.get('id'),
+        account_id=member.get('accountId'),
+        msg_id=member.get('msgid'),
+        to=to_s,
+        _from=From(
+            name=(member.get('from') or {}).get('name'),
+            address=(member.get('from') or {}).get('address')
+        ),
+        subject=member.get('subject'),
+        intro=member.get('intro'),
+        seen=member.get('seen'),
+        is_deleted=member.get('isDeleted'),
+        has_attachments=member.get('hasAttachments'),
+        size=member.get('size'),
+        download_url=member.get('downloadUrl'),
+        created_at=datetime.strptime(member.get('createdAt'), '%Y-%m-%dT%H:%M:%S+00:00'),
+        updated_at=datetime.strptime(member.get('updatedAt'), '%Y-%m-%dT%H:%M:%S+00:00')
+    )
+
+
+def legacy_messages(content: bytes) -> Messages:
+    response = json.loads(content)
+    return Messages(
+        member=[legacy_message(member) for member in response.get('hydra:member', [])],
+        total_items=response.get('hydra:totalItems', 0),
+        view=View(
+            _id=response.get('hydra:view', {}).get('@id'),
+            _type=response.get('hydra:view', {}).get('@type'),
+            first=response.get('hydra:view', {}).get('hydra:first'),
+            last=response.get('hydra:view', {}).get('hydra:last'),
+            previous=response.get('hydra:view', {}).get('hydra:previous'),
+            next=response.get('hydra:view', {}).get('hydra:next'),
+        ),
+        search=Search(
+            _type=response.get('hydra:search', {}).get('@type'),
+            template=response.get('hydra:search', {}).get('hydra:template'),
+            variable_representation=response.get('hydra:search', {}).get('hydra:variableRepresentation'),
+            mapping=[
+                Mapping(
+                    _type=mapping.get('@type'),
+                    variable=mapping.get('variable'),
+                    property=mapping.get('property'),
+                    required=mapping.get('required'),
+                )
+                for mapping in response.get('hydra:search', {}).get('hydra:mapping', [])
+            ],
+        ),
+    )
+
+
+def current_messages(content: bytes) -> Messages:
+    return decoder.parse_messages(decoder.loads(content))
+
+
+def main() -> None:
+    content = make_page()
+    assert legacy_messages(content) == current_messages(content)
+
+    print(f'{PAGE_SIZE} message page, orjson: {decoder.orjson is not None}')
+    legacy = min(timeit.repeat(lambda: legacy_messages(content), number=ROUNDS, repeat=5))
+    print(f'legacy   {legacy / ROUNDS * 1e6:8.1f} us/page')
+    current = min(timeit.repeat(lambda: current_messages(content), number=ROUNDS, repeat=5))
+    print(f'decoder  {current / ROUNDS * 1e6:8.1f} us/page  ({legacy / current:.1f}x)')
+    decoder.parse_datetime.cache_clear()
+    cold = min(timeit.repeat(
+        lambda: (decoder.parse_datetime.cache_clear(), current_messages(content)),
+        number=ROUNDS, repeat=5
+    ))
+    print(f'no cache {cold / ROUNDS * 1e6:8.1f} us/page  ({legacy / cold:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
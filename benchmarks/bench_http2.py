@@ -0,0 +1,119 @@
+"""Compares the HTTP/1.1 and HTTP/2 transports against the offline FakeMailTm server
+
+Threads send a mix of messages.getall, messages.get and sources.get,
+first through the default requests transport with and without response
+compression, then through an Http2Client speaking h2c with compression.
+For every transport it reports the throughput, the connections the
+server accepted and the body bytes it sent, as counted on the wire.
+
+Run from the repository root, HTTP/2 needs `pip install httpx[http2]`:
+
+    python -m benchmarks.bench_http2 --output before.json
+    python -m benchmarks.bench_http2 --output after.json --compare before.json
+
+With --compare the exit status is 1 when a metric regressed by more than
+--threshold percent.
+"""
+import sys
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from pymailtm import messages, misc, sources
+from pymailtm.client import MailTmClient
+from pymailtm.metrics import MetricsCollector
+from pymailtm.testing import FakeMailTm, h2
+
+try:
+    from pymailtm.http2 import Http2Client, httpx
+except ImportError:
+    httpx = None
+
+ADDRESS = 'bench@example.test'
+PASSWORD = 'bench'
+TEXT = 'Your verification code is 482913, it expires in ten minutes. ' * 20
+# metrics where a higher value is better, every other metric is a cost
+HIGHER_IS_BETTER = ('requests_per_second',)
+
+
+def open_client(name: str, fake: FakeMailTm, collector: MetricsCollector, threads: int) -> MailTmClient:
+    if name == 'http2':
+        return Http2Client(base_url=fake.url, h2c=True, max_connections=threads, hooks=[collector])
+    return MailTmClient(base_url=fake.url, pool_maxsize=threads, hooks=[collector])
+
+
+def run_transport(name: str, fake: FakeMailTm, token: str, options: argparse.Namespace) -> dict:
+    ids = [message['id'] for message in fake.messages[fake.account_id(ADDRESS)]]
+    calls = itertools.cycle((
+        lambda client, id: messages.getall(1, token, client=client),
+        lambda client, id: messages.get(id, token, client=client),
+        lambda client, id: sources.get(id, token, client=client),
+    ))
+    work = [(next(calls), ids[i % len(ids)]) for i in range(options.requests)]
+    fake.compression = name != 'http1'
+    collector = MetricsCollector()
+    connections, sent = fake.connections, fake.bytes_sent
+    with open_client(name, fake, collector, options.threads) as client:
+        with ThreadPoolExecutor(options.threads) as executor:
+            start = time.perf_counter()
+            list(executor.map(lambda item: item[0](client, item[1]), work))
+            elapsed = time.perf_counter() - start
+        version = getattr(client, 'http_version', 'HTTP/1.1')
+    received = sum(stats.bytes_received for stats in collector.endpoints())
+    return {
+        'requests_per_second': options.requests / elapsed,
+        'connections': fake.connections - connections,
+        'bytes_sent': fake.bytes_sent - sent,
+        'bytes_received': received,
+        'bytes_per_request': received / options.requests,
+    }, version
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1500, help='requests per transport')
+    parser.add_argument('--threads', type=int, default=16, help='threads sending them')
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds the server waits before answering')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='a previous JSON result to compare with')
+    parser.add_argument('--threshold', type=float, default=10, help='percent change counted as a regression')
+    options = parser.parse_args()
+
+    results = {}
+    with FakeMailTm(latency=options.latency, seed=0, http2=h2 is not None) as fake:
+        fake.create_account(ADDRESS, PASSWORD)
+        fake.deliver(ADDRESS, text=TEXT, count=fake.page_size)
+        with MailTmClient(base_url=fake.url) as client:
+            token = misc.get_token(ADDRESS, PASSWORD, client=client).token
+        for name in ('http1', 'http1_compressed', 'http2'):
+            if name == 'http2' and (httpx is None or h2 is None):
+                print(f'{name:<18} skipped, httpx[http2] is not installed')
+                continue
+            results[name], version = run_transport(name, fake, token, options)
+            print(f'{name:<18} {version:<9}' + '  '.join(f'{key} {value:,.1f}' for key, value in results[name].items()))
+
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump({'python': sys.version.split()[0], 'options': vars(options), 'results': results}, file, indent=2)
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file).get('results', {})
+        regressed = False
+        print()
+        for name, metrics in results.items():
+            for key, value in metrics.items():
+                before = baseline.get(name, {}).get(key)
+                if not before:
+                    continue
+                change = (value - before) / before * 100
+                worse = -change if key in HIGHER_IS_BETTER else change
+                flag = ' REGRESSION' if worse > options.threshold else ''
+                regressed = regressed or bool(flag)
+                print(f'  {name + "." + key:<40} {before:>12,.1f} -> {value:>12,.1f}  {change:+6.1f}%{flag}')
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
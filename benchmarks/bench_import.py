@@ -0,0 +1,101 @@
+"""Measures the import cost of the package, as a cold start pays it
+
+Every target is imported in a fresh interpreter under `python -X
+importtime`, and the cumulative time of the statement's own imports,
+excluding the interpreter's startup, is kept as the median of --runs
+runs. The heaviest imports of every target are listed with --top.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import --output before.json
+    python -m benchmarks.bench_import --output after.json --compare before.json
+
+With --compare the exit status is 1 when a target got slower by more
+than --threshold percent.
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+TARGETS = {
+    'package': 'import pymailtm',
+    'utils': 'from pymailtm.utils import generate_password',
+    'get_token': 'from pymailtm import get_token',
+    'domains': 'from pymailtm import domains',
+    'errors': 'from pymailtm import errors',
+    'aio': 'from pymailtm import AsyncMailTm',
+}
+
+
+def importtime(statement: str) -> list[tuple[int, int, str]]:
+    """Runs a statement in a fresh interpreter, returns its (self, cumulative, module) import times in µs"""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement], capture_output=True, text=True, check=True
+    )
+    lines = process.stderr.splitlines()
+    # the lines of the interpreter's startup end with `site`
+    start = next((i + 1 for i, line in enumerate(lines) if line.endswith('| site')), 0)
+    times = []
+    for line in lines[start:]:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        times.append((int(own), int(cumulative), module.rstrip()))
+    return times
+
+
+def measure(statement: str, runs: int) -> tuple[float, list]:
+    totals = []
+    for _ in range(runs):
+        times = importtime(statement)
+        # top level imports aren't indented, their cumulative times add up to the statement's
+        totals.append(sum(cumulative for _, cumulative, module in times if not module.startswith('  ')))
+    return statistics.median(totals) / 1000, times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=11, help='fresh interpreters per target')
+    parser.add_argument('--top', type=int, default=0, help='list the N heaviest imports of every target')
+    parser.add_argument('--only', nargs='+', choices=TARGETS, help='measure only these targets')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='a previous JSON result to compare with')
+    parser.add_argument('--threshold', type=float, default=20, help='percent change counted as a regression')
+    options = parser.parse_args()
+
+    results = {}
+    for name in options.only or TARGETS:
+        try:
+            milliseconds, times = measure(TARGETS[name], options.runs)
+        except subprocess.CalledProcessError as e:
+            print(f'{name:<10} failed: {e.stderr.strip().splitlines()[-1]}')
+            continue
+        results[name] = milliseconds
+        print(f'{name:<10} {milliseconds:8.1f} ms  {TARGETS[name]}')
+        for own, _, module in sorted(times, reverse=True)[:options.top]:
+            print(f'    {own / 1000:8.1f} ms  {module.strip()}')
+
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump({'python': sys.version.split()[0], 'runs': options.runs, 'results': results}, file, indent=2)
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file).get('results', {})
+        regressed = False
+        print()
+        for name, milliseconds in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            change = (milliseconds - before) / before * 100
+            flag = ' REGRESSION' if change > options.threshold else ''
+            regressed = regressed or bool(flag)
+            print(f'  {name:<10} {before:8.1f} -> {milliseconds:8.1f} ms  {change:+7.1f}%{flag}')
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Measures the memory kept by, and the time to decode, 100k messages
+
+Compares the previous `__dict__` dataclasses with eagerly built hydra
+metadata against the slotted models and the raw mode of `messages.getall`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_models
+"""
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+from pymailtm import decoder
+
+MESSAGES = 100_000
+PAGE_SIZE = 30
+
+
+@dataclass
+class LegacyView:
+    _id: str
+    _type: str
+    first: str
+    last: str
+    previous: str
+    next: str
+
+
+@dataclass
+class LegacyMapping:
+    _type: str
+    variable: str
+    property: str
+    required: bool
+
+
+@dataclass
+class LegacySearch:
+    _type: str
+    template: str
+    variable_representation: str
+    mapping: list[LegacyMapping]
+
+
+@dataclass
+class LegacyFrom:
+    name: str
+    address: str
+
+
+@dataclass
+class LegacyMessage:
+    _id: str
+    _type: str
+    _context: str
+    id: str
+    account_id: str
+    msg_id: str
+    _from: LegacyFrom
+    to: list
+    subject: str
+    intro: str
+    seen: bool
+    is_deleted: bool
+    has_attachments: bool
+    size: int
+    download_url: str
+    created_at: datetime
+    updated_at: datetime
+
+
+@dataclass
+class LegacyMessages:
+    member: list
+    total_items: int
+    view: LegacyView
+    search: LegacySearch
+
+
+def legacy_message(member: dict) -> LegacyMessage:
+    return LegacyMessage(
+        _id=member.get('@id'),
+        _type=member.get('@type'),
+        _context=member.get('@context'),
+        id=member.get('id'),
+        account_id=member.get('accountId'),
+        msg_id=member.get('msgid'),
+        _from=LegacyFrom(**member.get('from')),
+        to=[LegacyFrom(**_to) for _to in member.get('to')],
+        subject=member.get('subject'),
+        intro=member.get('intro'),
+        seen=member.get('seen'),
+        is_deleted=member.get('isDeleted'),
+        has_attachments=member.get('hasAttachments'),
+        size=member.get('size'),
+        download_url=member.get('downloadUrl'),
+        created_at=datetime.strptime(member.get('createdAt'), '%Y-%m-%dT%H:%M:%S+00:00'),
+        updated_at=datetime.strptime(member.get('updatedAt'), '%Y-%m-%dT%H:%M:%S+00:00')
+    )
+
+
+def legacy_messages(response: dict) -> LegacyMessages:
+    view = response.get('hydra:view', {})
+    search = response.get('hydra:search', {})
+    return LegacyMessages(
+        member=[legacy_message(member) for member in response.get('hydra:member', [])],
+        total_items=response.get('hydra:totalItems', 0),
+        view=LegacyView(
+            view.get('@id'), view.get('@type'), view.get('hydra:first'),
+            view.get('hydra:last'), view.get('hydra:previous'), view.get('hydra:next')
+        ),
+        search=LegacySearch(
+            search.get('@type'), search.get('hydra:template'), search.get('hydra:variableRepresentation'),
+            [
+                LegacyMapping(mapping.get('@type'), mapping.get('variable'), mapping.get('property'), mapping.get('required'))
+                for mapping in search.get('hydra:mapping', [])
+            ]
+        ),
+    )
+
+
+def make_pages() -> list[bytes]:
+    start = datetime(2022, 5, 1, 10, 0, 0)
+    pages = []
+    for first in range(0, MESSAGES, PAGE_SIZE):
+        members = []
+        for i in range(first, min(first + PAGE_SIZE, MESSAGES)):
+            created = (start + timedelta(seconds=i)).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+            members.append({
+                '@id': f'/messages/m{i}',
+                '@type': 'Message',
+                'id': f'm{i}',
+                'accountId': '/accounts/a1',
+                'msgid': f'<m{i}@example.com>',
+                'from': {'name': 'Sender', 'address': 'sender@example.com'},
+                'to': [{'name': 'User', 'address': 'user@example.com'}],
+                'subject': f'Message {i}',
+                'intro': f'Hello there, this is the start of message {i}',
+                'seen': False,
+                'isDeleted': False,
+                'hasAttachments': False,
+                'size': 2048,
+                'downloadUrl': f'/messages/m{i}/download',
+                'createdAt': created,
+                'updatedAt': created,
+            })
+        page = first // PAGE_SIZE + 1
+        pages.append(json.dumps({
+            'hydra:member': members,
+            'hydra:totalItems': MESSAGES,
+            'hydra:view': {
+                '@id': f'/messages?page={page}',
+                '@type': 'hydra:PartialCollectionView',
+                'hydra:first': '/messages?page=1',
+                'hydra:next': f'/messages?page={page + 1}',
+            },
+            'hydra:search': {
+                '@type': 'hydra:IriTemplate',
+                'hydra:template': '/messages{?page}',
+                'hydra:variableRepresentation': 'BasicRepresentation',
+                'hydra:mapping': [{'@type': 'IriTemplateMapping', 'variable': 'page', 'property': None, 'required': False}],
+            },
+        }).encode())
+    return pages
+
+
+def measure(name: str, pages: list[bytes], parse: Callable[[dict], object]) -> None:
+    decoder.parse_datetime.cache_clear()
+    gc.collect()
+    start = time.perf_counter()
+    kept = [parse(decoder.loads(page)) for page in pages]
+    elapsed = time.perf_counter() - start
+    del kept
+    decoder.parse_datetime.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    kept = [parse(decoder.loads(page)) for page in pages]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:<10} {current / 2**20:8.1f} MiB  {current / MESSAGES:6.0f} B/message  {elapsed:6.2f} s to decode')
+    del kept
+
+
+def main() -> None:
+    pages = make_pages()
+    print(f'{MESSAGES} messages in pages of {PAGE_SIZE}, orjson: {decoder.orjson is not None}')
+    measure('legacy', pages, legacy_messages)
+    measure('slotted', pages, decoder.parse_messages)
+    measure('raw', pages, decoder.parse_raw_messages)
+
+
+if __name__ == '__main__':
+    main()
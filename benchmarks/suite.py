@@ -0,0 +1,271 @@
+"""Benchmarks the clients against the offline FakeMailTm server
+
+Measures requests per second and p50/p99 latency of the sync and async
+clients, the cost of retries, the delivery latency of the message
+stream, and the decode time and memory per message. Everything runs on
+localhost with fixed sizes and seeds, so results of two commits on the
+same machine can be compared.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --output after.json --compare before.json
+
+With --compare the exit status is 1 when a metric regressed by more than
+--threshold percent.
+"""
+import gc
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import threading
+import subprocess
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable
+from pymailtm import decoder, messages, misc
+from pymailtm.client import MailTmClient
+from pymailtm.metrics import MetricsCollector
+from pymailtm.ratelimit import RetryPolicy
+from pymailtm.stream import MessageStream
+from pymailtm.testing import FakeMailTm
+
+try:
+    from pymailtm.aio import AsyncMailTm, httpx
+except ImportError:
+    httpx = None
+
+ADDRESS = 'bench@example.test'
+PASSWORD = 'bench'
+# metrics where a higher value is better, every other metric is a cost
+HIGHER_IS_BETTER = ('requests_per_second',)
+
+
+def percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def latency_stats(samples: list[float], elapsed: float) -> dict:
+    return {
+        'requests': len(samples),
+        'requests_per_second': len(samples) / elapsed,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+    }
+
+
+def timed(call: Callable[[], object], samples: list[float]) -> None:
+    start = time.perf_counter()
+    call()
+    samples.append(time.perf_counter() - start)
+
+
+def run_threads(call: Callable[[], object], requests: int, threads: int) -> dict:
+    samples: list[float] = []
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda _: timed(call, samples), range(threads)))
+        start = time.perf_counter()
+        samples.clear()
+        list(executor.map(lambda _: timed(call, samples), range(requests)))
+        elapsed = time.perf_counter() - start
+    return latency_stats(samples, elapsed)
+
+
+def bench_sync_list(fake: FakeMailTm, token: str, options: argparse.Namespace) -> dict:
+    with MailTmClient(base_url=fake.url, pool_maxsize=options.threads) as client:
+        return run_threads(lambda: messages.getall(1, token, client=client), options.requests, options.threads)
+
+
+def bench_sync_get(fake: FakeMailTm, token: str, options: argparse.Namespace) -> dict:
+    id = fake.messages[fake.account_id(ADDRESS)][0]['id']
+    with MailTmClient(base_url=fake.url, pool_maxsize=options.threads) as client:
+        return run_threads(lambda: messages.get(id, token, client=client), options.requests, options.threads)
+
+
+def bench_sync_retry(fake: FakeMailTm, token: str, options: argparse.Namespace) -> dict:
+    collector = MetricsCollector()
+    retry = RetryPolicy(retries=5, backoff=0.001, max_backoff=0.01)
+    fake.error_rate = 0.1
+    try:
+        with MailTmClient(base_url=fake.url, pool_maxsize=options.threads, retry=retry, hooks=[collector]) as client:
+            result = run_threads(lambda: messages.getall(1, token, client=client), options.requests, options.threads)
+    finally:
+        fake.error_rate = 0
+    stats = collector.endpoint('GET', '/messages')
+    result['retries'] = stats.retries
+    return result
+
+
+def bench_async_list(fake: FakeMailTm, token: str, options: argparse.Namespace) -> dict:
+    async def main() -> dict:
+        samples: list[float] = []
+        semaphore = asyncio.Semaphore(options.threads)
+
+        async def call() -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                await client.get_messages(1, token)
+                samples.append(time.perf_counter() - start)
+
+        async with AsyncMailTm(base_url=fake.url, max_connections=options.threads) as client:
+            await asyncio.gather(*(call() for _ in range(options.threads)))
+            samples.clear()
+            start = time.perf_counter()
+            await asyncio.gather(*(call() for _ in range(options.requests)))
+            return latency_stats(samples, time.perf_counter() - start)
+
+    return asyncio.run(main())
+
+
+def bench_stream(fake: FakeMailTm, token: str, options: argparse.Namespace) -> dict:
+    account_id = fake.account_id(ADDRESS)
+    received: dict[str, float] = {}
+    arrived = threading.Condition()
+    with MailTmClient(base_url=fake.url) as client:
+        stream = MessageStream(account_id, token, hub_url=fake.hub_url, client=client)
+
+        def follow() -> None:
+            for message in stream:
+                with arrived:
+                    received[message.id] = time.perf_counter()
+                    arrived.notify_all()
+
+        thread = threading.Thread(target=follow, daemon=True)
+        thread.start()
+        while fake.subscribers() == 0:
+            time.sleep(0.01)
+        samples = []
+        for _ in range(options.deliveries):
+            sent = time.perf_counter()
+            id = fake.deliver(ADDRESS)[0]['id']
+            with arrived:
+                arrived.wait_for(lambda: id in received, timeout=5)
+            if id in received:
+                samples.append(received[id] - sent)
+        stream.close()
+        thread.join(5)
+    return {
+        'deliveries': len(samples),
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+    }
+
+
+def bench_decode(fake: FakeMailTm, token: str, options: argparse.Namespace) -> dict:
+    with MailTmClient(base_url=fake.url) as client:
+        page = client.get('/messages', params={'page': 1}, headers={'Authorization': f'Bearer {token}'}).content
+    result = {}
+    for name, parse in (('parse_messages', decoder.parse_messages), ('parse_raw_messages', decoder.parse_raw_messages)):
+        decoder.parse_datetime.cache_clear()
+        rounds = options.decode_rounds
+        start = time.perf_counter()
+        for _ in range(rounds):
+            parse(decoder.loads(page))
+        result[f'{name}_us_per_page'] = (time.perf_counter() - start) / rounds * 1e6
+
+    pages = options.memory_messages // fake.page_size
+    gc.collect()
+    tracemalloc.start()
+    kept = [decoder.parse_messages(decoder.loads(page)) for _ in range(pages)]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result['bytes_per_message'] = current / (pages * fake.page_size)
+    del kept
+    return result
+
+
+SCENARIOS = {
+    'sync_list': bench_sync_list,
+    'sync_get': bench_sync_get,
+    'sync_retry': bench_sync_retry,
+    'async_list': bench_async_list,
+    'stream': bench_stream,
+    'decode': bench_decode,
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options: argparse.Namespace) -> dict:
+    results = {}
+    with FakeMailTm(latency=options.latency, seed=0) as fake:
+        fake.create_account(ADDRESS, PASSWORD)
+        fake.deliver(ADDRESS, count=fake.page_size)
+        with MailTmClient(base_url=fake.url) as client:
+            token = misc.get_token(ADDRESS, PASSWORD, client=client).token
+        for name in options.only or SCENARIOS:
+            if name == 'async_list' and httpx is None:
+                print(f'{name:<12} skipped, httpx is not installed')
+                continue
+            results[name] = SCENARIOS[name](fake, token, options)
+            print(f'{name:<12} ' + '  '.join(f'{key} {value:,.1f}' for key, value in results[name].items()))
+    return {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'orjson': decoder.orjson is not None,
+        'options': vars(options),
+        'results': results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> bool:
+    """Prints the change of every metric, returns True when one regressed beyond threshold percent"""
+    regressed = False
+    print(f'\ncompared with {baseline.get("commit")} ({baseline.get("date")})')
+    for name, metrics in report['results'].items():
+        for key, value in metrics.items():
+            before = baseline.get('results', {}).get(name, {}).get(key)
+            if not before or key in ('requests', 'deliveries', 'retries'):
+                continue
+            change = (value - before) / before * 100
+            worse = -change if key in HIGHER_IS_BETTER else change
+            flag = ' REGRESSION' if worse > threshold else ''
+            regressed = regressed or bool(flag)
+            print(f'  {name + "." + key:<40} {before:>12,.1f} -> {value:>12,.1f}  {change:+6.1f}%{flag}')
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='requests per throughput scenario')
+    parser.add_argument('--threads', type=int, default=8, help='threads, or concurrent tasks, sending them')
+    parser.add_argument('--latency', type=float, default=0, help='seconds the server waits before answering')
+    parser.add_argument('--deliveries', type=int, default=200, help='messages sent through the stream')
+    parser.add_argument('--decode-rounds', type=int, default=2000, help='pages decoded per decoder')
+    parser.add_argument('--memory-messages', type=int, default=30000, help='messages kept to measure memory')
+    parser.add_argument('--only', nargs='+', choices=SCENARIOS, help='run only these scenarios')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='a previous JSON result to compare with')
+    parser.add_argument('--threshold', type=float, default=10, help='percent change counted as a regression')
+    options = parser.parse_args()
+
+    report = run(options)
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+        if compare(report, baseline, options.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
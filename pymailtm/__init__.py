@@ -1,5 +1,44 @@
+import importlib
+from typing import TYPE_CHECKING
+
 BASE_URL = 'https://api.mail.tm'
+MERCURE_URL = 'https://mercure.mail.tm/.well-known/mercure'
 SUCCESS_CODES = [200, 201, 202, 203, 204]
 
-from .models import errors
-from .misc import get_token
+# Imported on first access, so that `import pymailtm` and its light modules
+# like `utils` don't pay for requests, httpx and the models
+_LAZY = {
+    'errors': ('pymailtm.models.errors', None),
+    'accounts': ('pymailtm.accounts', None),
+    'domains': ('pymailtm.domains', None),
+    'messages': ('pymailtm.messages', None),
+    'sources': ('pymailtm.sources', None),
+    'get_token': ('pymailtm.misc', 'get_token'),
+    'MailTmClient': ('pymailtm.client', 'MailTmClient'),
+    'AsyncMailTm': ('pymailtm.aio', 'AsyncMailTm'),
+}
+
+__all__ = ['BASE_URL', 'MERCURE_URL', 'SUCCESS_CODES', *_LAZY]
+
+if TYPE_CHECKING:
+    from . import accounts, domains, messages, sources
+    from .aio import AsyncMailTm
+    from .client import MailTmClient
+    from .misc import get_token
+    from .models import errors
+
+
+def __getattr__(name: str):
+    try:
+        module, attribute = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}') from None
+    value = importlib.import_module(module)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY))
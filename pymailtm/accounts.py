@@ -1,25 +1,29 @@
 import json
-import requests
-from datetime import datetime
-from pymailtm import BASE_URL, SUCCESS_CODES
+from pymailtm import SUCCESS_CODES, decoder, messages
+from pymailtm.batch import ERRORS
+from pymailtm.client import MailTmClient, get_default_client
 from pymailtm.models.accounts import Account
+from pymailtm.models.batch import BatchReport, BatchResult
 from pymailtm.models.errors import (
     CannotCreateAccountError,
     CannotGetAccountInfoError,
     UnauthorizedError
 )
 
-def create(address: str, password: str) -> Account:
+
+def create(address: str, password: str, client: MailTmClient = None) -> Account:
     """Creates an Account resource 
 
     Args:
         address (str): The accounts address. Example user@example.com, The domain should be mail.tm's domain
         password (str): Account's password.
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
 
     Returns:
         Account: The account object
     """
-    url = BASE_URL + '/accounts'
+    client = client or get_default_client()
+    path = '/accounts'
     body = {
         'address': address,
         'password': password
@@ -28,8 +32,8 @@ def create(address: str, password: str) -> Account:
         'accept': 'application/ld+json',
         'Content-Type': 'application/ld+json',
     }
-    response = requests.post(
-        url=url, 
+    response = client.post(
+        path,
         data=json.dumps(body), 
         headers=headers
     )
@@ -40,40 +44,27 @@ def create(address: str, password: str) -> Account:
             full_response=response.text
         )
 
-    response = response.json()
-    return Account(
-        _context=response.get('@context'),
-        _id=response.get('@id'),
-        _type=response.get('@type'),
-        id=response.get('id'),
-        address=response.get('address'),
-        quota=response.get('quota'),
-        used=response.get('used'),
-        is_disabled=response.get('isDisabled'),
-        is_deleted=response.get('isDisabled'),
-        created_at=datetime.strptime(response.get(
-            'createdAt'), '%Y-%m-%dT%H:%M:%S+00:00'),
-        updated_at=datetime.strptime(response.get(
-            'updatedAt'), '%Y-%m-%dT%H:%M:%S+00:00')
-    )
+    return decoder.parse_account(decoder.json_body(response))
 
 
-def get(id: str, token: str) -> Account:
+def get(id: str, token: str, client: MailTmClient = None) -> Account:
     """Get an Account resource by its id
 
     Args:
         id (str): The account's id you want to get
         token (str): The account's auth Token
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
 
     Returns:
         Account: The account object
     """
-    url = BASE_URL + f'/accounts/{id}'
+    client = client or get_default_client()
+    path = f'/accounts/{id}'
     headers = {
         'Authorization': f'Bearer {token}',
         'accept': 'application/ld+json',
     }
-    response = requests.get(url, headers=headers)
+    response = client.get(path, headers=headers)
     if response.status_code not in SUCCESS_CODES:
         if response.status_code == 401:
             raise UnauthorizedError(
@@ -88,55 +79,71 @@ def get(id: str, token: str) -> Account:
                 full_response=response.text
             )
             
-    response = response.json()
-    return Account(
-        _context=response.get('@context'),
-        _id=response.get('@id'),
-        _type=response.get('@type'),
-        id=response.get('id'),
-        address=response.get('address'),
-        quota=response.get('quota'),
-        used=response.get('used'),
-        is_disabled=response.get('isDisabled'),
-        is_deleted=response.get('isDisabled'),
-        created_at=datetime.strptime(response.get(
-            'createdAt'), '%Y-%m-%dT%H:%M:%S+00:00'),
-        updated_at=datetime.strptime(response.get(
-            'updatedAt'), '%Y-%m-%dT%H:%M:%S+00:00')
-    )
+    return decoder.parse_account(decoder.json_body(response))
 
 
-def delete(id: str, token: str) -> bool:
+def delete(id: str, token: str, client: MailTmClient = None) -> bool:
     """Gets the account resource of the specified auth token
 
     Args:
         token (str): The account's auth Token
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
 
     Returns:
         bool: Returns True if success deleting account
     """
-    url = BASE_URL + f'/accounts/{id}'
+    client = client or get_default_client()
+    path = f'/accounts/{id}'
     headers = {
         'Authorization': f'Bearer {token}',
         'accept': 'application/ld+json',
     }
-    response = requests.delete(url, headers=headers)
+    response = client.delete(path, headers=headers)
     return response.status_code == 204
 
 
-def me(token: str):
+def delete_with_messages(id: str, token: str, concurrency: int = 8, client: MailTmClient = None) -> BatchReport:
+    """Deletes every Message of an account concurrently, then the account
+
+    The account is only deleted when every message could be, a failed
+    message is reported instead of stopping the others.
+
+    Args:
+        id (str): The account's id
+        token (str): The account's Bearer Token
+        concurrency (int, optional): Maximum delete requests in flight. Defaults to 8.
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+
+    Raises:
+        UnauthorizedError: When the token is invalid
+
+    Returns:
+        BatchReport: Per message results, followed by the account's result when it was attempted
+    """
+    report = messages.purge(token, concurrency=concurrency, client=client)
+    if report.ok:
+        try:
+            report.results.append(BatchResult(id=id, value=delete(id, token, client=client)))
+        except ERRORS as e:
+            report.results.append(BatchResult(id=id, error=e))
+    return report
+
+
+def me(token: str, client: MailTmClient = None):
     """Get an Account resource by its id
 
     Args:
         id (str): The account's id you want to get
         token (str): The account's Bearer Token
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
 
     Returns:
         Account: The account object
     """
-    url = BASE_URL + f'/me'
+    client = client or get_default_client()
+    path = f'/me'
     headers = {'Authorization': f'Bearer {token}'}
-    response = requests.get(url, headers=headers)
+    response = client.get(path, headers=headers)
     if response.status_code not in SUCCESS_CODES:
         raise CannotGetAccountInfoError(
             message='Cannot get account info', 
@@ -144,19 +151,4 @@ def me(token: str):
             full_response=response.text
         )
 
-    response = response.json()
-    return Account(
-        _context=response.get('@context'),
-        _id=response.get('@id'),
-        _type=response.get('@type'),
-        id=response.get('id'),
-        address=response.get('address'),
-        quota=response.get('quota'),
-        used=response.get('used'),
-        is_disabled=response.get('isDisabled'),
-        is_deleted=response.get('isDisabled'),
-        created_at=datetime.strptime(response.get(
-            'createdAt'), '%Y-%m-%dT%H:%M:%S+00:00'),
-        updated_at=datetime.strptime(response.get(
-            'updatedAt'), '%Y-%m-%dT%H:%M:%S+00:00')
-    )
+    return decoder.parse_account(decoder.json_body(response))
@@ -0,0 +1,500 @@
+import os
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Iterable, Sequence
+from pymailtm import BASE_URL, SUCCESS_CODES, domains, instrumentation, messages, sources
+from pymailtm.decoder import (
+    json_body,
+    parse_account,
+    parse_datetime,
+    parse_domain,
+    parse_domains,
+    parse_message,
+    parse_messages,
+    parse_raw_messages,
+    parse_source,
+    parse_token
+)
+from pymailtm.instrumentation import Hook
+from pymailtm.ratelimit import RetryPolicy, TokenBucket, check_rate_limit
+from pymailtm.models import Token
+from pymailtm.models.accounts import Account
+from pymailtm.models.batch import BatchReport, BatchResult
+from pymailtm.models.domains import Domain, Domains
+from pymailtm.models.messages import Message, Messages
+from pymailtm.models.sources import Download, Source
+from pymailtm.models.errors import (
+    MailTmError,
+    UnauthorizedError,
+    CannotGetTokenError,
+    CannotCreateAccountError,
+    CannotGetAccountInfoError,
+    CannotGetMessageError,
+    CannotMarkMessageAsReadError,
+    CannotDeleteMessageError,
+    CannotGetSourceError
+)
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+
+def _check(response, error: type, message: str, unauthorized: bool = True) -> None:
+    if response.status_code in SUCCESS_CODES:
+        return
+    if unauthorized and response.status_code == 401:
+        raise UnauthorizedError(
+            message='Invalid token',
+            status_code=response.status_code,
+            full_response=response.text
+        )
+    raise error(
+        message=message,
+        status_code=response.status_code,
+        full_response=response.text
+    )
+
+
+def _auth(token: str) -> dict:
+    return {
+        'Authorization': f'Bearer {token}',
+        'accept': 'application/ld+json',
+    }
+
+
+class AsyncMailTm:
+    """An asyncio client for the mail.tm API
+
+    Covers the same endpoints as the `accounts`, `domains`, `messages`,
+    `sources` modules and `get_token`, returning the same models. Requests
+    go through a pooled `httpx.AsyncClient`, install it with `pip install httpx`.
+    Like MailTmClient, requests wait for the limiter and are retried
+    according to the retry policy.
+
+    Args:
+        base_url (str, optional): The API root. Defaults to BASE_URL.
+        max_connections (int, optional): Maximum number of open connections. Defaults to 100.
+        max_keepalive_connections (int, optional): Maximum number of idle connections kept alive. Defaults to 20.
+        concurrency (int, optional): Default concurrency limit of the gather helpers. Defaults to 10.
+        timeout (float, optional): Timeout in seconds for every request. Defaults to 30.
+        limiter (TokenBucket, optional): A rate limiter, can be shared with other clients. Defaults to None, no limit.
+        retry (RetryPolicy, optional): The retry policy. Defaults to RetryPolicy().
+        hooks (Sequence[Hook], optional): Instrumentation hooks of this client, run after the ones of `instrumentation.add_hook`. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        concurrency: int = 10,
+        timeout: float = 30,
+        limiter: TokenBucket = None,
+        retry: RetryPolicy = None,
+        hooks: Sequence[Hook] = None
+    ) -> None:
+        if httpx is None:
+            raise ImportError('AsyncMailTm requires httpx, install it with `pip install httpx`')
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.limiter = limiter
+        self.retry = retry or RetryPolicy()
+        self.hooks = tuple(hooks or ())
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections
+            )
+        )
+
+    async def request(self, method: str, path: str, stream: bool = False, **kwargs) -> 'httpx.Response':
+        """Sends a request through the pooled connection
+
+        Args:
+            method (str): The HTTP method
+            path (str): The path relative to base_url, or an absolute url
+            stream (bool, optional): Return once the headers arrived, the caller reads the body and closes the response with `aclose`. Defaults to False.
+
+        Raises:
+            RateLimitError: When the server still answers 429 after the retries
+
+        Returns:
+            httpx.Response: The response
+        """
+        hooks = instrumentation.hooks + self.hooks if self.hooks else instrumentation.hooks
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                await self.limiter.acquire_async()
+            try:
+                if hooks:
+                    response = await self._send(hooks, method, path, attempt, stream, kwargs)
+                else:
+                    response = await self._http(method, path, stream, kwargs)
+            except httpx.TransportError:
+                if not self.retry.should_retry(method, attempt):
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if self.retry.should_retry(method, attempt, response.status_code):
+                delay = self.retry.delay(attempt, response)
+                if response.status_code == 429 and self.limiter is not None:
+                    self.limiter.pause(delay)
+                await response.aclose()
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            if stream and response.status_code not in SUCCESS_CODES:
+                # error bodies are small, read them so they can be reported
+                await response.aread()
+            check_rate_limit(response)
+            return response
+
+    async def _http(self, method: str, path: str, stream: bool, kwargs: dict) -> 'httpx.Response':
+        if not stream:
+            return await self.http.request(method, path, **kwargs)
+        return await self.http.send(self.http.build_request(method, path, **kwargs), stream=True)
+
+    async def _send(self, hooks: tuple, method: str, path: str, attempt: int, stream: bool, kwargs: dict) -> 'httpx.Response':
+        url = path if path.startswith('http') else self.base_url + path
+        info = instrumentation.start_request(hooks, method, path, url, attempt, kwargs)
+        try:
+            response = await self._http(method, path, stream, kwargs)
+        except Exception as e:
+            instrumentation.end_request(hooks, info, error=e)
+            raise
+        instrumentation.end_request(hooks, info, response, streamed=stream)
+        return response
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    async def __aenter__(self) -> 'AsyncMailTm':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    # misc
+
+    async def get_token(self, address: str, password: str) -> Token:
+        """Gets the accounts bearer token, see `misc.get_token`"""
+        response = await self.request(
+            'POST', '/token',
+            content=json.dumps({'address': address, 'password': password}),
+            headers={'content-type': 'application/ld+json'}
+        )
+        _check(response, CannotGetTokenError, 'Cannot get token', unauthorized=False)
+        return parse_token(json_body(response))
+
+    # accounts
+
+    async def create_account(self, address: str, password: str) -> Account:
+        """Creates an Account resource, see `accounts.create`"""
+        response = await self.request(
+            'POST', '/accounts',
+            content=json.dumps({'address': address, 'password': password}),
+            headers={
+                'accept': 'application/ld+json',
+                'Content-Type': 'application/ld+json',
+            }
+        )
+        _check(response, CannotCreateAccountError, 'Cannot create account', unauthorized=False)
+        return parse_account(json_body(response))
+
+    async def get_account(self, id: str, token: str) -> Account:
+        """Get an Account resource by its id, see `accounts.get`"""
+        response = await self.request('GET', f'/accounts/{id}', headers=_auth(token))
+        _check(response, CannotGetAccountInfoError, 'Cannot get account info')
+        return parse_account(json_body(response))
+
+    async def delete_account(self, id: str, token: str) -> bool:
+        """Deletes an Account resource, see `accounts.delete`"""
+        response = await self.request('DELETE', f'/accounts/{id}', headers=_auth(token))
+        return response.status_code == 204
+
+    async def me(self, token: str) -> Account:
+        """Gets the Account resource of the token, see `accounts.me`"""
+        response = await self.request('GET', '/me', headers={'Authorization': f'Bearer {token}'})
+        _check(response, CannotGetAccountInfoError, 'Cannot get account info', unauthorized=False)
+        return parse_account(json_body(response))
+
+    # domains
+
+    async def _cached_get(
+        self,
+        path: str,
+        parse: Callable[[dict], Any],
+        check: Callable[[Any], None],
+        use_cache: bool,
+        **kwargs
+    ) -> Any:
+        if not use_cache:
+            response = await self.request('GET', path, **kwargs)
+            check(response)
+            return parse(json_body(response))
+
+        key = (self.base_url, path, tuple(sorted(kwargs.get('params', {}).items())))
+        value = domains.cache.get(key)
+        if value is not None:
+            return domains._copy(value)
+
+        entry = domains.cache.peek(key)
+        headers = {**kwargs.pop('headers', {}), **domains._validators(entry)}
+        response = await self.request('GET', path, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            domains.cache.revalidated(key)
+            return domains._copy(entry.value)
+
+        check(response)
+        value = parse(json_body(response))
+        domains.cache.set(
+            key, value,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+        return domains._copy(value)
+
+    async def get_domains(self, page: int = 1, use_cache: bool = True) -> Domains:
+        """Returns a list of domains through `domains.cache`, see `domains.get`"""
+        return await self._cached_get(
+            '/domains', parse_domains, domains._check_domains, use_cache,
+            params={'page': page}
+        )
+
+    async def get_domain(self, id: str, token: str, use_cache: bool = True) -> Domain:
+        """Retreives a domain by its id through `domains.cache`, see `domains.get_by_id`"""
+        return await self._cached_get(
+            f'/domains/{id}', parse_domain, domains._check_domain, use_cache,
+            headers=_auth(token)
+        )
+
+    # messages
+
+    async def get_messages(self, page: int, token: str, raw: bool = False) -> Messages:
+        """Gets a page of Messages of the token, see `messages.getall`"""
+        response = await self.request('GET', '/messages', params={'page': page}, headers=_auth(token))
+        _check(response, CannotGetMessageError, 'Cannot get message')
+        parse = parse_raw_messages if raw else parse_messages
+        collection = parse(json_body(response))
+        messages.cache.observe(collection.member)
+        return collection
+
+    async def get_message(self, id: str, token: str, use_cache: bool = False) -> Message:
+        """Gets a Message by its id, see `messages.get`"""
+        if use_cache:
+            message = messages.cache.get_message(id)
+            if message is not None:
+                return message
+        response = await self.request('GET', f'/messages/{id}', headers=_auth(token))
+        _check(response, CannotGetMessageError, 'Cannot get message')
+        message = parse_message(json_body(response))
+        if use_cache:
+            messages.cache.set_message(message)
+        return message
+
+    async def delete_message(self, id: str, token: str) -> bool:
+        """Deletes a Message, see `messages.delete`"""
+        response = await self.request('DELETE', f'/messages/{id}', headers=_auth(token))
+        _check(response, CannotDeleteMessageError, 'Cannot delete the message')
+        messages.cache.invalidate(id)
+        return response.status_code == 204
+
+    async def mark_as_read(self, id: str, token: str) -> bool:
+        """Marks a Message as read, see `messages.mark_as_read`"""
+        response = await self.request('PATCH', f'/messages/{id}', headers=_auth(token))
+        _check(response, CannotMarkMessageAsReadError, 'Cannot mark as read')
+        body = json_body(response)
+        messages.cache.mark_seen(id, parse_datetime(body.get('updatedAt')))
+        return body.get('seen', False)
+
+    # sources
+
+    async def get_source(self, id: str, token: str, use_cache: bool = False) -> Source:
+        """Gets a Message's source, see `sources.get`"""
+        if use_cache:
+            source = messages.cache.get_source(id)
+            if source is not None:
+                return source
+        response = await self.request('GET', f'/sources/{id}', headers=_auth(token))
+        _check(response, CannotGetSourceError, 'Cannot get the source')
+        source = parse_source(json_body(response))
+        if use_cache:
+            messages.cache.set_source(source)
+        return source
+
+    async def download_source(
+        self,
+        download_url: str,
+        token: str,
+        sink,
+        chunk_size: int = 64 * 1024,
+        hash_name: str = None
+    ) -> Download:
+        """Streams a Message's raw .eml to a file or a binary sink, see `sources.download`"""
+        digest = hashlib.new(hash_name) if hash_name else None
+        size = 0
+        response = await self.request('GET', download_url, headers={'Authorization': f'Bearer {token}'}, stream=True)
+        try:
+            sources._check_download(response)
+            file, tmp, path = sources._open_sink(sink)
+            try:
+                async for chunk in response.aiter_bytes(chunk_size):
+                    file.write(chunk)
+                    size += len(chunk)
+                    if digest is not None:
+                        digest.update(chunk)
+            except BaseException:
+                if tmp is not None:
+                    file.close()
+                    os.remove(tmp)
+                raise
+            if tmp is not None:
+                file.close()
+                os.replace(tmp, path)
+        finally:
+            await response.aclose()
+
+        return Download(
+            path=path,
+            size=size,
+            digest=digest.hexdigest() if digest is not None else None
+        )
+
+    # fan-out
+
+    async def gather(
+        self,
+        func: Callable[..., Awaitable[Any]],
+        items: Iterable[Any],
+        *args,
+        concurrency: int = None,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> list:
+        """Runs `func(item, *args, **kwargs)` for every item with a bounded concurrency
+
+        Args:
+            func (Callable): The coroutine function to run, e.g. `client.me`
+            items (Iterable): The first argument of every call, usually tokens
+            concurrency (int, optional): Maximum calls in flight. Defaults to the client's concurrency.
+            return_exceptions (bool, optional): Return MailTmError instances instead of raising. Defaults to False.
+
+        Returns:
+            list: The results, in the same order as items
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def run(item):
+            async with semaphore:
+                try:
+                    return await func(item, *args, **kwargs)
+                except MailTmError as e:
+                    if return_exceptions:
+                        return e
+                    raise
+
+        return await asyncio.gather(*(run(item) for item in items))
+
+    async def get_messages_many(
+        self,
+        tokens: Iterable[str],
+        page: int = 1,
+        concurrency: int = None,
+        return_exceptions: bool = False
+    ) -> list:
+        """Gets a page of Messages for many tokens concurrently
+
+        Args:
+            tokens (Iterable[str]): The user bearer tokens
+            page (int, optional): The page number. Defaults to 1.
+            concurrency (int, optional): Maximum requests in flight. Defaults to the client's concurrency.
+            return_exceptions (bool, optional): Return MailTmError instances instead of raising. Defaults to False.
+
+        Returns:
+            list: The Messages of every token, in order
+        """
+        async def getall(token: str) -> Messages:
+            return await self.get_messages(page, token)
+
+        return await self.gather(
+            getall, tokens,
+            concurrency=concurrency,
+            return_exceptions=return_exceptions
+        )
+
+    async def get_tokens_many(
+        self,
+        credentials: Iterable[tuple],
+        concurrency: int = None,
+        return_exceptions: bool = False
+    ) -> list:
+        """Gets the bearer tokens of many `(address, password)` pairs concurrently
+
+        Args:
+            credentials (Iterable[tuple]): The address and password pairs
+            concurrency (int, optional): Maximum requests in flight. Defaults to the client's concurrency.
+            return_exceptions (bool, optional): Return MailTmError instances instead of raising. Defaults to False.
+
+        Returns:
+            list: The Tokens, in order
+        """
+        async def get_token(pair: tuple) -> Token:
+            return await self.get_token(*pair)
+
+        return await self.gather(
+            get_token, credentials,
+            concurrency=concurrency,
+            return_exceptions=return_exceptions
+        )
+
+    # batches
+
+    async def _run_many(self, func: Callable[..., Awaitable[Any]], ids: Iterable[str], *args, concurrency: int = None) -> BatchReport:
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def run(id: str) -> BatchResult:
+            async with semaphore:
+                try:
+                    return BatchResult(id=id, value=await func(id, *args))
+                except (MailTmError, httpx.TransportError) as e:
+                    return BatchResult(id=id, error=e)
+
+        return BatchReport(results=list(await asyncio.gather(*(run(id) for id in ids))))
+
+    async def mark_as_read_many(self, ids: Iterable[str], token: str, concurrency: int = None) -> BatchReport:
+        """Marks many Messages as read concurrently, see `messages.mark_as_read_many`"""
+        return await self._run_many(self.mark_as_read, ids, token, concurrency=concurrency)
+
+    async def delete_many(self, ids: Iterable[str], token: str, concurrency: int = None) -> BatchReport:
+        """Deletes many Messages concurrently, see `messages.delete_many`"""
+        return await self._run_many(self.delete_message, ids, token, concurrency=concurrency)
+
+    async def list_message_ids(self, token: str) -> list[str]:
+        """Lists the ids of every Message of the token's inbox, see `messages.list_ids`"""
+        ids: list[str] = []
+        page = 1
+        while page is not None:
+            collection = await self.get_messages(page, token, raw=True)
+            ids.extend(message.id for message in collection.member)
+            page = page + 1 if collection.member and collection.view.next else None
+        return ids
+
+    async def purge(self, token: str, concurrency: int = None) -> BatchReport:
+        """Deletes every Message of the token's inbox, see `messages.purge`"""
+        return await self.delete_many(await self.list_message_ids(token), token, concurrency=concurrency)
+
+    async def delete_account_with_messages(self, id: str, token: str, concurrency: int = None) -> BatchReport:
+        """Deletes every Message of an account, then the account, see `accounts.delete_with_messages`"""
+        report = await self.purge(token, concurrency=concurrency)
+        if report.ok:
+            report.results.extend((await self._run_many(self.delete_account, [id], token)).results)
+        return report
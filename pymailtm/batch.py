@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+import requests
+from pymailtm.models.batch import BatchReport, BatchResult
+from pymailtm.models.errors import MailTmError
+
+# Errors recorded in a result instead of stopping the batch
+ERRORS = (MailTmError, requests.RequestException)
+
+
+def run_many(func: Callable[..., Any], ids: Iterable[str], *args, concurrency: int = 8, **kwargs) -> BatchReport:
+    """Runs `func(id, *args, **kwargs)` for every id on a thread pool
+
+    A failing id doesn't stop the others, its error is kept in its result.
+    With the shared pooled client keep concurrency at most its pool_maxsize,
+    so every thread reuses a kept alive connection.
+
+    Args:
+        func (Callable): The endpoint function, e.g. `messages.delete`
+        ids (Iterable[str]): The first argument of every call
+        concurrency (int, optional): Maximum calls in flight. Defaults to 8.
+
+    Returns:
+        BatchReport: One result per id, in the same order as ids
+    """
+    def run(id: str) -> BatchResult:
+        try:
+            return BatchResult(id=id, value=func(id, *args, **kwargs))
+        except ERRORS as e:
+            return BatchResult(id=id, error=e)
+
+    ids = list(ids)
+    if not ids:
+        return BatchReport()
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(ids))) as pool:
+        return BatchReport(results=list(pool.map(run, ids)))
+
@@ -0,0 +1,365 @@
+import time
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Hashable, Iterable
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires: float
+    etag: str = None
+    last_modified: str = None
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires > time.monotonic()
+
+
+class TTLCache:
+    """A thread safe, size bounded LRU cache whose entries expire after a ttl
+
+    Expired entries are kept until evicted so they can be revalidated with
+    their ETag or Last-Modified validators.
+
+    Args:
+        maxsize (int, optional): Maximum number of entries. Defaults to 128.
+        ttl (float, optional): Seconds an entry stays fresh. Defaults to 600.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 600) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._data: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[Hashable, threading.Lock] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the fresh value of key, counting a hit or a miss
+
+        Args:
+            key (Hashable): The cache key
+
+        Returns:
+            Any: The value, or None when missing or expired
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry.fresh:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            return None
+
+    def peek(self, key: Hashable) -> CacheEntry:
+        """Returns the entry of key even if it expired, without touching the counters
+
+        Args:
+            key (Hashable): The cache key
+
+        Returns:
+            CacheEntry: The entry, or None
+        """
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key: Hashable, value: Any, etag: str = None, last_modified: str = None) -> None:
+        """Stores a value, evicting the least recently used entry when full
+
+        Args:
+            key (Hashable): The cache key
+            value (Any): The value
+            etag (str, optional): The response ETag. Defaults to None.
+            last_modified (str, optional): The response Last-Modified. Defaults to None.
+        """
+        entry = CacheEntry(value, time.monotonic() + self.ttl, etag, last_modified)
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted, _ = self._data.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+
+    def revalidated(self, key: Hashable) -> Any:
+        """Marks an expired entry as fresh again after a 304 response
+
+        Args:
+            key (Hashable): The cache key
+
+        Returns:
+            Any: The value, or None if it has been evicted meanwhile
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            entry.expires = time.monotonic() + self.ttl
+            self._data.move_to_end(key)
+            self.revalidations += 1
+            return entry.value
+
+    def lock(self, key: Hashable) -> threading.Lock:
+        """Returns a lock to serialise fetches of the same key
+
+        Args:
+            key (Hashable): The cache key
+
+        Returns:
+            threading.Lock: The key's lock
+        """
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._key_locks.clear()
+            self.hits = self.misses = self.revalidations = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+MESSAGE_CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache_entries (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    version TEXT,
+    value BLOB NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS cache_entries_stored ON cache_entries (stored_at);
+'''
+
+
+def _newest(a: datetime, b: datetime) -> datetime:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+class MessageCache:
+    """A bounded cache of Message details and Sources, versioned by updated_at
+
+    Entries are keyed by kind, 'message' or 'source', and message id, and
+    carry the `updated_at` of the message when they were stored. Listings
+    passed to `observe` record the latest `updated_at` of every message,
+    and an entry older than the latest version seen is dropped instead of
+    served. The memory tier is an LRU of `maxsize` entries, the optional
+    disk tier a SQLite file keeping the `disk_maxsize` newest entries,
+    pickled.
+
+    Args:
+        maxsize (int, optional): Maximum number of entries in memory. Defaults to 1024.
+        path (str, optional): A SQLite file for the disk tier. Defaults to None, memory only.
+        disk_maxsize (int, optional): Maximum number of entries on disk. Defaults to 100000.
+    """
+
+    def __init__(self, maxsize: int = 1024, path: str = None, disk_maxsize: int = 100_000) -> None:
+        self.maxsize = maxsize
+        self.path = path
+        self.disk_maxsize = disk_maxsize
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._data: OrderedDict[tuple, tuple] = OrderedDict()
+        self._versions: OrderedDict[str, datetime] = OrderedDict()
+        self._lock = threading.RLock()
+        self._stored = 0
+        self.db: sqlite3.Connection = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            with self.db:
+                self.db.executescript(MESSAGE_CACHE_SCHEMA)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _remember(self, id: str, version: datetime) -> None:
+        self._versions[id] = _newest(self._versions.get(id), version)
+        self._versions.move_to_end(id)
+        while len(self._versions) > self.maxsize * 8:
+            self._versions.popitem(last=False)
+
+    def observe(self, listing: Iterable) -> None:
+        """Records the `updated_at` of listed messages, entries older than it are no longer served
+
+        Args:
+            listing (Iterable[Message]): The members of a `messages.getall` page, raw or not
+        """
+        with self._lock:
+            for message in listing:
+                if message.updated_at is not None:
+                    self._remember(message.id, message.updated_at)
+
+    def _disk_get(self, kind: str, id: str) -> tuple:
+        row = self.db.execute(
+            'SELECT value, version FROM cache_entries WHERE kind = ? AND id = ?', (kind, id)
+        ).fetchone()
+        if row is None:
+            return None
+        version = datetime.fromisoformat(row[1]) if row[1] else None
+        return pickle.loads(row[0]), version
+
+    def get(self, kind: str, id: str, updated_at: datetime = None) -> Any:
+        """Returns a cached value, unless it is older than the latest version seen
+
+        Args:
+            kind (str): 'message' or 'source'
+            id (str): The message id
+            updated_at (datetime, optional): A version the entry must be at least as new as. Defaults to None.
+
+        Returns:
+            Any: The value, or None
+        """
+        key = (kind, id)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None and self.db is not None:
+                entry = self._disk_get(kind, id)
+                if entry is not None:
+                    self._store(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            required = _newest(self._versions.get(id), updated_at)
+            if required is not None and (entry[1] is None or entry[1] < required):
+                self._drop(key)
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _store(self, key: tuple, entry: tuple) -> None:
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _drop(self, key: tuple) -> None:
+        self._data.pop(key, None)
+        if self.db is not None:
+            with self.db:
+                self.db.execute('DELETE FROM cache_entries WHERE kind = ? AND id = ?', key)
+
+    def set(self, kind: str, id: str, value: Any, updated_at: datetime = None) -> None:
+        """Stores a value in memory and, when there is one, on disk
+
+        Args:
+            kind (str): 'message' or 'source'
+            id (str): The message id
+            value (Any): The Message or Source
+            updated_at (datetime, optional): The message's version. Defaults to the latest version seen.
+        """
+        key = (kind, id)
+        with self._lock:
+            if updated_at is not None:
+                version = updated_at
+                self._remember(id, updated_at)
+            else:
+                version = self._versions.get(id)
+            self._store(key, (value, version))
+            if self.db is None:
+                return
+            with self.db:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?)',
+                    (kind, id, version.isoformat() if version else None, pickle.dumps(value), time.time())
+                )
+                self._stored += 1
+                if self._stored % 1000 == 0:
+                    self.db.execute(
+                        'DELETE FROM cache_entries WHERE rowid IN '
+                        '(SELECT rowid FROM cache_entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+                        (self.disk_maxsize,)
+                    )
+
+    def get_message(self, id: str, updated_at: datetime = None) -> Any:
+        return self.get('message', id, updated_at)
+
+    def set_message(self, message: Any) -> None:
+        self.set('message', message.id, message, message.updated_at)
+
+    def get_source(self, id: str, updated_at: datetime = None) -> Any:
+        return self.get('source', id, updated_at)
+
+    def set_source(self, source: Any, updated_at: datetime = None) -> None:
+        self.set('source', source.id, source, updated_at)
+
+    def _entry(self, kind: str, id: str) -> tuple:
+        entry = self._data.get((kind, id))
+        if entry is None and self.db is not None:
+            entry = self._disk_get(kind, id)
+        return entry
+
+    def mark_seen(self, id: str, updated_at: datetime = None) -> None:
+        """Replaces a cached Message with a read copy after it was marked as read
+
+        The Message already returned to callers is left as is. Only the
+        seen flag changed, so a cached Source is kept and moved to the new
+        version too.
+
+        Args:
+            id (str): The message id
+            updated_at (datetime, optional): The new version, when the server returned it. Defaults to None.
+        """
+        with self._lock:
+            entry = self._entry('message', id)
+            if entry is not None:
+                message = replace(entry[0], seen=True, updated_at=_newest(entry[0].updated_at, updated_at))
+                self.set('message', id, message, _newest(entry[1], updated_at))
+            entry = self._entry('source', id)
+            if entry is not None and updated_at is not None:
+                self.set('source', id, entry[0], _newest(entry[1], updated_at))
+
+    def invalidate(self, id: str) -> None:
+        """Drops the Message and the Source of a message, e.g. after it was deleted
+
+        Args:
+            id (str): The message id
+        """
+        with self._lock:
+            self._versions.pop(id, None)
+            self._drop(('message', id))
+            self._drop(('source', id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+            self.hits = self.misses = self.stale = 0
+            if self.db is not None:
+                with self.db:
+                    self.db.execute('DELETE FROM cache_entries')
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self.db = None
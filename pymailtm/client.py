@@ -0,0 +1,162 @@
+import time
+import threading
+import requests
+from typing import Sequence
+from requests.adapters import HTTPAdapter
+from pymailtm import BASE_URL, instrumentation
+from pymailtm.instrumentation import Hook
+from pymailtm.ratelimit import RetryPolicy, TokenBucket, check_rate_limit
+
+
+class MailTmClient:
+    """A pooled HTTP client for the mail.tm API
+
+    Owns a single `requests.Session` so connections are kept alive and
+    reused between calls instead of doing a TCP and TLS handshake for
+    every request. Every request waits for the limiter, and 429, 5xx and
+    connection errors are retried according to the retry policy.
+
+    Args:
+        base_url (str, optional): The API root. Defaults to BASE_URL.
+        pool_connections (int, optional): Number of per-host connection pools to cache. Defaults to 10.
+        pool_maxsize (int, optional): Maximum number of connections kept per pool. Defaults to 10.
+        pool_block (bool, optional): Block instead of opening extra connections when the pool is full. Defaults to False.
+        timeout (float, optional): Default timeout in seconds for every request. Defaults to None.
+        limiter (TokenBucket, optional): A rate limiter, can be shared with other clients. Defaults to None, no limit.
+        retry (RetryPolicy, optional): The retry policy. Defaults to RetryPolicy(), pass RetryPolicy(retries=0) to disable.
+        hooks (Sequence[Hook], optional): Instrumentation hooks of this client, run after the ones of `instrumentation.add_hook`. Defaults to None.
+        session (requests.Session, optional): Another transport with the same interface, e.g. an `http2.Http2Session`, the pool options are then ignored. Defaults to a new pooled session.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        timeout: float = None,
+        limiter: TokenBucket = None,
+        retry: RetryPolicy = None,
+        hooks: Sequence[Hook] = None,
+        session: requests.Session = None
+    ) -> None:
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.limiter = limiter
+        self.retry = retry or RetryPolicy()
+        self.hooks = tuple(hooks or ())
+        if session is not None:
+            self.session = session
+            return
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Sends a request through the pooled session
+
+        Args:
+            method (str): The HTTP method
+            path (str): The path relative to base_url, or an absolute url
+
+        Raises:
+            RateLimitError: When the server still answers 429 after the retries
+
+        Returns:
+            requests.Response: The response
+        """
+        url = path if path.startswith('http') else self.base_url + path
+        kwargs.setdefault('timeout', self.timeout)
+        hooks = instrumentation.hooks + self.hooks if self.hooks else instrumentation.hooks
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                if hooks:
+                    response = self._send(hooks, method, path, url, attempt, kwargs)
+                else:
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not self.retry.should_retry(method, attempt):
+                    raise
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if self.retry.should_retry(method, attempt, response.status_code):
+                delay = self.retry.delay(attempt, response)
+                if response.status_code == 429 and self.limiter is not None:
+                    self.limiter.pause(delay)
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            check_rate_limit(response)
+            return response
+
+    def _send(self, hooks: tuple, method: str, path: str, url: str, attempt: int, kwargs: dict) -> requests.Response:
+        info = instrumentation.start_request(hooks, method, path, url, attempt, kwargs)
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception as e:
+            instrumentation.end_request(hooks, info, error=e)
+            raise
+        instrumentation.end_request(hooks, info, response, streamed=kwargs.get('stream', False))
+        return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def patch(self, path: str, **kwargs) -> requests.Response:
+        return self.request('PATCH', path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request('DELETE', path, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> 'MailTmClient':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_default_client: MailTmClient = None
+_default_lock = threading.Lock()
+
+
+def get_default_client() -> MailTmClient:
+    """Returns the client shared by the module level functions, creating it on first use
+
+    Returns:
+        MailTmClient: The default client
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_lock:
+            if _default_client is None:
+                _default_client = MailTmClient()
+    return _default_client
+
+
+def set_default_client(client: MailTmClient) -> None:
+    """Replaces the client shared by the module level functions
+
+    Args:
+        client (MailTmClient): The new default client
+    """
+    global _default_client
+    with _default_lock:
+        _default_client = client
@@ -0,0 +1,294 @@
+import json
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Union
+from pymailtm.models import Token
+from pymailtm.models.accounts import Account
+from pymailtm.models.common import Mapping, Search, View
+from pymailtm.models.domains import Domain, Domains
+from pymailtm.models.messages import From, To, Message, Messages
+from pymailtm.models.sources import Source
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_EMPTY: dict = {}
+
+
+def loads(content: Union[bytes, str]) -> Any:
+    """Decodes a JSON body, with orjson when it is installed
+
+    Args:
+        content (bytes | str): The response body
+
+    Returns:
+        Any: The decoded value
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def json_body(response) -> Any:
+    """Decodes the JSON body of a requests or httpx response
+
+    Args:
+        response: The response
+
+    Returns:
+        Any: The decoded value
+    """
+    return loads(response.content)
+
+
+@lru_cache(maxsize=4096)
+def parse_datetime(value: str) -> datetime:
+    """Parses an API timestamp into a naive UTC datetime
+
+    Timestamps repeat a lot within a page, so results are memoized.
+
+    Args:
+        value (str): An ISO 8601 timestamp, e.g. 2022-05-01T10:00:00+00:00
+
+    Returns:
+        datetime: The naive UTC datetime, or None
+    """
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+def parse_view(view: dict) -> View:
+    view = view or _EMPTY
+    return View(
+        _id=view.get('@id'),
+        _type=view.get('@type'),
+        first=view.get('hydra:first'),
+        last=view.get('hydra:last'),
+        previous=view.get('hydra:previous'),
+        next=view.get('hydra:next'),
+    )
+
+
+def parse_search(search: dict) -> Search:
+    """Decodes a `hydra:search` template
+
+    mail.tm sends `hydra:mapping` as a list of mappings, a single mapping
+    object is accepted too.
+
+    Args:
+        search (dict): The `hydra:search` dict, or None
+
+    Returns:
+        Search: The search template, with one Mapping per variable
+    """
+    search = search or _EMPTY
+    mappings = search.get('hydra:mapping') or ()
+    if isinstance(mappings, dict):
+        mappings = (mappings,)
+    return Search(
+        _type=search.get('@type'),
+        template=search.get('hydra:template'),
+        variable_representation=search.get('hydra:variableRepresentation'),
+        mapping=[
+            Mapping(
+                _type=mapping.get('@type'),
+                variable=mapping.get('variable'),
+                property=mapping.get('property'),
+                required=mapping.get('required'),
+            )
+            for mapping in mappings
+        ],
+    )
+
+
+def parse_collection(response: dict, parse_member: Callable[[dict], Any], collection: type, total_items: int = None) -> Any:
+    """Decodes a hydra collection in a single pass over the response
+
+    Args:
+        response (dict): The decoded body
+        parse_member (Callable[[dict], Any]): Decodes one `hydra:member` entry, e.g. parse_message or RawMessage
+        collection (type): The collection model, e.g. Messages
+        total_items (int, optional): The default of `hydra:totalItems`. Defaults to None.
+
+    Returns:
+        Any: The collection
+    """
+    return collection(
+        member=[parse_member(member) for member in response.get('hydra:member', ())],
+        total_items=response.get('hydra:totalItems', total_items),
+        view=parse_view(response.get('hydra:view')),
+        search=parse_search(response.get('hydra:search'))
+    )
+
+
+def parse_token(response: dict) -> Token:
+    return Token(
+        id=response.get('id'),
+        token=response.get('token')
+    )
+
+
+def parse_account(response: dict) -> Account:
+    return Account(
+        _context=response.get('@context'),
+        _id=response.get('@id'),
+        _type=response.get('@type'),
+        id=response.get('id'),
+        address=response.get('address'),
+        quota=response.get('quota'),
+        used=response.get('used'),
+        is_disabled=response.get('isDisabled'),
+        is_deleted=response.get('isDeleted'),
+        created_at=parse_datetime(response.get('createdAt')),
+        updated_at=parse_datetime(response.get('updatedAt'))
+    )
+
+
+def parse_domain(member: dict) -> Domain:
+    return Domain(
+        _id=member.get('@id'),
+        _type=member.get('@type'),
+        _context=member.get('@context'),
+        id=member.get('id'),
+        domain=member.get('domain'),
+        is_active=member.get('isActive'),
+        is_private=member.get('isPrivate'),
+        created_at=parse_datetime(member.get('createdAt')),
+        updated_at=parse_datetime(member.get('updatedAt'))
+    )
+
+
+def parse_domains(response: dict) -> Domains:
+    return parse_collection(response, parse_domain, Domains)
+
+
+@lru_cache(maxsize=4096)
+def _address(cls: type, name: str, address: str) -> From:
+    return cls(name=name, address=address)
+
+
+def _sender(value: dict) -> From:
+    value = value or _EMPTY
+    return _address(From, value.get('name'), value.get('address'))
+
+
+def _recipients(value: list) -> list[To]:
+    return [_address(To, _to.get('name'), _to.get('address')) for _to in value or ()]
+
+
+def parse_message(member: dict) -> Message:
+    return Message(
+        _id=member.get('@id'),
+        _type=member.get('@type'),
+        _context=member.get('@context'),
+        id=member.get('id'),
+        account_id=member.get('accountId'),
+        msg_id=member.get('msgid'),
+        to=_recipients(member.get('to')),
+        _from=_sender(member.get('from')),
+        subject=member.get('subject'),
+        intro=member.get('intro'),
+        seen=member.get('seen'),
+        is_deleted=member.get('isDeleted'),
+        has_attachments=member.get('hasAttachments'),
+        size=member.get('size'),
+        download_url=member.get('downloadUrl'),
+        created_at=parse_datetime(member.get('createdAt')),
+        updated_at=parse_datetime(member.get('updatedAt'))
+    )
+
+
+def parse_messages(response: dict) -> Messages:
+    return parse_collection(response, parse_message, Messages, total_items=0)
+
+
+def parse_source(response: dict) -> Source:
+    return Source(
+        _id=response.get('@id'),
+        _type=response.get('@type'),
+        _context=response.get('@context'),
+        id=response.get('id'),
+        download_url=response.get('downloadUrl'),
+        data=response.get('data'),
+    )
+
+
+# The hydra:member keys kept by RawMessage, in the order of the Message fields
+_RAW_KEYS = (
+    '@id', '@type', '@context', 'id', 'accountId', 'msgid', 'from', 'to', 'subject', 'intro', 'seen',
+    'isDeleted', 'hasAttachments', 'size', 'downloadUrl', 'createdAt', 'updatedAt',
+)
+_FROM = _RAW_KEYS.index('from')
+_TO = _RAW_KEYS.index('to')
+
+
+def _field(key: str, convert: Callable[[Any], Any] = None) -> property:
+    index = _RAW_KEYS.index(key)
+    if convert is None:
+        return property(lambda self: self._values[index])
+    return property(lambda self: convert(self._values[index]))
+
+
+class RawMessage:
+    """A Message view over the values of its JSON member
+
+    Only the sender and recipients are decoded up front, into the From and
+    To shared with the Message pages. The other values are kept as sent
+    and timestamps are parsed each time they are accessed, so a page
+    decodes faster when only a few fields are read, at slightly more
+    memory than a Message page for the timestamp strings. Use
+    `to_message` for a regular Message.
+
+    Args:
+        data (dict): One `hydra:member` entry of a messages page
+    """
+
+    __slots__ = ('_values',)
+
+    def __init__(self, data: dict) -> None:
+        values = list(map(data.get, _RAW_KEYS))
+        values[_FROM] = _sender(values[_FROM])
+        values[_TO] = _recipients(values[_TO])
+        self._values = tuple(values)
+
+    _id = _field('@id')
+    _type = _field('@type')
+    _context = _field('@context')
+    id = _field('id')
+    account_id = _field('accountId')
+    msg_id = _field('msgid')
+    _from = _field('from')
+    to = _field('to', list)
+    subject = _field('subject')
+    intro = _field('intro')
+    seen = _field('seen')
+    is_deleted = _field('isDeleted')
+    has_attachments = _field('hasAttachments')
+    size = _field('size')
+    download_url = _field('downloadUrl')
+    created_at = _field('createdAt', parse_datetime)
+    updated_at = _field('updatedAt', parse_datetime)
+
+    def to_message(self) -> Message:
+        values = self._values
+        return Message(*values[:_TO], list(values[_TO]), *values[_TO + 1:-2], *map(parse_datetime, values[-2:]))
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, RawMessage):
+            return self._values == other._values
+        if isinstance(other, Message):
+            return self.to_message() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'RawMessage(id={self.id!r}, subject={self.subject!r})'
+
+
+def parse_raw_messages(response: dict) -> Messages:
+    return parse_collection(response, RawMessage, Messages, total_items=0)
@@ -1,11 +1,8 @@
-import requests
-from datetime import datetime
-from pymailtm import BASE_URL, SUCCESS_CODES
-from pymailtm.models.common import (
-    View,
-    Search,
-    Mapping
-)
+from dataclasses import replace
+from typing import Any, Callable
+from pymailtm import SUCCESS_CODES, decoder
+from pymailtm.cache import CacheEntry, TTLCache
+from pymailtm.client import MailTmClient, get_default_client
 from pymailtm.models.domains import (
     Domains,
     Domain
@@ -15,121 +12,143 @@ from pymailtm.models.errors import (
     CannotGetDomainError
 )
 
+# Domains change rarely, so list pages and single domains are cached between calls
+cache = TTLCache(maxsize=256, ttl=3600)
+
+
+def _check_domains(response) -> None:
+    if response.status_code not in SUCCESS_CODES:
+        raise CannotGetDomainError(
+            message='Cannot get domain info',
+            status_code=response.status_code,
+            full_response=response.text
+        )
+
+
+def _check_domain(response) -> None:
+    if response.status_code not in SUCCESS_CODES:
+        if response.status_code == 401:
+            raise UnauthorizedError(
+                message='Invalid token',
+                status_code=response.status_code,
+                full_response=response.text
+            )
+        else:
+            raise CannotGetDomainError(
+                message='Cannot get domain info',
+                status_code=response.status_code,
+                full_response=response.text
+            )
+
+
+def _validators(entry: CacheEntry) -> dict:
+    headers = {}
+    if entry is not None:
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+    return headers
+
+
+def _copy(value: Any) -> Any:
+    # the cached Domains and Domain are handed out as copies, so a caller can't change them for the others
+    if isinstance(value, Domains):
+        return replace(
+            value,
+            member=[replace(domain) for domain in value.member],
+            search=replace(value.search, mapping=list(value.search.mapping))
+        )
+    return replace(value)
+
+
+def _cached_get(
+    client: MailTmClient,
+    path: str,
+    parse: Callable[[dict], Any],
+    check: Callable[[Any], None],
+    use_cache: bool,
+    params: dict = None,
+    headers: dict = None
+) -> Any:
+    if not use_cache:
+        response = client.get(path, params=params, headers=headers)
+        check(response)
+        return parse(decoder.json_body(response))
+
+    key = (client.base_url, path, tuple(sorted((params or {}).items())))
+    value = cache.get(key)
+    if value is not None:
+        return _copy(value)
 
-def get(page: int = 1) -> Domains:
+    with cache.lock(key):
+        entry = cache.peek(key)
+        if entry is not None and entry.fresh:
+            return _copy(entry.value)
+
+        response = client.get(
+            path,
+            params=params,
+            headers={**(headers or {}), **_validators(entry)}
+        )
+        if response.status_code == 304 and entry is not None:
+            cache.revalidated(key)
+            return _copy(entry.value)
+
+        check(response)
+        value = parse(decoder.json_body(response))
+        cache.set(
+            key, value,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+        return _copy(value)
+
+
+def get(page: int = 1, client: MailTmClient = None, use_cache: bool = True) -> Domains:
     """Returns a list of domains
 
+    Pages are served from `domains.cache` while fresh and revalidated with
+    ETag or Last-Modified once they expire.
+
     Args:
         page (int, optional): The collection page number. Defaults to 1.
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
+        use_cache (bool, optional): Use the domain cache. Defaults to True.
 
     Returns:
         Domains: The domain object containing result
     """
-    url = BASE_URL + '/domains'
+    client = client or get_default_client()
+    path = '/domains'
     params = {
         'page': page
     }
-    response = requests.get(url=url, params=params)
-    if response.status_code not in SUCCESS_CODES:
-        raise CannotGetDomainError(
-            message='Cannot get domain info',
-            status_code=response.status_code,
-            full_response=response.text
-        )
-    response = response.json()
-    domains: list[Domain] = []
-
-    for member in response.get('hydra:member', []):
-        domain = Domain(
-            _id=member.get('@id'),
-            _type=member.get('@type'),
-            _context=member.get('@context'),
-            id=member.get('id'),
-            domain=member.get('domain'),
-            is_active=member.get('isActive'),
-            is_private=member.get('isPrivate'),
-            created_at=datetime.strptime(member.get(
-                'createdAt'), '%Y-%m-%dT%H:%M:%S+00:00'),
-            updated_at=datetime.strptime(member.get(
-                'updatedAt'), '%Y-%m-%dT%H:%M:%S+00:00')
-        )
-        domains.append(domain)
-
-    total_items = response.get('hydra:totalItems')
-    view = View(
-        _id=response.get('hydra:view', {}).get('@id'),
-        _type=response.get('hydra:view', {}).get('@type'),
-        first=response.get('hydra:view', {}).get('hydra:first'),
-        last=response.get('hydra:view', {}).get('hydra:last'),
-        previous=response.get('hydra:view', {}).get('hydra:previous'),
-        next=response.get('hydra:view', {}).get('hydra:next'),
-    )
-    mapping = Mapping(
-        _type=response.get('hydra:search', {}).get(
-            'hydra:mapping', {}).get('@type'),
-        variable=response.get('hydra:search', {}).get(
-            'hydra:mapping', {}).get('variable'),
-        property=response.get('hydra:search', {}).get(
-            'hydra:mapping', {}).get('property'),
-        required=response.get('hydra:search', {}).get(
-            'hydra:mapping', {}).get('required'),
-    )
-    search = Search(
-        _type=response.get('hydra:search', {}).get('@type'),
-        template=response.get('hydra:search', {}).get('hydra:template'),
-        variable_representation=response.get(
-            'hydra:search', {}).get('hydra:variableRepresentation'),
-        mapping=mapping,
-    )
-    return Domains(
-        member=domains,
-        total_items=total_items,
-        view=view,
-        search=search
+    return _cached_get(
+        client, path, decoder.parse_domains, _check_domains, use_cache,
+        params=params
     )
 
 
-def get_by_id(id: str, token: str) -> Domain:
+def get_by_id(id: str, token: str, client: MailTmClient = None, use_cache: bool = True) -> Domain:
     """Retreives a domain by its id
 
     Args:
         id (str): The domain you want to get with id
         token (str): The auth token
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
+        use_cache (bool, optional): Use the domain cache. Defaults to True.
 
     Returns:
         Domains: The domain object containing result
     """
-    url = BASE_URL + f'/domains/{id}'
+    client = client or get_default_client()
+    path = f'/domains/{id}'
     headers = {
         'Authorization': f'Bearer {token}',
         'accept': 'application/ld+json',
     }
-    response = requests.get(url=url, headers=headers)
-    if response.status_code not in SUCCESS_CODES:
-        if response.status_code == 401:
-            raise UnauthorizedError(
-                message='Invalid token',
-                status_code=response.status_code,
-                full_response=response.text
-            )
-        else:
-            raise CannotGetDomainError(
-                message='Cannot get domain info',
-                status_code=response.status_code,
-                full_response=response.text
-            )
-
-    response = response.json()
-    return Domain(
-        _id=response.get('@id'),
-        _type=response.get('@type'),
-        _context=response.get('@context'),
-        id=response.get('id'),
-        domain=response.get('domain'),
-        is_active=response.get('isActive'),
-        is_private=response.get('isPrivate'),
-        created_at=datetime.strptime(response.get(
-            'createdAt'), '%Y-%m-%dT%H:%M:%S+00:00'),
-        updated_at=datetime.strptime(response.get(
-            'updatedAt'), '%Y-%m-%dT%H:%M:%S+00:00')
+    return _cached_get(
+        client, path, decoder.parse_domain, _check_domain, use_cache,
+        headers=headers
     )
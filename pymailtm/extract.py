@@ -0,0 +1,340 @@
+import re
+import html
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Pattern, Union
+from pymailtm import sources
+from pymailtm.batch import ERRORS
+from pymailtm.client import MailTmClient, get_default_client
+from pymailtm.mime import ParsedMessage
+from pymailtm.models.messages import Message
+from pymailtm.monitor import InboxEvent
+from pymailtm.tokens import TokenManager
+
+_DONE = object()
+
+
+@dataclass(slots=True)
+class Rule:
+    """A pre-compiled pattern extracting a value, optionally limited to some senders
+
+    The value is the `value` named group when the pattern has one, else
+    its first group that took part in the match, else the whole match.
+
+    Args:
+        name (str): The rule's name, reported with its extractions
+        pattern (str | Pattern): The pattern, compiled with flags when given as a string
+        sender (str, optional): An address, or a domain also matching its subdomains. Defaults to None, every sender.
+        flags (int, optional): The flags of a string pattern. Defaults to re.IGNORECASE.
+    """
+    name: str
+    pattern: Union[str, Pattern]
+    sender: str = None
+    flags: int = re.IGNORECASE
+
+    def __post_init__(self) -> None:
+        if isinstance(self.pattern, str):
+            self.pattern = re.compile(self.pattern, self.flags)
+        if self.sender is not None:
+            self.sender = self.sender.lower()
+
+    def search(self, text: str, pos: int = 0) -> re.Match:
+        return self.pattern.search(text, pos)
+
+    def value(self, match: re.Match) -> str:
+        if 'value' in self.pattern.groupindex:
+            return match.group('value')
+        return next((group for group in match.groups() if group is not None), match.group(0))
+
+
+OTP_RULE = Rule(
+    'otp',
+    r'\b(?:code|otp|pin|passcode|verification|security)\b\D{0,30}?\b(\d{4,8})\b'
+    r'|\b(\d{4,8})\b(?= is your\b)'
+)
+LINK_RULE = Rule(
+    'link',
+    r'https?://[^\s<>"\']*?(?:verif|confirm|activat|validat|magic|token|login|signin|reset)'
+    r'(?:[^\s<>"\']*[^\s<>"\'.,;:!?)\]])?'
+)
+DEFAULT_RULES = (OTP_RULE, LINK_RULE)
+
+
+@dataclass(slots=True)
+class Extraction:
+    """The outcome of extracting from a message
+
+    `field` is where the value was found: 'subject', 'intro', 'text' or
+    'html'. `value` and `rule` are None when nothing matched, and `error`
+    holds the exception raised while fetching the source.
+    """
+    message: Message
+    address: str = None
+    rule: str = None
+    value: str = None
+    field: str = None
+    error: Exception = None
+
+    @property
+    def ok(self) -> bool:
+        return self.value is not None
+
+
+class RuleSet:
+    """Rules indexed by sender, most specific first
+
+    For a sender, the rules of its exact address come first, then the
+    rules of its domain from the longest suffix to the shortest, then the
+    rules without sender, each group in the order the rules were added.
+    The resolved list is cached per address.
+
+    Args:
+        rules (Iterable[Rule], optional): The rules. Defaults to DEFAULT_RULES.
+        cache_size (int, optional): Maximum number of addresses whose rules are cached. Defaults to 4096.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = DEFAULT_RULES, cache_size: int = 4096) -> None:
+        self.cache_size = cache_size
+        self._by_sender: dict[str, list[Rule]] = {}
+        self._generic: list[Rule] = []
+        self._resolved: dict[str, tuple[Rule, ...]] = {}
+        self._lock = threading.Lock()
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule: Rule) -> None:
+        with self._lock:
+            if rule.sender is None:
+                self._generic.append(rule)
+            else:
+                self._by_sender.setdefault(rule.sender, []).append(rule)
+            self._resolved = {}
+
+    def __len__(self) -> int:
+        return len(self._generic) + sum(len(rules) for rules in self._by_sender.values())
+
+    def rules_for(self, address: str) -> tuple[Rule, ...]:
+        """Returns the rules tried on the messages of a sender, in order
+
+        Args:
+            address (str): The sender's address
+
+        Returns:
+            tuple[Rule, ...]: The rules
+        """
+        address = (address or '').lower()
+        rules = self._resolved.get(address)
+        if rules is not None:
+            return rules
+        found = list(self._by_sender.get(address, ()))
+        domain = address.rpartition('@')[2]
+        while domain:
+            found.extend(self._by_sender.get(domain, ()))
+            domain = domain.partition('.')[2]
+        rules = tuple(found + self._generic)
+        with self._lock:
+            if len(self._resolved) >= self.cache_size:
+                self._resolved = {}
+            self._resolved[address] = rules
+        return rules
+
+    def match(self, message: Message, text: str, field: str) -> Extraction:
+        """Tries the sender's rules on a text
+
+        Args:
+            message (Message): The message the text belongs to
+            text (str): The text
+            field (str): The name of the text, reported in the Extraction
+
+        Returns:
+            Extraction: The first match, or None
+        """
+        if not text:
+            return None
+        for rule in self.rules_for(message._from.address if message._from else None):
+            match = rule.search(text)
+            if match is None:
+                continue
+            # intros are cut after a few words, a value touching the end may be cut too
+            if field == 'intro' and match.end() == len(text):
+                continue
+            value = rule.value(match)
+            if field == 'html':
+                value = html.unescape(value)
+            return Extraction(message, rule=rule.name, value=value, field=field)
+        return None
+
+
+class Extractor:
+    """Pulls verification codes and links out of messages, fetching sources only when needed
+
+    The subject and the intro that every listed Message carries are tried
+    first. Only when they don't match is the source fetched, and its text
+    body, then its raw HTML, searched.
+
+    Args:
+        rules (RuleSet | Iterable[Rule], optional): The rules. Defaults to DEFAULT_RULES.
+        fetch (bool, optional): Fetch the source when the intro doesn't match. Defaults to True.
+        concurrency (int, optional): Sources fetched at once by `extract_many`. Defaults to 8.
+        tokens (TokenManager, optional): Tokens of the inboxes, by address, refreshed on 401. Defaults to None.
+        client (MailTmClient, optional): The client used to fetch sources. Defaults to the shared client.
+    """
+
+    def __init__(
+        self,
+        rules: Union[RuleSet, Iterable[Rule]] = DEFAULT_RULES,
+        fetch: bool = True,
+        concurrency: int = 8,
+        tokens: TokenManager = None,
+        client: MailTmClient = None
+    ) -> None:
+        self.rules = rules if isinstance(rules, RuleSet) else RuleSet(rules)
+        self.fetch = fetch
+        self.concurrency = concurrency
+        self.tokens = tokens
+        self.client = client or get_default_client()
+        self.cheap_hits = 0
+        self.fetches = 0
+        self._lock = threading.Lock()
+
+    def match_cheap(self, message: Message, address: str = None) -> Extraction:
+        """Tries the subject and the intro, never sends a request
+
+        Args:
+            message (Message): The message
+            address (str, optional): The inbox's address, reported in the Extraction. Defaults to None.
+
+        Returns:
+            Extraction: The first match, or None
+        """
+        result = (
+            self.rules.match(message, message.subject, 'subject')
+            or self.rules.match(message, message.intro, 'intro')
+        )
+        if result is not None:
+            result.address = address
+            with self._lock:
+                self.cheap_hits += 1
+        return result
+
+    def _source(self, message: Message, address: str, token: str):
+        if self.tokens is not None and address is not None:
+            return self.tokens.call(address, sources.get, message.id, client=self.client)
+        return sources.get(message.id, token, client=self.client)
+
+    def match_source(self, message: Message, address: str = None, token: str = None) -> Extraction:
+        """Fetches the source and tries its text body, then its raw HTML
+
+        Args:
+            message (Message): The message
+            address (str, optional): The inbox's address, used to get its token from `tokens`. Defaults to None.
+            token (str, optional): The inbox's token, when there are no `tokens`. Defaults to None.
+
+        Raises:
+            UnauthorizedError: When the token is invalid
+            CannotGetSourceError: When the source can't be fetched
+
+        Returns:
+            Extraction: The match, with a None value when nothing matched
+        """
+        with self._lock:
+            self.fetches += 1
+        parsed = ParsedMessage.from_source(self._source(message, address, token))
+        result = self.rules.match(message, parsed.text, 'text') or self.rules.match(message, parsed.html, 'html')
+        if result is None:
+            result = Extraction(message)
+        result.address = address
+        return result
+
+    def extract(self, message: Message, address: str = None, token: str = None) -> Extraction:
+        """Extracts from one message, see `match_cheap` and `match_source`
+
+        Args:
+            message (Message): The message
+            address (str, optional): The inbox's address, used to get its token from `tokens`. Defaults to None.
+            token (str, optional): The inbox's token, when there are no `tokens`. Defaults to None.
+
+        Returns:
+            Extraction: The match, with a None value when nothing matched
+        """
+        result = self.match_cheap(message, address)
+        if result is not None:
+            return result
+        if not self.fetch:
+            return Extraction(message, address=address)
+        return self.match_source(message, address, token)
+
+    def _fetch(self, message: Message, address: str, token: str) -> Extraction:
+        try:
+            return self.match_source(message, address, token)
+        except ERRORS as e:
+            return Extraction(message, address=address, error=e)
+
+    def extract_many(
+        self,
+        items: Iterable[Union[Message, InboxEvent]],
+        token: str = None
+    ) -> Iterator[Extraction]:
+        """Extracts from a stream of messages, fetching the sources of the misses concurrently
+
+        Intro matches are yielded as soon as their message is read, fetched
+        ones as soon as their source arrives, so the order isn't kept.
+        Items may be the InboxEvents of an InboxMonitor, whose address picks
+        the token from `tokens`, events without message are skipped. The
+        input is read by a background thread, so a blocking iterator such
+        as a monitor or a stream doesn't hold back finished fetches.
+
+        Args:
+            items (Iterable[Message | InboxEvent]): The messages
+            token (str, optional): The token of every message, when there are no `tokens`. Defaults to None.
+
+        Yields:
+            Extraction: One per message, failed fetches carry their error
+        """
+        results: queue.Queue = queue.Queue()
+        slots = threading.Semaphore(self.concurrency)
+        executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='pymailtm-extract')
+        stopped = threading.Event()
+
+        def done(future: Future, message: Message, address: str) -> None:
+            slots.release()
+            error = future.exception()
+            results.put(future.result() if error is None else Extraction(message, address=address, error=error))
+
+        def feed() -> None:
+            try:
+                for item in items:
+                    if stopped.is_set():
+                        break
+                    if isinstance(item, InboxEvent):
+                        message, address = item.message, item.address
+                        if message is None:
+                            continue
+                    else:
+                        message, address = item, None
+                    result = self.match_cheap(message, address)
+                    if result is not None or not self.fetch:
+                        results.put(result or Extraction(message, address=address))
+                        continue
+                    slots.acquire()
+                    future = executor.submit(self._fetch, message, address, token)
+                    future.add_done_callback(lambda f, m=message, a=address: done(f, m, a))
+            except BaseException as e:
+                results.put(e)
+            finally:
+                executor.shutdown(wait=True)
+                results.put(_DONE)
+
+        threading.Thread(target=feed, name='pymailtm-extract-feed', daemon=True).start()
+        try:
+            while True:
+                result = results.get()
+                if result is _DONE:
+                    return
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+        finally:
+            stopped.set()
@@ -0,0 +1,294 @@
+import socket
+import threading
+from collections import Counter
+from typing import Any, Iterator, Sequence
+import requests
+from pymailtm import BASE_URL
+from pymailtm.client import MailTmClient
+from pymailtm.instrumentation import Hook
+from pymailtm.ratelimit import RetryPolicy, TokenBucket
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+
+def _translate(error: Exception) -> requests.RequestException:
+    if isinstance(error, httpx.TimeoutException):
+        return requests.Timeout(str(error))
+    return requests.ConnectionError(str(error))
+
+
+class Http2Response:
+    """An httpx response with the parts of the requests.Response interface the endpoints use
+
+    A streamed response owns the client of its connection, `close` then
+    shuts the socket down so that a read blocked in another thread returns.
+    """
+
+    def __init__(self, response: 'httpx.Response', client: 'httpx.Client' = None) -> None:
+        self.response = response
+        self.client = client
+
+    @property
+    def status_code(self) -> int:
+        return self.response.status_code
+
+    @property
+    def headers(self) -> 'httpx.Headers':
+        return self.response.headers
+
+    @property
+    def content(self) -> bytes:
+        return self.response.content
+
+    @property
+    def text(self) -> str:
+        return self.response.text
+
+    @property
+    def encoding(self) -> str:
+        return self.response.encoding
+
+    @encoding.setter
+    def encoding(self, value: str) -> None:
+        self.response.encoding = value
+
+    @property
+    def http_version(self) -> str:
+        return self.response.http_version
+
+    @property
+    def url(self) -> str:
+        return str(self.response.url)
+
+    def json(self, **kwargs) -> Any:
+        return self.response.json(**kwargs)
+
+    def iter_content(self, chunk_size: int = 1, decode_unicode: bool = False) -> Iterator:
+        try:
+            if decode_unicode:
+                yield from self.response.iter_text(chunk_size)
+            else:
+                yield from self.response.iter_bytes(chunk_size)
+        except httpx.TransportError as e:
+            raise _translate(e) from e
+
+    def iter_lines(self, chunk_size: int = None, decode_unicode: bool = False) -> Iterator:
+        try:
+            for line in self.response.iter_lines():
+                yield line if decode_unicode else line.encode(self.response.encoding or 'utf-8')
+        except httpx.TransportError as e:
+            raise _translate(e) from e
+
+    def close(self) -> None:
+        if self.client is not None:
+            stream = self.response.extensions.get('network_stream')
+            sock = stream.get_extra_info('socket') if stream is not None else None
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self.response.close()
+        if self.client is not None:
+            self.client.close()
+
+    def __enter__(self) -> 'Http2Response':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Http2Session:
+    """A transport for MailTmClient multiplexing concurrent requests over HTTP/2
+
+    Requests go through an `httpx.Client` with HTTP/2 enabled, install it
+    with `pip install httpx[http2]`, so the endpoint functions called from
+    many threads share one connection per host instead of one each. Over
+    https HTTP/2 is negotiated with ALPN and servers without it are spoken
+    to in HTTP/1.1. With `h2c` HTTP/2 is used on plain http too, with prior
+    knowledge, and when the server turns out not to speak it the session
+    falls back to HTTP/1.1 for good. Streamed responses, such as hub
+    subscriptions, get a connection of their own so they can be closed
+    from another thread without failing the requests multiplexed with them.
+
+    Responses are decompressed transparently: gzip and deflate always,
+    brotli when `brotli` is installed. Transport errors are raised as the
+    requests exceptions the rest of the package handles.
+
+    Args:
+        h2c (bool, optional): Speak HTTP/2 over plain http, e.g. to a local server. Defaults to False.
+        compression (bool, optional): Accept compressed responses. Defaults to True.
+        max_connections (int, optional): Maximum number of open connections. Defaults to 10.
+        max_keepalive_connections (int, optional): Maximum number of idle connections kept alive. Defaults to 10.
+    """
+
+    def __init__(
+        self,
+        h2c: bool = False,
+        compression: bool = True,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 10
+    ) -> None:
+        if httpx is None or h2 is None:
+            raise ImportError('Http2Session requires httpx and h2, install them with `pip install httpx[http2]`')
+        self.h2c = h2c
+        self.compression = compression
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self.fell_back = False
+        self.connections = 0
+        self.versions: Counter = Counter()
+        self._lock = threading.Lock()
+        self._opening = threading.Lock()
+        self.http = self._open(http1=not h2c)
+
+    def _open(self, http1: bool = True, http2: bool = True) -> 'httpx.Client':
+        headers = None if self.compression else {'Accept-Encoding': 'identity'}
+        return httpx.Client(http1=http1, http2=http2, limits=self.limits, headers=headers)
+
+    def _trace(self, event: str, info: dict) -> None:
+        if event == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.connections += 1
+
+    def _fall_back(self, client: 'httpx.Client') -> None:
+        # the old client isn't closed, other threads may still be sending through it
+        with self._lock:
+            if self.http is client:
+                self.fell_back = True
+                self.http = self._open(http2=False)
+
+    def _send(self, client: 'httpx.Client', request: 'httpx.Request', stream: bool, follow: bool) -> 'httpx.Response':
+        # httpcore takes a stream id and sends its headers without holding a lock, threads
+        # could open streams out of order, a connection error, so that part is serialized
+        opened = False
+
+        def trace(event: str, info: dict) -> None:
+            nonlocal opened
+            self._trace(event, info)
+            if event.endswith('send_request_headers.complete') and not opened:
+                opened = True
+                self._opening.release()
+
+        request.extensions['trace'] = trace
+        self._opening.acquire()
+        try:
+            return client.send(request, stream=stream, follow_redirects=follow)
+        finally:
+            if not opened:
+                opened = True
+                self._opening.release()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        params: dict = None,
+        data: Any = None,
+        json: Any = None,
+        headers: dict = None,
+        timeout: float = None,
+        stream: bool = False,
+        allow_redirects: bool = True
+    ) -> Http2Response:
+        """Sends a request, with the arguments of requests.Session.request that the package uses
+
+        Raises:
+            requests.exceptions.InvalidURL: When the url can't be parsed
+            requests.Timeout: When the request timed out
+            requests.ConnectionError: When the connection failed
+
+        Returns:
+            Http2Response: The response, its body already read unless streamed
+        """
+        if isinstance(data, (str, bytes)):
+            options = {'content': data}
+        else:
+            options = {'data': data}
+        base = client = self.http
+        if stream:
+            client = self._open(http2=False) if self.fell_back else self._open(http1=not self.h2c)
+        try:
+            request = client.build_request(
+                method, url, params=params, json=json, headers=headers, timeout=timeout, **options
+            )
+            response = self._send(client, request, stream, allow_redirects)
+        except httpx.InvalidURL as e:
+            self._discard(client, base)
+            raise requests.exceptions.InvalidURL(str(e)) from e
+        except httpx.RemoteProtocolError as e:
+            self._discard(client, base)
+            # a server that only speaks HTTP/1.1 hangs up on the HTTP/2 preface
+            if not self.h2c or self.versions['HTTP/2'] or (self.fell_back and self.http is base):
+                raise _translate(e) from e
+            self._fall_back(base)
+            return self.request(method, url, params, data, json, headers, timeout, stream, allow_redirects)
+        except httpx.TransportError as e:
+            self._discard(client, base)
+            raise _translate(e) from e
+        with self._lock:
+            self.versions[response.http_version] += 1
+        return Http2Response(response, client if client is not base else None)
+
+    @staticmethod
+    def _discard(client: 'httpx.Client', base: 'httpx.Client') -> None:
+        if client is not base:
+            client.close()
+
+    def close(self) -> None:
+        self.http.close()
+
+
+class Http2Client(MailTmClient):
+    """A MailTmClient sending its requests through an Http2Session
+
+    Pass it to the endpoint functions like any client, concurrent calls
+    from threads are then multiplexed over a single connection. The retry
+    policy, limiter and hooks work as in MailTmClient.
+
+    Args:
+        base_url (str, optional): The API root. Defaults to BASE_URL.
+        h2c (bool, optional): Speak HTTP/2 over plain http, e.g. to a local server. Defaults to False.
+        compression (bool, optional): Accept compressed responses. Defaults to True.
+        max_connections (int, optional): Maximum number of open connections. Defaults to 10.
+        timeout (float, optional): Default timeout in seconds for every request. Defaults to None.
+        limiter (TokenBucket, optional): A rate limiter, can be shared with other clients. Defaults to None, no limit.
+        retry (RetryPolicy, optional): The retry policy. Defaults to RetryPolicy().
+        hooks (Sequence[Hook], optional): Instrumentation hooks of this client, run after the ones of `instrumentation.add_hook`. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        h2c: bool = False,
+        compression: bool = True,
+        max_connections: int = 10,
+        timeout: float = None,
+        limiter: TokenBucket = None,
+        retry: RetryPolicy = None,
+        hooks: Sequence[Hook] = None
+    ) -> None:
+        session = Http2Session(
+            h2c=h2c,
+            compression=compression,
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        )
+        super().__init__(base_url, timeout=timeout, limiter=limiter, retry=retry, hooks=hooks, session=session)
+
+    @property
+    def http_version(self) -> str:
+        """The protocol of most responses so far, 'HTTP/2' or 'HTTP/1.1', None before the first one"""
+        versions = self.session.versions.most_common(1)
+        return versions[0][0] if versions else None
@@ -0,0 +1,135 @@
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+_RESOURCES = frozenset(('accounts', 'domains', 'messages', 'sources'))
+
+# replaced, never mutated, by add_hook and remove_hook: read it as `instrumentation.hooks`
+hooks: tuple = ()
+
+
+@dataclass(slots=True)
+class RequestInfo:
+    """One attempt of a request, the same object is passed to request_start and request_end
+
+    `attempt` counts from 0, so any attempt above 0 is a retry. The fields
+    after `bytes_sent` are only set for request_end: `status_code` and
+    `bytes_received` are None when no response arrived, `bytes_received`
+    is also None for streamed responses without a Content-Length, and
+    `error` holds the exception raised by the transport. `bytes_received`
+    is the Content-Length when there is one, so compressed bodies count
+    as received, not as decoded.
+    """
+    method: str
+    endpoint: str
+    url: str
+    attempt: int = 0
+    bytes_sent: int = 0
+    status_code: int = None
+    bytes_received: int = None
+    duration: float = None
+    error: BaseException = None
+    started: float = None
+
+
+class Hook:
+    """Base class of the instrumentation hooks, override the events you need
+
+    Hooks run synchronously in the thread, or the event loop, that sends
+    the request, so they must be fast and must not raise.
+    """
+
+    def request_start(self, info: RequestInfo) -> None:
+        pass
+
+    def request_end(self, info: RequestInfo) -> None:
+        pass
+
+
+def add_hook(hook: Hook) -> None:
+    """Registers a hook on every client
+
+    Args:
+        hook (Hook): The hook
+    """
+    global hooks
+    if hook not in hooks:
+        hooks = hooks + (hook,)
+
+
+def remove_hook(hook: Hook) -> None:
+    """Unregisters a hook added with `add_hook`
+
+    Args:
+        hook (Hook): The hook
+    """
+    global hooks
+    hooks = tuple(h for h in hooks if h is not hook)
+
+
+def endpoint_name(path: str) -> str:
+    """Turns a request path or url into its endpoint, replacing ids with `{id}`
+
+    Args:
+        path (str): The path, e.g. `/messages/abc/download`, or an absolute url
+
+    Returns:
+        str: The endpoint, e.g. `/messages/{id}/download`
+    """
+    parts = urlsplit(path).path.split('/')
+    for i in range(2, len(parts)):
+        if parts[i - 1] in _RESOURCES and parts[i]:
+            parts[i] = '{id}'
+    return '/'.join(parts) or '/'
+
+
+def _body_size(kwargs: dict) -> int:
+    body = kwargs.get('data') or kwargs.get('content')
+    if isinstance(body, str):
+        return len(body.encode())
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    return 0
+
+
+def start_request(active: tuple, method: str, path: str, url: str, attempt: int, kwargs: dict) -> RequestInfo:
+    """Calls request_start of the active hooks, used by the clients
+
+    Args:
+        active (tuple): The hooks
+        method (str): The HTTP method
+        path (str): The path given to the client
+        url (str): The url requested
+        attempt (int): The attempt, from 0
+        kwargs (dict): The keyword arguments of the request
+
+    Returns:
+        RequestInfo: The info to pass to `end_request`
+    """
+    info = RequestInfo(method, endpoint_name(path), url, attempt, _body_size(kwargs))
+    for hook in active:
+        hook.request_start(info)
+    info.started = time.perf_counter()
+    return info
+
+
+def end_request(active: tuple, info: RequestInfo, response=None, error: BaseException = None, streamed: bool = False) -> None:
+    """Calls request_end of the active hooks, used by the clients
+
+    Args:
+        active (tuple): The hooks
+        info (RequestInfo): The info returned by `start_request`
+        response (optional): The requests or httpx response. Defaults to None.
+        error (BaseException, optional): The exception raised instead. Defaults to None.
+        streamed (bool, optional): The body has not been read yet. Defaults to False.
+    """
+    info.duration = time.perf_counter() - info.started
+    info.error = error
+    if response is not None:
+        info.status_code = response.status_code
+        if 'content-length' in response.headers:
+            info.bytes_received = int(response.headers['content-length'])
+        elif not streamed:
+            info.bytes_received = len(response.content)
+    for hook in active:
+        hook.request_end(info)
@@ -1,17 +1,9 @@
-import requests
-from datetime import datetime
-from pymailtm import BASE_URL, SUCCESS_CODES
-from pymailtm.models.common import (
-    View,
-    Search,
-    Mapping
-)
-from pymailtm.models.messages import (
-    To,
-    From,
-    Message,
-    Messages
-)
+from typing import Iterable
+from pymailtm import SUCCESS_CODES, decoder
+from pymailtm.batch import run_many
+from pymailtm.cache import MessageCache
+from pymailtm.client import MailTmClient, get_default_client
+from pymailtm.models.batch import BatchReport
 from pymailtm.models.errors import (
     CannotGetMessageError,
     UnauthorizedError,
@@ -19,13 +11,19 @@ from pymailtm.models.errors import (
     CannotDeleteMessageError
 )
 
+# Message details and sources, shared by `get` and `sources.get` when asked, kept
+# consistent by every listing and change going through this module
+cache = MessageCache()
 
-def getall(page: int, token: str):
+
+def getall(page: int, token: str, client: MailTmClient = None, raw: bool = False):
     """Gets all Messages corresponsing to the user's token
 
     Args:
         page (int): The page number
         token (str): The user bearer token
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
+        raw (bool, optional): Return RawMessage views that decode fields on access. Defaults to False.
 
     Raises:
         UnauthorizedError: When the token is invalid
@@ -34,7 +32,8 @@ def getall(page: int, token: str):
     Returns:
         Messages: The messages
     """
-    url = BASE_URL + '/messages'
+    client = client or get_default_client()
+    path = '/messages'
     params = {
         'page': page,
     }
@@ -42,8 +41,8 @@ def getall(page: int, token: str):
         'Authorization': f'Bearer {token}',
         'accept': 'application/ld+json',
     }
-    response = requests.get(
-        url=url,
+    response = client.get(
+        path,
         params=params,
         headers=headers
     )
@@ -62,86 +61,23 @@ def getall(page: int, token: str):
                 full_response=response.text
             )
 
-    response = response.json()
-    messages: list[Message] = []
-
-    for member in response.get('hydra:member', []):
-        to_s: list[To] = []
-        _from = From(
-            name=member.get('name'),
-            address=member.get('address')
-        )
-        for _to in member.get('to', []):
-            to_s.append(To(
-                name=_to.get('name'),
-                address=_to.get('address')
-            ))
-        message = Message(
-            _id=member.get('@id'),
-            _type=member.get('@type'),
-            _context=member.get('@context'),
-            id=member.get('id'),
-            account_id=member.get('accountId'),
-            msg_id=member.get('msgid'),
-            to=to_s,
-            _from=_from,
-            subject=member.get('subject'),
-            intro=member.get('intro'),
-            seen=member.get('seen'),
-            is_deleted=member.get('isDeleted'),
-            has_attachments=member.get('hasAttachments'),
-            size=member.get('size'),
-            download_url=member.get('downloadUrl'),
-            created_at=datetime.strptime(member.get(
-                'createdAt'), '%Y-%m-%dT%H:%M:%S+00:00'),
-            updated_at=datetime.strptime(member.get(
-                'updatedAt'), '%Y-%m-%dT%H:%M:%S+00:00')
-        )
-        messages.append(message)
-
-    total_items = response.get('hydra:totalItems', 0)
-    view = View(
-        _id=response.get('hydra:view', {}).get('@id'),
-        _type=response.get('hydra:view', {}).get('@type'),
-        first=response.get('hydra:view', {}).get('hydra:first'),
-        last=response.get('hydra:view', {}).get('hydra:last'),
-        previous=response.get('hydra:view', {}).get('hydra:previous'),
-        next=response.get('hydra:view', {}).get('hydra:next'),
-    )
-    mapping = Mapping(
-        _type=response.get('hydra:search', {}).get(
-            'hydra:mapping', {}).get('@type'),
+    parse = decoder.parse_raw_messages if raw else decoder.parse_messages
+    collection = parse(decoder.json_body(response))
+    cache.observe(collection.member)
+    return collection
 
-        variable=response.get('hydra:search', {}).get(
-            'hydra:mapping', {}).get('variable'),
 
-        property=response.get('hydra:search', {}).get(
-            'hydra:mapping', {}).get('property'),
-
-        required=response.get('hydra:search', {}).get(
-            'hydra:mapping', {}).get('required'),
-    )
-    search = Search(
-        _type=response.get('hydra:search', {}).get('@type'),
-        template=response.get('hydra:search', {}).get('hydra:template'),
-        variable_representation=response.get(
-            'hydra:search', {}).get('hydra:variableRepresentation'),
-        mapping=mapping,
-    )
-    return Messages(
-        member=messages,
-        total_items=total_items,
-        view=view,
-        search=search
-    )
-
-
-def get(id: str, token: str):
+def get(id: str, token: str, client: MailTmClient = None, use_cache: bool = False):
     """_summary_: Gets a Message's Source resource
 
+    With use_cache the message is served from `messages.cache` unless a
+    listing showed a newer `updated_at` since it was stored.
+
     Args:
         id (str): The id of the source
         token (str): The user bearer token
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
+        use_cache (bool, optional): Use the message cache. Defaults to False.
 
     Raises:
         UnauthorizedError: When the token is invalid or doesn't corresponds to the id
@@ -150,12 +86,17 @@ def get(id: str, token: str):
     Returns:
         Message: The message
     """
-    url = BASE_URL + f'/messages/{id}'
+    if use_cache:
+        message = cache.get_message(id)
+        if message is not None:
+            return message
+    client = client or get_default_client()
+    path = f'/messages/{id}'
     headers = {
         'Authorization': f'Bearer {token}',
         'accept': 'application/ld+json',
     }
-    response = requests.get(url=url, headers=headers)
+    response = client.get(path, headers=headers)
 
     if response.status_code not in SUCCESS_CODES:
         if response.status_code == 401:
@@ -171,46 +112,19 @@ def get(id: str, token: str):
                 full_response=response.text
             )
 
-    response = response.json()
-    to_s: list[To] = []
-    _from = From(
-        name=response.get('name'),
-        address=response.get('address')
-    )
-    for _to in response.get('to', []):
-        to_s.append(To(
-            name=_to.get('name'),
-            address=_to.get('address')
-        ))
-    return Message(
-        _id=response.get('@id'),
-        _type=response.get('@type'),
-        _context=response.get('@context'),
-        id=response.get('id'),
-        account_id=response.get('accountId'),
-        msg_id=response.get('msgid'),
-        to=to_s,
-        _from=_from,
-        subject=response.get('subject'),
-        intro=response.get('intro'),
-        seen=response.get('seen'),
-        is_deleted=response.get('isDeleted'),
-        has_attachments=response.get('hasAttachments'),
-        size=response.get('size'),
-        download_url=response.get('downloadUrl'),
-        created_at=datetime.strptime(response.get(
-            'createdAt'), '%Y-%m-%dT%H:%M:%S+00:00'),
-        updated_at=datetime.strptime(response.get(
-            'updatedAt'), '%Y-%m-%dT%H:%M:%S+00:00')
-    )
+    message = decoder.parse_message(decoder.json_body(response))
+    if use_cache:
+        cache.set_message(message)
+    return message
 
 
-def delete(id: str, token: str):
+def delete(id: str, token: str, client: MailTmClient = None):
     """Deletes a Message's Source resource
 
     Args:
         id (str): The id of the source
         token (str): The user bearer token
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
 
     Raises:
         UnauthorizedError: When the token is invalid or doesn't corresponds to the id
@@ -219,12 +133,13 @@ def delete(id: str, token: str):
     Returns:
         _type_: True if successful, False otherwise
     """
-    url = BASE_URL + f'/messages/{id}'
+    client = client or get_default_client()
+    path = f'/messages/{id}'
     headers = {
         'Authorization': f'Bearer {token}',
         'accept': 'application/ld+json',
     }
-    response = requests.delete(url=url, headers=headers)
+    response = client.delete(path, headers=headers)
     if response.status_code not in SUCCESS_CODES:
         if response.status_code == 401:
             raise UnauthorizedError(
@@ -239,15 +154,17 @@ def delete(id: str, token: str):
                 full_response=response.text
             )
 
+    cache.invalidate(id)
     return response.status_code == 204
 
 
-def mark_as_read(id: str, token: str):
+def mark_as_read(id: str, token: str, client: MailTmClient = None):
     """Marks a Message as read
 
     Args:
         id (str): The id of the source
         token (str): The user bearer token
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
 
     Raises:
         UnauthorizedError: When the token is invalid or doesn't corresponds to the id
@@ -256,12 +173,13 @@ def mark_as_read(id: str, token: str):
     Returns:
         bool: True if the message is seen othwewise false
     """
-    url = BASE_URL + f'/messages/{id}'
+    client = client or get_default_client()
+    path = f'/messages/{id}'
     headers = {
         'Authorization': f'Bearer {token}',
         'accept': 'application/ld+json',
     }
-    response = requests.patch(url=url, headers=headers)
+    response = client.patch(path, headers=headers)
 
     if response.status_code not in SUCCESS_CODES:
         if response.status_code == 401:
@@ -277,4 +195,89 @@ def mark_as_read(id: str, token: str):
                 full_response=response.text
             )
 
-    return response.json().get('seen', False)
+    body = decoder.json_body(response)
+    cache.mark_seen(id, decoder.parse_datetime(body.get('updatedAt')))
+    return body.get('seen', False)
+
+
+def mark_as_read_many(
+    ids: Iterable[str],
+    token: str,
+    concurrency: int = 8,
+    client: MailTmClient = None
+) -> BatchReport:
+    """Marks many Messages as read concurrently
+
+    Args:
+        ids (Iterable[str]): The ids of the messages
+        token (str): The user bearer token
+        concurrency (int, optional): Maximum requests in flight. Defaults to 8.
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+
+    Returns:
+        BatchReport: Per id results, holding the `seen` flag or the error
+    """
+    return run_many(mark_as_read, ids, token, concurrency=concurrency, client=client)
+
+
+def delete_many(
+    ids: Iterable[str],
+    token: str,
+    concurrency: int = 8,
+    client: MailTmClient = None
+) -> BatchReport:
+    """Deletes many Messages concurrently
+
+    Args:
+        ids (Iterable[str]): The ids of the messages
+        token (str): The user bearer token
+        concurrency (int, optional): Maximum requests in flight. Defaults to 8.
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+
+    Returns:
+        BatchReport: Per id results, holding True or the error
+    """
+    return run_many(delete, ids, token, concurrency=concurrency, client=client)
+
+
+def list_ids(token: str, client: MailTmClient = None) -> list[str]:
+    """Lists the ids of every Message of the token's inbox
+
+    Args:
+        token (str): The user bearer token
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+
+    Raises:
+        UnauthorizedError: When the token is invalid
+        CannotGetMessageError: When a page can't be fetched
+
+    Returns:
+        list[str]: The ids, newest first
+    """
+    ids: list[str] = []
+    page = 1
+    while page is not None:
+        collection = getall(page, token, client=client, raw=True)
+        ids.extend(message.id for message in collection.member)
+        page = page + 1 if collection.member and collection.view.next else None
+    return ids
+
+
+def purge(token: str, concurrency: int = 8, client: MailTmClient = None) -> BatchReport:
+    """Deletes every Message of the token's inbox
+
+    The inbox is listed first and the messages are then deleted
+    concurrently, messages arriving meanwhile are kept.
+
+    Args:
+        token (str): The user bearer token
+        concurrency (int, optional): Maximum delete requests in flight. Defaults to 8.
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+
+    Raises:
+        UnauthorizedError: When the token is invalid
+
+    Returns:
+        BatchReport: Per message results
+    """
+    return delete_many(list_ids(token, client=client), token, concurrency=concurrency, client=client)
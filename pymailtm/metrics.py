@@ -0,0 +1,182 @@
+import bisect
+import threading
+from dataclasses import dataclass, field, replace
+from pymailtm import domains, messages
+from pymailtm.cache import TTLCache
+from pymailtm.instrumentation import Hook, RequestInfo
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+@dataclass(slots=True)
+class Histogram:
+    """A latency histogram with fixed upper bounds, in seconds
+
+    `counts` has one more slot than `buckets` for the values above the
+    last bound, the counts are not cumulative.
+    """
+    buckets: tuple = DEFAULT_BUCKETS
+    counts: list = None
+    count: int = 0
+    sum: float = 0.0
+
+    def __post_init__(self) -> None:
+        if self.counts is None:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile by interpolating inside its bucket
+
+        Args:
+            q (float): The quantile, between 0 and 1
+
+        Returns:
+            float: The estimate, the last bound when it falls above it, or 0.0 without observations
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def copy(self) -> 'Histogram':
+        return replace(self, counts=list(self.counts))
+
+
+@dataclass(slots=True)
+class EndpointStats:
+    """The counters of one method and endpoint
+
+    `requests` counts every attempt, so it includes the `retries`, and
+    `errors` counts the attempts that raised or got a 4xx or 5xx.
+    """
+    method: str
+    endpoint: str
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+    exceptions: dict[str, int] = field(default_factory=dict)
+    latency: Histogram = None
+
+    def copy(self) -> 'EndpointStats':
+        return replace(
+            self, statuses=dict(self.statuses), exceptions=dict(self.exceptions), latency=self.latency.copy()
+        )
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int
+    misses: int
+    revalidations: int
+    hit_ratio: float
+
+
+class MetricsCollector(Hook):
+    """A hook counting requests, errors, retries and latencies per endpoint
+
+    Register it with `instrumentation.add_hook(collector)`, or on a single
+    client with its `hooks` argument. The cache hit ratios are read from
+    the watched caches when asked, so they cost nothing per request.
+
+    Args:
+        buckets (tuple, optional): The upper bounds of the latency histograms, in seconds. Defaults to DEFAULT_BUCKETS.
+        caches (dict[str, TTLCache], optional): The caches to report, by name. Defaults to the domains and messages caches.
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS, caches: dict[str, TTLCache] = None) -> None:
+        self.buckets = tuple(buckets)
+        self.caches = dict(caches) if caches is not None else {'domains': domains.cache, 'messages': messages.cache}
+        self._endpoints: dict[tuple, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, info: RequestInfo) -> EndpointStats:
+        key = (info.method, info.endpoint)
+        stats = self._endpoints.get(key)
+        if stats is None:
+            stats = self._endpoints[key] = EndpointStats(info.method, info.endpoint, latency=Histogram(self.buckets))
+        return stats
+
+    def request_start(self, info: RequestInfo) -> None:
+        with self._lock:
+            stats = self._stats(info)
+            stats.requests += 1
+            stats.in_flight += 1
+            stats.bytes_sent += info.bytes_sent
+            if info.attempt:
+                stats.retries += 1
+
+    def request_end(self, info: RequestInfo) -> None:
+        with self._lock:
+            stats = self._stats(info)
+            stats.in_flight -= 1
+            stats.latency.observe(info.duration)
+            if info.bytes_received:
+                stats.bytes_received += info.bytes_received
+            if info.error is not None:
+                name = type(info.error).__name__
+                stats.exceptions[name] = stats.exceptions.get(name, 0) + 1
+                stats.errors += 1
+            else:
+                stats.statuses[info.status_code] = stats.statuses.get(info.status_code, 0) + 1
+                if info.status_code >= 400:
+                    stats.errors += 1
+
+    def watch_cache(self, name: str, cache: TTLCache) -> None:
+        """Reports the hit ratio of another cache
+
+        Args:
+            name (str): The name of the cache
+            cache (TTLCache): The cache
+        """
+        self.caches[name] = cache
+
+    def endpoints(self) -> list[EndpointStats]:
+        """Returns a copy of the counters of every endpoint seen so far"""
+        with self._lock:
+            return [stats.copy() for stats in self._endpoints.values()]
+
+    def endpoint(self, method: str, endpoint: str) -> EndpointStats:
+        """Returns a copy of the counters of an endpoint
+
+        Args:
+            method (str): The HTTP method
+            endpoint (str): The endpoint, as made by `instrumentation.endpoint_name`
+
+        Returns:
+            EndpointStats: The counters, or None when it has not been called
+        """
+        with self._lock:
+            stats = self._endpoints.get((method, endpoint))
+            return stats.copy() if stats is not None else None
+
+    def cache_stats(self) -> dict[str, CacheStats]:
+        """Returns the counters of the watched caches"""
+        return {
+            name: CacheStats(cache.hits, cache.misses, getattr(cache, 'revalidations', 0), cache.hit_ratio)
+            for name, cache in self.caches.items()
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
@@ -0,0 +1,164 @@
+import io
+import os
+from email import policy
+from email.message import EmailMessage, Message as _Message
+from email.feedparser import BytesFeedParser
+from email.parser import BytesHeaderParser
+from functools import cached_property
+from typing import BinaryIO, Union
+from pymailtm.models.sources import Source
+
+
+# Bytes copied at a time out of the raw message, a memory mapped file is never copied whole
+CHUNK_SIZE = 64 * 1024
+
+
+def _header_block(raw) -> bytes:
+    with memoryview(raw) as view:
+        size = CHUNK_SIZE
+        while True:
+            head = bytes(view[:size])
+            for separator in (b'\r\n\r\n', b'\n\n'):
+                end = head.find(separator)
+                if end != -1:
+                    return head[:end + len(separator)]
+            if size >= len(view):
+                return head
+            size *= 4
+
+
+class Attachment:
+    """A MIME part of a ParsedMessage, decoded only when its payload is read"""
+
+    def __init__(self, part: _Message) -> None:
+        self._part = part
+        self.filename: str = part.get_filename()
+        self.content_type: str = part.get_content_type()
+        self.content_id: str = part.get('Content-ID')
+        self.disposition: str = part.get_content_disposition()
+
+    def __repr__(self) -> str:
+        return f'Attachment(filename={self.filename!r}, content_type={self.content_type!r})'
+
+    @cached_property
+    def payload(self) -> memoryview:
+        """The decoded content, a read only view decoded on first access"""
+        return memoryview(self._part.get_payload(decode=True) or b'')
+
+    @property
+    def size(self) -> int:
+        return self.payload.nbytes
+
+    def open(self) -> BinaryIO:
+        """Returns a binary stream over the payload, sharing its buffer
+
+        Returns:
+            BinaryIO: The stream
+        """
+        return io.BytesIO(self.payload.obj)
+
+    def save(self, path: Union[str, os.PathLike]) -> int:
+        """Writes the payload to a file
+
+        Args:
+            path (str | PathLike): The destination
+
+        Returns:
+            int: The bytes written
+        """
+        with open(path, 'wb') as file:
+            return file.write(self.payload)
+
+
+class ParsedMessage:
+    """A raw RFC822 message with eagerly parsed headers and lazily decoded bodies
+
+    Only the header block is parsed on construction. The text and HTML
+    bodies and the attachments are decoded the first time they are
+    accessed and then cached on the object.
+
+    Args:
+        raw (bytes | memoryview | mmap): The raw message, a memoryview must stay valid while the message is used
+    """
+
+    def __init__(self, raw) -> None:
+        self.raw = raw
+        self.headers: _Message = BytesHeaderParser(policy=policy.default).parsebytes(_header_block(raw))
+
+    @classmethod
+    def from_source(cls, source: Source) -> 'ParsedMessage':
+        """Parses the `data` of a Source
+
+        Args:
+            source (Source): The source, see `sources.get`
+
+        Returns:
+            ParsedMessage: The parsed message
+        """
+        return cls(source.data.encode('utf-8', errors='surrogateescape'))
+
+    @classmethod
+    def from_file(cls, path: Union[str, os.PathLike]) -> 'ParsedMessage':
+        """Parses a downloaded .eml through a memory map, see `sources.download`
+
+        Args:
+            path (str | PathLike): The file
+
+        Returns:
+            ParsedMessage: The parsed message
+        """
+        from pymailtm.sources import map_file
+        return cls(map_file(path))
+
+    @property
+    def subject(self) -> str:
+        return self.headers.get('Subject')
+
+    @property
+    def sender(self) -> str:
+        return self.headers.get('From')
+
+    @property
+    def to(self) -> str:
+        return self.headers.get('To')
+
+    @property
+    def date(self) -> str:
+        return self.headers.get('Date')
+
+    @property
+    def message_id(self) -> str:
+        return self.headers.get('Message-ID')
+
+    @cached_property
+    def message(self) -> EmailMessage:
+        """The fully parsed message, parsed on first access from CHUNK_SIZE slices of the raw message"""
+        parser = BytesFeedParser(policy=policy.default)
+        with memoryview(self.raw) as view:
+            for start in range(0, len(view), CHUNK_SIZE):
+                parser.feed(bytes(view[start:start + CHUNK_SIZE]))
+        return parser.close()
+
+    def _body(self, subtype: str) -> str:
+        part = self.message.get_body(preferencelist=(subtype,))
+        return part.get_content() if part is not None else None
+
+    @cached_property
+    def text(self) -> str:
+        """The decoded text/plain body, or None"""
+        return self._body('plain')
+
+    @cached_property
+    def html(self) -> str:
+        """The decoded text/html body, or None"""
+        return self._body('html')
+
+    @cached_property
+    def attachments(self) -> list[Attachment]:
+        """The attachments, their payloads are decoded when read"""
+        return [Attachment(part) for part in self.message.iter_attachments()]
+
+    def close(self) -> None:
+        """Releases the memory map of a message built with from_file"""
+        if hasattr(self.raw, 'close'):
+            self.raw.close()
@@ -0,0 +1,344 @@
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Union
+from pymailtm import accounts, messages, sources
+from pymailtm.client import MailTmClient
+from pymailtm.mime import ParsedMessage
+from pymailtm.pagination import iter_pages
+from pymailtm.tokens import decode_jwt
+from pymailtm.models.messages import From, Message, To
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS messages (
+    account_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    _id TEXT,
+    msg_id TEXT,
+    sender_address TEXT,
+    sender_name TEXT,
+    recipients TEXT,
+    subject TEXT,
+    intro TEXT,
+    seen INTEGER,
+    is_deleted INTEGER,
+    has_attachments INTEGER,
+    size INTEGER,
+    download_url TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    source TEXT,
+    PRIMARY KEY (account_id, id)
+);
+CREATE INDEX IF NOT EXISTS messages_created ON messages (account_id, created_at);
+CREATE INDEX IF NOT EXISTS messages_sender ON messages (sender_address);
+CREATE TABLE IF NOT EXISTS sync_state (
+    account_id TEXT PRIMARY KEY,
+    high_water TEXT,
+    synced_at TEXT
+);
+'''
+
+COLUMNS = (
+    'account_id, id, _id, msg_id, sender_address, sender_name, recipients, subject, intro, '
+    'seen, is_deleted, has_attachments, size, download_url, created_at, updated_at'
+)
+
+UPSERT = (
+    f'INSERT INTO messages ({COLUMNS}, source) VALUES ({", ".join("?" * 17)}) '
+    'ON CONFLICT (account_id, id) DO UPDATE SET '
+    + ', '.join(f'{column} = excluded.{column}' for column in COLUMNS.split(', ')[2:])
+    + ', source = COALESCE(excluded.source, messages.source)'
+)
+
+
+@dataclass
+class SyncResult:
+    account_id: str
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    pages: int = 0
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _parsed(source: str) -> ParsedMessage:
+    return ParsedMessage(source.encode('utf-8', errors='surrogateescape')) if source else None
+
+
+def _row(account_id: str, message: Message) -> tuple:
+    return (
+        account_id,
+        message.id,
+        message._id,
+        message.msg_id,
+        message._from.address if message._from else None,
+        message._from.name if message._from else None,
+        json.dumps([[to.name, to.address] for to in message.to or []]),
+        message.subject,
+        message.intro,
+        int(bool(message.seen)),
+        int(bool(message.is_deleted)),
+        int(bool(message.has_attachments)),
+        message.size,
+        message.download_url,
+        message.created_at.isoformat(),
+        message.updated_at.isoformat(),
+    )
+
+
+def _message(row: sqlite3.Row) -> Message:
+    return Message(
+        _id=row['_id'],
+        _type='Message',
+        _context=None,
+        id=row['id'],
+        account_id=row['account_id'],
+        msg_id=row['msg_id'],
+        _from=From(name=row['sender_name'], address=row['sender_address']),
+        to=[To(name=name, address=address) for name, address in json.loads(row['recipients'] or '[]')],
+        subject=row['subject'],
+        intro=row['intro'],
+        seen=bool(row['seen']),
+        is_deleted=bool(row['is_deleted']),
+        has_attachments=bool(row['has_attachments']),
+        size=row['size'],
+        download_url=row['download_url'],
+        created_at=datetime.fromisoformat(row['created_at']),
+        updated_at=datetime.fromisoformat(row['updated_at'])
+    )
+
+
+class InboxMirror:
+    """Mirrors inboxes into a local SQLite database and answers queries from it
+
+    `sync` lists an inbox newest first and only writes, and optionally
+    fetches in full, the messages that are new or whose `updated_at`
+    changed. Paging stops at the first unchanged page older than the last
+    sync's high-water mark, unless a full sync is asked for.
+
+    Args:
+        path (str, optional): The database file. Defaults to ':memory:'.
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+        index (SearchIndex, optional): A full-text index kept up to date by every sync. Defaults to None.
+    """
+
+    def __init__(self, path: str = ':memory:', client: MailTmClient = None, index=None) -> None:
+        self.path = path
+        self.client = client
+        self.index = index
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        with self.lock, self.db:
+            self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> 'InboxMirror':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _versions(self, account_id: str) -> dict:
+        rows = self.db.execute(
+            'SELECT id, updated_at FROM messages WHERE account_id = ?', (account_id,)
+        )
+        return {row['id']: row['updated_at'] for row in rows}
+
+    def high_water(self, account_id: str) -> str:
+        """Returns the newest `updated_at` stored by the last sync of an account
+
+        Args:
+            account_id (str): The account's id, as in Message.account_id
+
+        Returns:
+            str: The ISO timestamp, or None if the account was never synced
+        """
+        row = self.db.execute(
+            'SELECT high_water FROM sync_state WHERE account_id = ?', (account_id,)
+        ).fetchone()
+        return row['high_water'] if row else None
+
+    def _account_id(self, token: str, lookup: bool) -> str:
+        # an empty inbox lists no message to read the account from, mail.tm tokens carry it
+        id = decode_jwt(token).get('id')
+        if id is None and lookup:
+            id = accounts.me(token, client=self.client).id
+        return f'/accounts/{id}' if id is not None else None
+
+    def sync(
+        self,
+        token: str,
+        details: bool = False,
+        with_sources: bool = False,
+        full: bool = False
+    ) -> SyncResult:
+        """Brings the mirror of the token's inbox up to date
+
+        Args:
+            token (str): The user bearer token
+            details (bool, optional): Store changed messages as returned by `messages.get`. Defaults to False.
+            with_sources (bool, optional): Store the raw source of new messages. Defaults to False.
+            full (bool, optional): List every page and drop messages deleted on the server, even when the inbox is now empty. Defaults to False.
+
+        Raises:
+            UnauthorizedError: When the token is invalid
+            CannotGetAccountInfoError: When a full sync of an empty inbox can't look up the account
+
+        Returns:
+            SyncResult: What changed
+        """
+        result = None
+        versions: dict = {}
+        high_water = None
+        newest = None
+        listed: set[str] = set()
+
+        def fetch(page: int):
+            return messages.getall(page, token, client=self.client, raw=True)
+
+        for page in iter_pages(fetch):
+            if result is None:
+                result = SyncResult(account_id=page.member[0].account_id)
+                with self.lock:
+                    versions = self._versions(result.account_id)
+                    high_water = self.high_water(result.account_id)
+            result.pages += 1
+
+            changed = []
+            for message in page.member:
+                listed.add(message.id)
+                updated_at = message.updated_at.isoformat()
+                newest = max(newest or updated_at, updated_at)
+                if versions.get(message.id) != updated_at:
+                    changed.append(message)
+
+            rows = []
+            for message in changed:
+                if details:
+                    message = messages.get(message.id, token, client=self.client)
+                source = None
+                if with_sources and message.id not in versions:
+                    source = sources.get(message.id, token, client=self.client).data
+                rows.append((message, source))
+
+            with self.lock, self.db:
+                for message, source in rows:
+                    self.db.execute(UPSERT, _row(result.account_id, message) + (source,))
+                    if message.id in versions:
+                        result.updated += 1
+                    else:
+                        result.added += 1
+            if self.index is not None:
+                self.index.add_many(
+                    (message, _parsed(source or self.source(message.id)))
+                    for message, source in rows
+                )
+
+            oldest = page.member[-1].created_at.isoformat()
+            if not full and not changed and high_water is not None and oldest <= high_water:
+                break
+
+        if result is None:
+            result = SyncResult(account_id=self._account_id(token, lookup=full))
+            if result.account_id is None:
+                return result
+            with self.lock:
+                versions = self._versions(result.account_id)
+                high_water = self.high_water(result.account_id)
+
+        with self.lock, self.db:
+            if full:
+                removed = set(versions) - listed
+                self.db.executemany(
+                    'DELETE FROM messages WHERE account_id = ? AND id = ?',
+                    [(result.account_id, id) for id in removed]
+                )
+                result.removed = len(removed)
+                if self.index is not None:
+                    for id in removed:
+                        self.index.remove(id)
+            high_water = max(filter(None, (high_water, newest)), default=None)
+            self.db.execute(
+                'INSERT OR REPLACE INTO sync_state (account_id, high_water, synced_at) VALUES (?, ?, ?)',
+                (result.account_id, high_water, datetime.now(timezone.utc).isoformat())
+            )
+        return result
+
+    def query(
+        self,
+        account_id: str = None,
+        unseen: bool = None,
+        sender: str = None,
+        subject: str = None,
+        since: datetime = None,
+        until: datetime = None,
+        limit: int = None
+    ) -> list[Message]:
+        """Finds mirrored messages without touching the network
+
+        Args:
+            account_id (str, optional): Only this account. Defaults to None.
+            unseen (bool, optional): Only unseen (True) or seen (False) messages. Defaults to None.
+            sender (str, optional): Sender address contains this text. Defaults to None.
+            subject (str, optional): Subject contains this text. Defaults to None.
+            since (datetime, optional): Created at or after this naive UTC time. Defaults to None.
+            until (datetime, optional): Created before this naive UTC time. Defaults to None.
+            limit (int, optional): Maximum number of messages. Defaults to None.
+
+        Returns:
+            list[Message]: The messages, newest first
+        """
+        clauses, params = [], []
+        if account_id is not None:
+            clauses.append('account_id = ?')
+            params.append(account_id)
+        if unseen is not None:
+            clauses.append('seen = ?')
+            params.append(0 if unseen else 1)
+        if sender is not None:
+            clauses.append("sender_address LIKE ? ESCAPE '\\'")
+            params.append(f'%{_escape(sender)}%')
+        if subject is not None:
+            clauses.append("subject LIKE ? ESCAPE '\\'")
+            params.append(f'%{_escape(subject)}%')
+        if since is not None:
+            clauses.append('created_at >= ?')
+            params.append(since.isoformat())
+        if until is not None:
+            clauses.append('created_at < ?')
+            params.append(until.isoformat())
+
+        sql = f'SELECT {COLUMNS} FROM messages'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY created_at DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with self.lock:
+            return [_message(row) for row in self.db.execute(sql, params)]
+
+    def unseen(self, account_id: str = None) -> list[Message]:
+        """Returns the unseen mirrored messages, newest first"""
+        return self.query(account_id=account_id, unseen=True)
+
+    def get(self, id: str) -> Message:
+        """Returns a mirrored message by its id, or None"""
+        with self.lock:
+            row = self.db.execute(f'SELECT {COLUMNS} FROM messages WHERE id = ?', (id,)).fetchone()
+        return _message(row) if row else None
+
+    def source(self, id: str) -> Union[str, None]:
+        """Returns the mirrored raw source of a message, or None"""
+        with self.lock:
+            row = self.db.execute('SELECT source FROM messages WHERE id = ?', (id,)).fetchone()
+        return row['source'] if row else None
@@ -1,16 +1,16 @@
 import json
-import requests
-from pymailtm.models import Token
-from pymailtm import BASE_URL, SUCCESS_CODES
+from pymailtm import SUCCESS_CODES, decoder
+from pymailtm.client import MailTmClient, get_default_client
 from pymailtm.models.errors import CannotGetTokenError
 
 
-def get_token(address: str, password: str):
+def get_token(address: str, password: str, client: MailTmClient = None):
     """Gets the accounts bearer token
 
     Args:
         address (str): The Accounts address. Example user@example.com, The domain should be mail.tm's domain
         password (str): Account's password.
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
 
     Raises:
         CannotGetTokenError: When the username or password doesn't match the account
@@ -18,7 +18,8 @@ def get_token(address: str, password: str):
     Returns:
         Account: The account object
     """
-    url = BASE_URL + '/token'
+    client = client or get_default_client()
+    path = '/token'
     body = {
         'address': address,
         'password': password
@@ -26,8 +27,8 @@ def get_token(address: str, password: str):
     headers = {
         'content-type': 'application/ld+json',
     }
-    response = requests.post(
-        url=url, 
+    response = client.post(
+        path,
         data=json.dumps(body), 
         headers=headers
     )
@@ -38,8 +39,4 @@ def get_token(address: str, password: str):
                 full_response=response.text
             )
     
-    response = response.json()
-    return Token(
-        id=response.get('id'),
-        token=response.get('token')
-    )
\ No newline at end of file
+    return decoder.parse_token(decoder.json_body(response))
@@ -1 +1,12 @@
-from .misc import Token
\ No newline at end of file
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .misc import Token
+
+
+def __getattr__(name: str):
+    # imported on first use, so that `pymailtm.models.errors` stays cheap
+    if name == 'Token':
+        from .misc import Token
+        return Token
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
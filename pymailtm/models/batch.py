@@ -0,0 +1,30 @@
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass(slots=True)
+class BatchResult:
+    id: str
+    value: Any = None
+    error: Exception = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(slots=True)
+class BatchReport:
+    results: list[BatchResult] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return all(result.ok for result in self.results)
+
+    @property
+    def succeeded(self) -> list[str]:
+        return [result.id for result in self.results if result.ok]
+
+    @property
+    def errors(self) -> dict[str, Exception]:
+        return {result.id: result.error for result in self.results if not result.ok}
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class View:
     _id: str
     _type: str
@@ -10,7 +11,7 @@ class View:
     next: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Mapping:
     _type: str
     variable: str
@@ -18,9 +19,10 @@ class Mapping:
     required: bool
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Search:
     _type: str
     template: str
     variable_representation: str
-    mapping: Mapping
+    mapping: list[Mapping]
+
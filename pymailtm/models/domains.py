@@ -1,12 +1,9 @@
 from dataclasses import dataclass
 from datetime import datetime
-from pymailtm.models.common import (
-    View,
-    Search
-)
+from pymailtm.models.common import View, Search
 
 
-@dataclass
+@dataclass(slots=True)
 class Domain:
     _id: str
     _type: str
@@ -19,8 +16,8 @@ class Domain:
     updated_at: datetime
 
 
-@dataclass
-class Domains():
+@dataclass(slots=True)
+class Domains:
     member: list[Domain]
     total_items: int
     view: View
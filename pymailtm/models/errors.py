@@ -17,6 +17,9 @@ class MailTmError(Exception):
     def full_response(self) -> str:
         return self._full_response
 
+    def __reduce__(self):
+        return self.__class__, (self._message, self._status_code, self._full_response)
+
 
 class UnauthorizedError(MailTmError):
     def __init__(self, message: str, status_code: int, full_response: str) -> None:
@@ -60,4 +63,17 @@ class CannotDeleteMessageError(MailTmError):
 
 class CannotGetSourceError(MailTmError):
     def __init__(self, message: str, status_code: int, full_response: str) -> None:
-        super().__init__(message, status_code, full_response)
\ No newline at end of file
+        super().__init__(message, status_code, full_response)
+
+class RateLimitError(MailTmError):
+    def __init__(self, message: str, status_code: int, full_response: str, retry_after: float = None) -> None:
+        super().__init__(message, status_code, full_response)
+        self._retry_after = retry_after
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds the server asked to wait before the next request, None if it didn't say"""
+        return self._retry_after
+
+    def __reduce__(self):
+        return self.__class__, (self._message, self._status_code, self._full_response, self._retry_after)
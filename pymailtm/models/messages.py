@@ -1,22 +1,19 @@
 from dataclasses import dataclass
 from datetime import datetime
-from pymailtm.models.common import (
-    View, 
-    Search
-)
+from pymailtm.models.common import View, Search
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class From:
     name: str
     address: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class To(From):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class Message:
     _id: str
     _type: str
@@ -37,9 +34,9 @@ class Message:
     updated_at: datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class Messages:
     member: list[Message]
     total_items: int
     view: View
-    search: Search
\ No newline at end of file
+    search: Search
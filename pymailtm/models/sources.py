@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(slots=True)
 class Source:
     _id: str
     _type: str
@@ -8,3 +8,10 @@ class Source:
     id: str
     download_url: str
     data: str
+
+
+@dataclass(slots=True)
+class Download:
+    path: str
+    size: int
+    digest: str
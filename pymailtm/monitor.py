@@ -0,0 +1,472 @@
+import time
+import heapq
+import queue
+import itertools
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Iterator
+import requests
+from pymailtm import MERCURE_URL, messages
+from pymailtm.client import MailTmClient
+from pymailtm.stream import MessageStream
+from pymailtm.tokens import TokenManager
+from pymailtm.wait import Backoff
+from pymailtm.models.messages import Message
+from pymailtm.models.errors import (
+    CannotGetTokenError,
+    MailTmError,
+    UnauthorizedError
+)
+
+
+@dataclass
+class InboxEvent:
+    address: str
+    account_id: str
+    message: Message = None
+    error: Exception = None
+
+
+@dataclass
+class MonitorStats:
+    inboxes: int
+    streams: int
+    polls: int
+    requests: int
+    events: int
+    errors: int
+    requests_per_second: float
+    lag: float
+    max_lag: float
+    schedule_lag: float
+
+
+@dataclass
+class _Inbox:
+    address: str
+    backoff: Backoff
+    stream: bool = False
+    account_id: str = None
+    due: float = 0
+    state: tuple = None
+    seen: set = field(default_factory=set)
+    high_water: datetime = None
+    subscription: MessageStream = None
+    last_event_id: str = None
+    failures: int = 0
+    removed: bool = False
+
+
+class _Metrics:
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self.started = time.monotonic()
+        self.polls = 0
+        self.requests = 0
+        self.events = 0
+        self.errors = 0
+        self._requests: deque = deque()
+        self._lags: deque = deque()
+        self._schedule_lags: deque = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, samples: deque, now: float) -> None:
+        while samples and samples[0][0] < now - self.window:
+            samples.popleft()
+
+    def request(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self._requests.append((now, 1))
+            self._prune(self._requests, now)
+
+    def poll(self, overdue: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.polls += 1
+            self._schedule_lags.append((now, max(overdue, 0)))
+            self._prune(self._schedule_lags, now)
+
+    def event(self, message: Message) -> None:
+        now = time.monotonic()
+        lag = None
+        if message is not None and message.created_at is not None:
+            utcnow = datetime.now(timezone.utc).replace(tzinfo=None)
+            lag = max((utcnow - message.created_at).total_seconds(), 0)
+        with self._lock:
+            self.events += 1
+            if lag is not None:
+                self._lags.append((now, lag))
+                self._prune(self._lags, now)
+
+    def error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self, inboxes: int, streams: int) -> MonitorStats:
+        now = time.monotonic()
+        with self._lock:
+            for samples in (self._requests, self._lags, self._schedule_lags):
+                self._prune(samples, now)
+            lags = [lag for _, lag in self._lags]
+            schedule_lags = [lag for _, lag in self._schedule_lags]
+            elapsed = min(max(now - self.started, 1e-9), self.window)
+            return MonitorStats(
+                inboxes=inboxes,
+                streams=streams,
+                polls=self.polls,
+                requests=self.requests,
+                events=self.events,
+                errors=self.errors,
+                requests_per_second=len(self._requests) / elapsed,
+                lag=sum(lags) / len(lags) if lags else 0.0,
+                max_lag=max(lags, default=0.0),
+                schedule_lag=sum(schedule_lags) / len(schedule_lags) if schedule_lags else 0.0
+            )
+
+
+class InboxMonitor:
+    """Watches many inboxes at once and delivers their new messages
+
+    Polled inboxes share a fixed pool of worker threads. Every inbox has its
+    own polling interval, reset to `min_interval` when a message arrives and
+    grown up to `max_interval` while it stays idle, and workers always poll
+    the inbox that is due first, so busy inboxes are polled often and idle
+    ones back off. Inboxes added with `stream=True` are followed over the
+    Mercure hub instead, with one connection each. Tokens are obtained and
+    refreshed through a TokenManager.
+
+    New messages are passed to `callback` when given, and otherwise put on
+    `events` to be read with `get` or by iterating over the monitor.
+
+    Args:
+        workers (int, optional): Number of polling threads. Defaults to 8.
+        callback (Callable[[InboxEvent], None], optional): Called from a worker thread for every event. Defaults to None.
+        min_interval (float, optional): Seconds between polls of an active inbox. Defaults to 2.
+        max_interval (float, optional): Seconds between polls of an idle inbox. Defaults to 60.
+        factor (float, optional): The growth of the interval after every idle poll. Defaults to 1.5.
+        backlog (bool, optional): Also deliver the messages already in an inbox when it is added. Defaults to False.
+        fetch (bool, optional): Deliver messages from `messages.get` instead of the listing. Defaults to False.
+        max_failures (int, optional): Consecutive failed polls after which an inbox is dropped. Defaults to 5.
+        window (float, optional): Seconds of history behind the rate and lag metrics. Defaults to 60.
+        hub_url (str, optional): The Mercure hub of streamed inboxes. Defaults to MERCURE_URL.
+        tokens (TokenManager, optional): The token cache. Defaults to a TokenManager on the client.
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        callback: Callable[[InboxEvent], None] = None,
+        min_interval: float = 2,
+        max_interval: float = 60,
+        factor: float = 1.5,
+        backlog: bool = False,
+        fetch: bool = False,
+        max_failures: int = 5,
+        window: float = 60,
+        hub_url: str = MERCURE_URL,
+        tokens: TokenManager = None,
+        client: MailTmClient = None
+    ) -> None:
+        self.workers = workers
+        self.callback = callback
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.backlog = backlog
+        self.fetch = fetch
+        self.max_failures = max_failures
+        self.hub_url = hub_url
+        self.client = client
+        self.tokens = tokens or TokenManager(client)
+        self.events: queue.Queue = queue.Queue()
+        self.metrics = _Metrics(window)
+        self._inboxes: dict[str, _Inbox] = {}
+        self._heap: list = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._stopped = False
+
+    def add(self, address: str, password: str = None, stream: bool = False, since: datetime = None) -> None:
+        """Starts watching an inbox, it is polled right away
+
+        Args:
+            address (str): The account's address
+            password (str, optional): The account's password. Defaults to the one registered in `tokens`.
+            stream (bool, optional): Follow the inbox over the Mercure hub instead of polling it. Defaults to False.
+            since (datetime, optional): Deliver the messages created from this naive UTC time on found by the first poll. Defaults to None.
+        """
+        if password is not None:
+            self.tokens.add(address, password)
+        inbox = _Inbox(
+            address=address,
+            backoff=Backoff(self.min_interval, self.max_interval, self.factor),
+            stream=stream,
+            high_water=since
+        )
+        self.remove(address)
+        with self._cond:
+            self._inboxes[address] = inbox
+            self._schedule(inbox, 0)
+
+    def remove(self, address: str) -> None:
+        """Stops watching an inbox
+
+        Args:
+            address (str): The account's address
+        """
+        with self._cond:
+            inbox = self._inboxes.pop(address, None)
+            if inbox is None:
+                return
+            inbox.removed = True
+        if inbox.subscription is not None:
+            inbox.subscription.close()
+
+    def _schedule(self, inbox: _Inbox, delay: float) -> None:
+        inbox.due = time.monotonic() + delay
+        heapq.heappush(self._heap, (inbox.due, next(self._sequence), inbox))
+        self._cond.notify()
+
+    def _next(self) -> tuple:
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, inbox = self._heap[0]
+                if inbox.removed:
+                    heapq.heappop(self._heap)
+                    continue
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                return inbox, -delay
+            return None, 0
+
+    def _work(self) -> None:
+        while True:
+            inbox, overdue = self._next()
+            if inbox is None:
+                return
+            self.metrics.poll(overdue)
+            try:
+                if inbox.stream:
+                    self._subscribe(inbox, last_event_id=inbox.last_event_id)
+                    continue
+                active = self._poll(inbox)
+                inbox.failures = 0
+                if active:
+                    inbox.backoff.reset()
+                delay = inbox.backoff.next()
+            except (CannotGetTokenError, KeyError) as e:
+                self._fail(inbox, e, drop=True)
+                continue
+            except (MailTmError, requests.RequestException) as e:
+                if not self._fail(inbox, e):
+                    continue
+                delay = min(self.max_interval, self.min_interval * 2 ** inbox.failures)
+            except Exception as e:
+                # e.g. a raising callback or an unexpected response, the worker has to survive it
+                if not self._report(inbox, e):
+                    continue
+                delay = min(self.max_interval, self.min_interval * 2 ** inbox.failures)
+            with self._cond:
+                if not inbox.removed and not self._stopped:
+                    self._schedule(inbox, delay)
+
+    def _fail(self, inbox: _Inbox, error: Exception, drop: bool = False) -> bool:
+        self.metrics.error()
+        inbox.failures += 1
+        if drop or inbox.failures >= self.max_failures:
+            if self._inboxes.get(inbox.address) is inbox:
+                self.remove(inbox.address)
+            self._deliver(InboxEvent(inbox.address, inbox.account_id, error=error))
+            return False
+        return True
+
+    def _report(self, inbox: _Inbox, error: Exception) -> bool:
+        try:
+            if not self._fail(inbox, error):
+                return False
+            self._deliver(InboxEvent(inbox.address, inbox.account_id, error=error))
+        except Exception:
+            pass
+        return True
+
+    def _list(self, inbox: _Inbox, page: int):
+        self.metrics.request()
+        return self.tokens.call(inbox.address, messages.getall, page, client=self.client, raw=True)
+
+    def _poll(self, inbox: _Inbox) -> bool:
+        page = self._list(inbox, 1)
+        newest = page.member[0] if page.member else None
+        state = (page.total_items, newest.id if newest else None)
+        if state == inbox.state:
+            return False
+
+        first = inbox.state is None
+        inbox.state = state
+        seen = inbox.seen
+        high_water = inbox.high_water
+        inbox.seen = {message.id for message in page.member}
+        if newest is not None:
+            inbox.account_id = newest.account_id
+            inbox.high_water = max(high_water or newest.created_at, newest.created_at)
+        if first and not self.backlog and high_water is None:
+            return False
+
+        arrived = []
+        number = 1
+        while page is not None:
+            for message in page.member:
+                if message.id in seen or (high_water is not None and message.created_at < high_water):
+                    page = None
+                    break
+                arrived.append(message)
+            else:
+                number += 1
+                page = self._list(inbox, number) if page.view.next else None
+
+        for message in reversed(arrived):
+            if self.fetch:
+                self.metrics.request()
+                message = self.tokens.call(inbox.address, messages.get, message.id, client=self.client)
+            else:
+                message = message.to_message()
+            self.metrics.event(message)
+            self._deliver(InboxEvent(inbox.address, message.account_id, message=message))
+        return bool(arrived)
+
+    def _subscribe(self, inbox: _Inbox, stale: str = None, last_event_id: str = None) -> None:
+        self.metrics.request()
+        token = self.tokens.refresh(inbox.address, stale=stale) if stale else self.tokens.get(inbox.address)
+        stream = MessageStream(token.id, token.token, last_event_id, hub_url=self.hub_url, client=self.client)
+        with self._cond:
+            if inbox.removed or self._stopped:
+                return
+            inbox.account_id = token.id
+            inbox.subscription = stream
+        self._start(lambda: self._follow(inbox, stream))
+
+    def _follow(self, inbox: _Inbox, stream: MessageStream) -> None:
+        try:
+            for message in stream:
+                inbox.failures = 0
+                self.metrics.event(message)
+                self._deliver(InboxEvent(inbox.address, inbox.account_id, message=message))
+        except UnauthorizedError:
+            if inbox.removed or self._stopped:
+                return
+            try:
+                self._subscribe(inbox, stale=stream.token, last_event_id=stream.last_event_id)
+            except MailTmError as e:
+                self._fail(inbox, e, drop=True)
+            except Exception as e:
+                self._resubscribe(inbox, stream, e)
+        except MailTmError as e:
+            self._fail(inbox, e, drop=True)
+        except Exception as e:
+            # e.g. a connection error the stream gave up on or a malformed message
+            self._resubscribe(inbox, stream, e)
+
+    def _resubscribe(self, inbox: _Inbox, stream: MessageStream, error: Exception) -> None:
+        if inbox.removed or self._stopped or not self._report(inbox, error):
+            return
+        # the event that failed was already consumed, resuming after it skips it
+        inbox.last_event_id = stream.last_event_id
+        delay = min(self.max_interval, self.min_interval * 2 ** inbox.failures)
+        with self._cond:
+            if not inbox.removed and not self._stopped:
+                self._schedule(inbox, delay)
+
+    def _deliver(self, event: InboxEvent) -> None:
+        if self.callback is None:
+            self.events.put(event)
+            return
+        try:
+            self.callback(event)
+        except Exception:
+            self.metrics.error()
+
+    def _start(self, target: Callable[[], None]) -> None:
+        thread = threading.Thread(target=target, daemon=True)
+        with self._cond:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            self._threads.append(thread)
+        thread.start()
+
+    def start(self) -> 'InboxMonitor':
+        """Starts the worker threads
+
+        Returns:
+            InboxMonitor: The monitor
+        """
+        with self._cond:
+            self._stopped = False
+        for _ in range(self.workers):
+            self._start(self._work)
+        return self
+
+    def stop(self, timeout: float = None) -> None:
+        """Stops the workers and closes the streams, events already queued are kept
+
+        Args:
+            timeout (float, optional): Seconds to wait for every thread. Defaults to None.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            subscriptions = [inbox.subscription for inbox in self._inboxes.values() if inbox.subscription]
+        for subscription in subscriptions:
+            subscription.close()
+        with self._cond:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def get(self, timeout: float = None) -> InboxEvent:
+        """Waits for the next event, when no callback is set
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None, forever.
+
+        Raises:
+            queue.Empty: When nothing arrived within timeout
+
+        Returns:
+            InboxEvent: The event
+        """
+        return self.events.get(timeout=timeout)
+
+    def __iter__(self) -> Iterator[InboxEvent]:
+        while True:
+            yield self.get()
+
+    def stats(self) -> MonitorStats:
+        """Returns the counters and the rate and lag over the last `window` seconds
+
+        `lag` is the time from a message's `created_at` to its delivery and
+        `schedule_lag` how late polls started, which grows when the workers
+        can't keep up.
+
+        Returns:
+            MonitorStats: The metrics
+        """
+        with self._cond:
+            inboxes = len(self._inboxes)
+            streams = sum(1 for inbox in self._inboxes.values() if inbox.subscription is not None)
+        return self.metrics.snapshot(inboxes, streams)
+
+    def __enter__(self) -> 'InboxMonitor':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
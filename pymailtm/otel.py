@@ -0,0 +1,86 @@
+from typing import Iterable
+from pymailtm import domains, messages
+from pymailtm.cache import TTLCache
+from pymailtm.instrumentation import Hook, RequestInfo
+
+try:
+    from opentelemetry import metrics, trace
+except ImportError:
+    metrics = trace = None
+
+
+class OpenTelemetryHook(Hook):
+    """Records the requests as OpenTelemetry metrics and client spans
+
+    Requires opentelemetry-api, install it with `pip install opentelemetry-api`,
+    and an SDK to export anything. The attributes follow the HTTP semantic
+    conventions, with the endpoint as `url.template`.
+
+    Args:
+        meter_provider (metrics.MeterProvider, optional): The meter provider. Defaults to the global one.
+        tracer_provider (trace.TracerProvider, optional): The tracer provider. Defaults to the global one.
+        spans (bool, optional): Record a span for every request. Defaults to True.
+        caches (dict[str, TTLCache], optional): The caches to report, by name. Defaults to the domains and messages caches.
+    """
+
+    def __init__(
+        self,
+        meter_provider: 'metrics.MeterProvider' = None,
+        tracer_provider: 'trace.TracerProvider' = None,
+        spans: bool = True,
+        caches: dict[str, TTLCache] = None
+    ) -> None:
+        if metrics is None:
+            raise ImportError('OpenTelemetryHook requires opentelemetry, install it with `pip install opentelemetry-api`')
+        self.caches = caches if caches is not None else {'domains': domains.cache, 'messages': messages.cache}
+        meter = metrics.get_meter('pymailtm', meter_provider=meter_provider)
+        self.duration = meter.create_histogram(
+            'http.client.request.duration', unit='s', description='Time until the response headers'
+        )
+        self.retries = meter.create_counter('pymailtm.client.retries', unit='{request}', description='Retried requests')
+        self.sent = meter.create_counter('http.client.request.body.size', unit='By', description='Request body bytes')
+        self.received = meter.create_counter('http.client.response.body.size', unit='By', description='Response body bytes')
+        meter.create_observable_gauge(
+            'pymailtm.cache.hit_ratio', callbacks=[self._observe_caches], unit='1', description='Share of fresh cache lookups'
+        )
+        self.tracer = trace.get_tracer('pymailtm', tracer_provider=tracer_provider) if spans else None
+        self._spans: dict[int, 'trace.Span'] = {}
+
+    def _observe_caches(self, options) -> Iterable['metrics.Observation']:
+        for name, cache in self.caches.items():
+            yield metrics.Observation(cache.hit_ratio, {'pymailtm.cache': name})
+
+    def request_start(self, info: RequestInfo) -> None:
+        attributes = {'http.request.method': info.method, 'url.template': info.endpoint}
+        if info.attempt:
+            self.retries.add(1, attributes)
+            attributes['http.request.resend_count'] = info.attempt
+        if self.tracer is not None:
+            attributes['url.full'] = info.url
+            self._spans[id(info)] = self.tracer.start_span(
+                f'{info.method} {info.endpoint}', kind=trace.SpanKind.CLIENT, attributes=attributes
+            )
+
+    def request_end(self, info: RequestInfo) -> None:
+        attributes = {'http.request.method': info.method, 'url.template': info.endpoint}
+        if info.error is not None:
+            attributes['error.type'] = type(info.error).__qualname__
+        else:
+            attributes['http.response.status_code'] = info.status_code
+            if info.status_code >= 400:
+                attributes['error.type'] = str(info.status_code)
+        self.duration.record(info.duration, attributes)
+        if info.bytes_sent:
+            self.sent.add(info.bytes_sent, attributes)
+        if info.bytes_received:
+            self.received.add(info.bytes_received, attributes)
+
+        span = self._spans.pop(id(info), None)
+        if span is None:
+            return
+        span.set_attributes(attributes)
+        if info.error is not None:
+            span.record_exception(info.error)
+        if 'error.type' in attributes:
+            span.set_status(trace.Status(trace.StatusCode.ERROR))
+        span.end()
@@ -0,0 +1,187 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+from urllib.parse import parse_qs, urlsplit
+from pymailtm import domains, messages
+from pymailtm.client import MailTmClient
+from pymailtm.models.common import View
+from pymailtm.models.domains import Domain
+from pymailtm.models.messages import Message
+
+
+def next_page(view: View) -> int:
+    """Reads the page number of a collection's `hydra:next` link
+
+    Args:
+        view (View): The collection view
+
+    Returns:
+        int: The next page number, or None on the last page
+    """
+    if view is None or not view.next:
+        return None
+    page = parse_qs(urlsplit(view.next).query).get('page')
+    return int(page[0]) if page else None
+
+
+def iter_pages(fetch: Callable[[int], Any], page: int = 1, read_ahead: bool = False) -> Iterator[Any]:
+    """Yields hydra collection pages, following `hydra:next` lazily
+
+    Args:
+        fetch (Callable[[int], Any]): Returns the collection of a page number, e.g. `domains.get`
+        page (int, optional): The first page. Defaults to 1.
+        read_ahead (bool, optional): Fetch the next page in a background thread while the current one is consumed. Defaults to False.
+
+    Yields:
+        Any: The collections, e.g. Messages or Domains
+    """
+    if not read_ahead:
+        while page is not None:
+            collection = fetch(page)
+            if not collection.member:
+                return
+            yield collection
+            page = next_page(collection.view)
+        return
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    future = pool.submit(fetch, page)
+    try:
+        while future is not None:
+            collection = future.result()
+            if not collection.member:
+                return
+            page = next_page(collection.view)
+            future = pool.submit(fetch, page) if page is not None else None
+            yield collection
+    finally:
+        if future is not None:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+
+def iter_messages(
+    token: str,
+    page: int = 1,
+    read_ahead: bool = False,
+    client: MailTmClient = None,
+    raw: bool = False
+) -> Iterator[Message]:
+    """Yields every Message of an account one at a time, fetching pages on demand
+
+    Args:
+        token (str): The user bearer token
+        page (int, optional): The first page. Defaults to 1.
+        read_ahead (bool, optional): Prefetch the next page in the background. Defaults to False.
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+        raw (bool, optional): Yield RawMessage views, see `messages.getall`. Defaults to False.
+
+    Raises:
+        UnauthorizedError: When the token is invalid
+        CannotGetMessageError: When a page can't be fetched
+
+    Yields:
+        Message: The messages, newest first
+    """
+    def fetch(page: int):
+        return messages.getall(page, token, client=client, raw=raw)
+
+    for collection in iter_pages(fetch, page, read_ahead):
+        yield from collection.member
+
+
+def iter_domains(
+    page: int = 1,
+    read_ahead: bool = False,
+    client: MailTmClient = None,
+    use_cache: bool = True
+) -> Iterator[Domain]:
+    """Yields every Domain one at a time, fetching pages on demand
+
+    Args:
+        page (int, optional): The first page. Defaults to 1.
+        read_ahead (bool, optional): Prefetch the next page in the background. Defaults to False.
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+        use_cache (bool, optional): Use the domain cache. Defaults to True.
+
+    Raises:
+        CannotGetDomainError: When a page can't be fetched
+
+    Yields:
+        Domain: The domains
+    """
+    def fetch(page: int):
+        return domains.get(page, client=client, use_cache=use_cache)
+
+    for collection in iter_pages(fetch, page, read_ahead):
+        yield from collection.member
+
+
+async def aiter_pages(
+    fetch: Callable[[int], Awaitable[Any]],
+    page: int = 1,
+    read_ahead: bool = False
+) -> AsyncIterator[Any]:
+    """The asyncio counterpart of `iter_pages`, prefetching with a task instead of a thread"""
+    task = asyncio.ensure_future(fetch(page))
+    try:
+        while task is not None:
+            collection = await task
+            task = None
+            if not collection.member:
+                return
+            page = next_page(collection.view)
+            if page is not None and read_ahead:
+                task = asyncio.ensure_future(fetch(page))
+            yield collection
+            if page is not None and task is None:
+                task = asyncio.ensure_future(fetch(page))
+    finally:
+        if task is not None:
+            task.cancel()
+
+
+async def aiter_messages(
+    client,
+    token: str,
+    page: int = 1,
+    read_ahead: bool = False,
+    raw: bool = False
+) -> AsyncIterator[Message]:
+    """Yields every Message of an account through an AsyncMailTm, see `iter_messages`
+
+    Args:
+        client (AsyncMailTm): The client used to send the requests
+        token (str): The user bearer token
+        page (int, optional): The first page. Defaults to 1.
+        read_ahead (bool, optional): Prefetch the next page while the current one is consumed. Defaults to False.
+        raw (bool, optional): Yield RawMessage views, see `messages.getall`. Defaults to False.
+
+    Yields:
+        Message: The messages, newest first
+    """
+    async def fetch(page: int):
+        return await client.get_messages(page, token, raw=raw)
+
+    async for collection in aiter_pages(fetch, page, read_ahead):
+        for message in collection.member:
+            yield message
+
+
+async def aiter_domains(client, page: int = 1, read_ahead: bool = False) -> AsyncIterator[Domain]:
+    """Yields every Domain through an AsyncMailTm, see `iter_domains`
+
+    Args:
+        client (AsyncMailTm): The client used to send the requests
+        page (int, optional): The first page. Defaults to 1.
+        read_ahead (bool, optional): Prefetch the next page while the current one is consumed. Defaults to False.
+
+    Yields:
+        Domain: The domains
+    """
+    async def fetch(page: int):
+        return await client.get_domains(page)
+
+    async for collection in aiter_pages(fetch, page, read_ahead):
+        for domain in collection.member:
+            yield domain
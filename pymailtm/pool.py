@@ -0,0 +1,303 @@
+import time
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+from pymailtm import accounts, messages
+from pymailtm.batch import ERRORS
+from pymailtm.client import MailTmClient
+from pymailtm.metrics import Histogram
+from pymailtm.misc import get_token
+from pymailtm.pagination import iter_domains
+from pymailtm.provision import ProvisionedAccount, Provisioner, _usable_domains
+from pymailtm.tokens import jwt_expiry
+
+# Upper bounds of the lease wait histogram, in seconds
+WAIT_BUCKETS = (0.0001, 0.001, 0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30)
+
+
+@dataclass
+class PoolStats:
+    size: int
+    ready: int
+    leased: int
+    creating: int
+    created: int
+    retired: int
+    failures: int
+    waits: Histogram
+
+    @property
+    def fill(self) -> float:
+        return self.ready / self.size if self.size else 0.0
+
+
+class AccountPool:
+    """Keeps logged in accounts ready so that tests lease one without waiting on mail.tm
+
+    Background threads create accounts through a Provisioner, under its
+    rate budget, until `size` are ready or being created. `lease` takes
+    the oldest ready account, blocking only when the pool is empty, and
+    `give_back` purges its inbox and makes it ready again, or `retire`
+    deletes it and lets the workers replace it. Leased accounts are
+    replaced right away, so more than `size` may be ready once they are
+    given back.
+
+    A token expiring within `leeway` seconds is renewed on lease, so a
+    leased account always has a valid one.
+
+    Args:
+        size (int, optional): Accounts kept ready. Defaults to 8.
+        workers (int, optional): Threads creating accounts. Defaults to 2.
+        rate (float, optional): Requests per second of the refills, None for no limit. Defaults to 2.
+        leeway (float, optional): Seconds before its expiry a token is renewed. Defaults to 60.
+        provisioner (Provisioner, optional): Creates the accounts, its bucket being the budget. Defaults to one built from rate.
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+    """
+
+    def __init__(
+        self,
+        size: int = 8,
+        workers: int = 2,
+        rate: float = 2,
+        leeway: float = 60,
+        provisioner: Provisioner = None,
+        client: MailTmClient = None
+    ) -> None:
+        self.size = size
+        self.workers = workers
+        self.leeway = leeway
+        self.provisioner = provisioner or Provisioner(concurrency=workers, rate=rate, client=client)
+        self.client = client if client is not None else self.provisioner.client
+        self.failures = self.provisioner.failures
+        self._ready: deque[ProvisionedAccount] = deque()
+        self._leased: dict[str, ProvisionedAccount] = {}
+        self._creating = 0
+        self._created = 0
+        self._retired = 0
+        self._waits = Histogram(WAIT_BUCKETS)
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._domains: Iterator[str] = None
+
+    def start(self) -> 'AccountPool':
+        """Lists the domains when the provisioner has none, then starts the workers
+
+        Returns:
+            AccountPool: The pool
+        """
+        if self.provisioner.domains is None:
+            self.provisioner.domains = _usable_domains(iter_domains(client=self.client))
+        self._domains = itertools.cycle(self.provisioner.domains)
+        self._stopped.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'pymailtm-pool-{i}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+        return self
+
+    def _work(self) -> None:
+        failures = 0
+        while True:
+            with self._cond:
+                while not self._stopped.is_set() and len(self._ready) + self._creating >= self.size:
+                    self._cond.wait()
+                if self._stopped.is_set():
+                    return
+                self._creating += 1
+                domain = next(self._domains)
+            try:
+                account = self.provisioner.create(domain)
+            except ERRORS as e:
+                account = None
+                self.failures.append(e)
+            finally:
+                with self._cond:
+                    self._creating -= 1
+            if account is None:
+                # the provisioner already backed off, this only keeps a down API from spinning
+                failures += 1
+                self._stopped.wait(min(2 ** failures, 60))
+                continue
+            failures = 0
+            if self._stopped.is_set():
+                self._delete(account)
+                return
+            with self._cond:
+                self._ready.append(account)
+                self._created += 1
+                self._cond.notify_all()
+
+    def _renew(self, account: ProvisionedAccount) -> None:
+        expiry = jwt_expiry(account.token.token)
+        if expiry is not None and expiry - self.leeway <= time.time():
+            account.token = get_token(account.account.address, account.password, client=self.client)
+
+    def lease(self, timeout: float = None) -> ProvisionedAccount:
+        """Takes a ready account, waiting for one when the pool is empty
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None, forever.
+
+        Raises:
+            TimeoutError: When no account was ready in time
+            RuntimeError: When the pool is closed
+            MailTmError: When the account's expiring token can't be renewed, it is retired
+
+        Returns:
+            ProvisionedAccount: The account, its token and password
+        """
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        with self._cond:
+            while not self._ready:
+                if self._stopped.is_set():
+                    raise RuntimeError('The pool is closed')
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f'No account was ready within {timeout} seconds')
+                self._cond.wait(remaining)
+            account = self._ready.popleft()
+            self._leased[account.account.id] = account
+            self._waits.observe(time.monotonic() - start)
+            self._cond.notify_all()
+        try:
+            self._renew(account)
+        except ERRORS:
+            self.retire(account)
+            raise
+        return account
+
+    def give_back(self, account: ProvisionedAccount, purge: bool = True) -> bool:
+        """Returns a leased account to the pool, with its inbox purged
+
+        An account whose inbox can't be purged is retired instead, as is
+        one given back after the pool was closed. Accounts that aren't
+        leased, e.g. given back twice, are ignored.
+
+        Args:
+            account (ProvisionedAccount): The leased account
+            purge (bool, optional): Delete its messages first. Defaults to True.
+
+        Returns:
+            bool: True if it is ready again, False if it was retired
+        """
+        with self._cond:
+            if account.account.id not in self._leased:
+                return False
+        if purge and not self._stopped.is_set():
+            try:
+                report = messages.purge(account.token.token, client=self.client)
+            except ERRORS:
+                report = None
+            if report is None or not report.ok:
+                self.retire(account)
+                return False
+        with self._cond:
+            if account.account.id not in self._leased:
+                # given back or retired by another thread meanwhile
+                return False
+            if not self._stopped.is_set():
+                del self._leased[account.account.id]
+                self._ready.append(account)
+                self._cond.notify_all()
+                return True
+        self.retire(account)
+        return False
+
+    def _delete(self, account: ProvisionedAccount) -> bool:
+        try:
+            if accounts.delete(account.account.id, account.token.token, client=self.client):
+                return True
+            # the token may have expired while leased
+            token = get_token(account.account.address, account.password, client=self.client)
+            return accounts.delete(account.account.id, token.token, client=self.client)
+        except ERRORS:
+            return False
+
+    def retire(self, account: ProvisionedAccount) -> bool:
+        """Deletes a leased account, the workers create another
+
+        Accounts that aren't leased, e.g. already given back, are ignored.
+
+        Args:
+            account (ProvisionedAccount): The leased account
+
+        Returns:
+            bool: True if mail.tm deleted it
+        """
+        with self._cond:
+            if self._leased.pop(account.account.id, None) is None:
+                return False
+            self._retired += 1
+            self._cond.notify_all()
+        return self._delete(account)
+
+    @contextmanager
+    def leased(self, timeout: float = None, purge: bool = True) -> Iterator[ProvisionedAccount]:
+        """Leases an account for the duration of a with block, then gives it back
+
+        Args:
+            timeout (float, optional): Seconds to wait for an account. Defaults to None, forever.
+            purge (bool, optional): Purge its inbox when given back. Defaults to True.
+
+        Yields:
+            ProvisionedAccount: The account
+        """
+        account = self.lease(timeout)
+        try:
+            yield account
+        finally:
+            self.give_back(account, purge=purge)
+
+    @property
+    def fill(self) -> float:
+        """The share of `size` that is ready to lease"""
+        return len(self._ready) / self.size if self.size else 0.0
+
+    def stats(self) -> PoolStats:
+        """Returns the fill level, the counters and the lease wait times
+
+        Returns:
+            PoolStats: The metrics
+        """
+        with self._cond:
+            return PoolStats(
+                size=self.size,
+                ready=len(self._ready),
+                leased=len(self._leased),
+                creating=self._creating,
+                created=self._created,
+                retired=self._retired,
+                failures=len(self.failures),
+                waits=self._waits.copy()
+            )
+
+    def close(self, retire: bool = True, timeout: float = None) -> None:
+        """Stops the workers and deletes the ready accounts
+
+        Accounts still leased are deleted when given back.
+
+        Args:
+            retire (bool, optional): Delete the ready accounts. Defaults to True.
+            timeout (float, optional): Seconds to wait for every worker. Defaults to None.
+        """
+        with self._cond:
+            self._stopped.set()
+            self._cond.notify_all()
+            ready, self._ready = list(self._ready), deque()
+        threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+        if retire:
+            for account in ready:
+                self._delete(account)
+
+    def __enter__(self) -> 'AccountPool':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,96 @@
+from typing import Iterator
+from pymailtm import domains, messages
+from pymailtm.cache import TTLCache
+from pymailtm.instrumentation import Hook, RequestInfo
+from pymailtm.metrics import DEFAULT_BUCKETS
+
+try:
+    import prometheus_client
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+_LABELS = ('method', 'endpoint')
+
+
+class _CacheCollector:
+    def __init__(self, namespace: str, caches: dict[str, TTLCache]) -> None:
+        self.namespace = namespace
+        self.caches = caches
+
+    def collect(self) -> Iterator:
+        hits = CounterMetricFamily(f'{self.namespace}_cache_hits', 'Fresh cache lookups', labels=['cache'])
+        misses = CounterMetricFamily(f'{self.namespace}_cache_misses', 'Missing or expired cache lookups', labels=['cache'])
+        revalidations = CounterMetricFamily(
+            f'{self.namespace}_cache_revalidations', 'Expired entries revalidated by a 304', labels=['cache']
+        )
+        ratio = GaugeMetricFamily(f'{self.namespace}_cache_hit_ratio', 'Share of fresh cache lookups', labels=['cache'])
+        for name, cache in self.caches.items():
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+            revalidations.add_metric([name], getattr(cache, 'revalidations', 0))
+            ratio.add_metric([name], cache.hit_ratio)
+        yield from (hits, misses, revalidations, ratio)
+
+
+class PrometheusHook(Hook):
+    """Exports the requests and the cache hit ratios as Prometheus metrics
+
+    Requires prometheus_client, install it with `pip install prometheus-client`.
+    Every metric is labelled with the method and the endpoint, expose them
+    with prometheus_client's usual `start_http_server` or `generate_latest`.
+
+    Args:
+        registry (prometheus_client.CollectorRegistry, optional): The registry. Defaults to prometheus_client.REGISTRY.
+        namespace (str, optional): The prefix of the metric names. Defaults to 'pymailtm'.
+        buckets (tuple, optional): The upper bounds of the latency histogram, in seconds. Defaults to DEFAULT_BUCKETS.
+        caches (dict[str, TTLCache], optional): The caches to report, by name. Defaults to the domains and messages caches.
+    """
+
+    def __init__(
+        self,
+        registry: 'prometheus_client.CollectorRegistry' = None,
+        namespace: str = 'pymailtm',
+        buckets: tuple = DEFAULT_BUCKETS,
+        caches: dict[str, TTLCache] = None
+    ) -> None:
+        if prometheus_client is None:
+            raise ImportError('PrometheusHook requires prometheus_client, install it with `pip install prometheus-client`')
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+        options = {'namespace': namespace, 'registry': registry}
+        self.requests = prometheus_client.Counter(
+            'requests', 'Requests sent, retries included', _LABELS + ('status',), **options
+        )
+        self.retries = prometheus_client.Counter('retries', 'Retried requests', _LABELS, **options)
+        self.errors = prometheus_client.Counter(
+            'errors', 'Requests that raised or got a 4xx or 5xx', _LABELS + ('error',), **options
+        )
+        self.in_flight = prometheus_client.Gauge('requests_in_flight', 'Requests waiting for a response', _LABELS, **options)
+        self.duration = prometheus_client.Histogram(
+            'request_duration_seconds', 'Time until the response headers', _LABELS, buckets=buckets, **options
+        )
+        self.sent = prometheus_client.Counter('request_bytes', 'Request body bytes', _LABELS, **options)
+        self.received = prometheus_client.Counter('response_bytes', 'Response body bytes', _LABELS, **options)
+        registry.register(_CacheCollector(namespace, caches if caches is not None else {'domains': domains.cache, 'messages': messages.cache}))
+
+    def request_start(self, info: RequestInfo) -> None:
+        labels = (info.method, info.endpoint)
+        self.in_flight.labels(*labels).inc()
+        if info.attempt:
+            self.retries.labels(*labels).inc()
+        if info.bytes_sent:
+            self.sent.labels(*labels).inc(info.bytes_sent)
+
+    def request_end(self, info: RequestInfo) -> None:
+        labels = (info.method, info.endpoint)
+        self.in_flight.labels(*labels).dec()
+        self.duration.labels(*labels).observe(info.duration)
+        status = str(info.status_code) if info.status_code is not None else ''
+        self.requests.labels(*labels, status).inc()
+        if info.error is not None:
+            self.errors.labels(*labels, type(info.error).__name__).inc()
+        elif info.status_code >= 400:
+            self.errors.labels(*labels, status).inc()
+        if info.bytes_received:
+            self.received.labels(*labels).inc(info.bytes_received)
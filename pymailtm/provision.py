@@ -0,0 +1,221 @@
+import time
+import asyncio
+import itertools
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Iterator
+from pymailtm import accounts
+from pymailtm.batch import ERRORS
+from pymailtm.misc import get_token
+from pymailtm.client import MailTmClient
+from pymailtm.pagination import iter_domains
+from pymailtm.ratelimit import TokenBucket
+from pymailtm.utils import generate_password, generate_username
+from pymailtm.models import Token
+from pymailtm.models.accounts import Account
+
+
+@dataclass
+class ProvisionedAccount:
+    account: Account
+    token: Token
+    password: str
+
+
+def _usable_domains(domains) -> list[str]:
+    names = [domain.domain for domain in domains if domain.is_active and not domain.is_private]
+    if not names:
+        raise ValueError('No active public domain available')
+    return names
+
+
+class Provisioner:
+    """Creates disposable accounts concurrently under a requests per second budget
+
+    Addresses are spread round robin over the active public domains. A
+    failed creation is retried with a fresh address, a failed login only
+    retries the login. API and connection errors are retried with a backoff,
+    accounts that still fail are collected in `failures`.
+
+    Args:
+        concurrency (int, optional): Accounts created in parallel. Defaults to 8.
+        rate (float, optional): Requests per second shared by all workers, None for no limit. Defaults to 5.
+        retries (int, optional): Extra attempts per request. Defaults to 3.
+        domains (list[str], optional): The domains to use. Defaults to every active public domain.
+        username_length (int, optional): Length of generated usernames. Defaults to 12.
+        password_length (int, optional): Length of generated passwords. Defaults to 12.
+        bucket (TokenBucket, optional): A limiter shared with other code. Defaults to one built from rate.
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 8,
+        rate: float = 5,
+        retries: int = 3,
+        domains: list[str] = None,
+        username_length: int = 12,
+        password_length: int = 12,
+        bucket: TokenBucket = None,
+        client: MailTmClient = None
+    ) -> None:
+        self.concurrency = concurrency
+        self.retries = retries
+        self.domains = domains
+        self.username_length = username_length
+        self.password_length = password_length
+        self.bucket = bucket or (TokenBucket(rate) if rate else None)
+        self.client = client
+        self.failures: list[Exception] = []
+
+    def _wait(self) -> None:
+        if self.bucket is not None:
+            self.bucket.acquire()
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = min(2 ** attempt * 0.5, 10)
+        if getattr(error, 'status_code', None) == 429 and self.bucket is not None:
+            self.bucket.pause(delay)
+        return delay
+
+    def create(self, domain: str) -> ProvisionedAccount:
+        """Creates one account on the domain and logs it in
+
+        Args:
+            domain (str): The domain of the address
+
+        Raises:
+            MailTmError: When the last attempt failed
+            requests.RequestException: When the last attempt could not reach the server
+
+        Returns:
+            ProvisionedAccount: The account, its token and password
+        """
+        password = generate_password(self.password_length)
+        account = None
+        for attempt in range(self.retries + 1):
+            try:
+                if account is None:
+                    address = f'{generate_username(self.username_length)}@{domain}'
+                    self._wait()
+                    account = accounts.create(address, password, client=self.client)
+                self._wait()
+                token = get_token(account.address, password, client=self.client)
+                return ProvisionedAccount(account=account, token=token, password=password)
+            except ERRORS as e:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self._backoff(attempt, e))
+
+    def run(self, count: int) -> Iterator[ProvisionedAccount]:
+        """Creates accounts, yielding each one as soon as it is ready
+
+        Args:
+            count (int): The number of accounts
+
+        Yields:
+            ProvisionedAccount: The accounts, in completion order
+        """
+        if self.domains is None:
+            self.domains = _usable_domains(iter_domains(client=self.client))
+        domains = itertools.cycle(self.domains)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self.create, next(domains)) for _ in range(count)]
+            try:
+                for future in as_completed(futures):
+                    try:
+                        yield future.result()
+                    except ERRORS as e:
+                        self.failures.append(e)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+
+def provision(count: int, **options) -> Iterator[ProvisionedAccount]:
+    """Creates accounts concurrently, see `Provisioner` for the options
+
+    Args:
+        count (int): The number of accounts
+
+    Yields:
+        ProvisionedAccount: The accounts, in completion order
+    """
+    yield from Provisioner(**options).run(count)
+
+
+async def aprovision(
+    client,
+    count: int,
+    concurrency: int = 8,
+    rate: float = 5,
+    retries: int = 3,
+    domains: list[str] = None,
+    username_length: int = 12,
+    password_length: int = 12,
+    bucket: TokenBucket = None,
+    failures: list = None
+) -> AsyncIterator[ProvisionedAccount]:
+    """The asyncio counterpart of `provision`, sending requests through an AsyncMailTm
+
+    API errors and httpx transport errors are retried, accounts that still
+    fail are skipped and their errors appended to `failures` like
+    `Provisioner.failures`. Closing the
+    generator early, e.g. with `contextlib.aclosing`, cancels the
+    creations still running.
+
+    Args:
+        client (AsyncMailTm): The client used to send the requests
+        count (int): The number of accounts
+        failures (list, optional): Collects the error of every account that failed. Defaults to None.
+
+    Yields:
+        ProvisionedAccount: The accounts, in completion order
+    """
+    import httpx
+
+    errors = ERRORS + (httpx.TransportError,)
+    bucket = bucket or (TokenBucket(rate) if rate else None)
+    semaphore = asyncio.Semaphore(concurrency)
+    if domains is None:
+        domains = _usable_domains((await client.get_domains()).member)
+    cycle = itertools.cycle(domains)
+
+    async def wait() -> None:
+        if bucket is not None:
+            await bucket.acquire_async()
+
+    async def create(domain: str) -> ProvisionedAccount:
+        password = generate_password(password_length)
+        account = None
+        async with semaphore:
+            for attempt in range(retries + 1):
+                try:
+                    if account is None:
+                        await wait()
+                        account = await client.create_account(
+                            f'{generate_username(username_length)}@{domain}', password
+                        )
+                    await wait()
+                    token = await client.get_token(account.address, password)
+                    return ProvisionedAccount(account=account, token=token, password=password)
+                except errors as e:
+                    if attempt == retries:
+                        raise
+                    delay = min(2 ** attempt * 0.5, 10)
+                    if getattr(e, 'status_code', None) == 429 and bucket is not None:
+                        bucket.pause(delay)
+                    await asyncio.sleep(delay)
+
+    tasks = [asyncio.ensure_future(create(next(cycle))) for _ in range(count)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            try:
+                yield await task
+            except errors as e:
+                if failures is not None:
+                    failures.append(e)
+    finally:
+        for task in tasks:
+            task.cancel()
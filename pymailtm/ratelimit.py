@@ -0,0 +1,187 @@
+import time
+import random
+import asyncio
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pymailtm.models.errors import RateLimitError
+
+
+class TokenBucket:
+    """A token bucket rate limiter shared by threads and asyncio tasks
+
+    Callers reserve a token and are told how long to wait for it, so the
+    bucket can go into debt and waiting never happens under the lock.
+
+    Args:
+        rate (float): Tokens added per second, i.e. the sustained requests per second
+        capacity (float, optional): Maximum burst size. Defaults to rate, at least 1.
+    """
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Takes tokens from the bucket, going into debt if needed
+
+        Args:
+            tokens (float, optional): Tokens to take. Defaults to 1.
+
+        Returns:
+            float: Seconds to wait before the tokens may be used
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Empties the bucket so that no token is available for the given time, e.g. after a 429
+
+        Args:
+            seconds (float): The pause
+        """
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+            self._updated = time.monotonic()
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Blocks the calling thread until the tokens are available
+
+        Args:
+            tokens (float, optional): Tokens to take. Defaults to 1.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: float = 1) -> None:
+        """Waits without blocking the event loop until the tokens are available
+
+        Args:
+            tokens (float, optional): Tokens to take. Defaults to 1.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def retry_after(response) -> float:
+    """Reads a response's Retry-After header, in seconds or as an HTTP date
+
+    Args:
+        response: A requests or httpx response
+
+    Returns:
+        float: The seconds to wait, or None when the header is missing or invalid
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class RetryPolicy:
+    """Decides which failed requests are retried and how long to wait
+
+    A 429 is retried for every method since the server rejected the request
+    without processing it. 5xx responses and connection errors are retried
+    only for idempotent methods.
+
+    Args:
+        retries (int, optional): Extra attempts per request. Defaults to 3.
+        backoff (float, optional): Base of the exponential backoff in seconds. Defaults to 0.5.
+        max_backoff (float, optional): Maximum backoff or Retry-After honoured, in seconds. Defaults to 30.
+        methods (frozenset, optional): Methods retried after 5xx and connection errors. Defaults to IDEMPOTENT_METHODS.
+        statuses (frozenset, optional): Statuses that are retried. Defaults to RETRY_STATUSES.
+    """
+
+    def __init__(
+        self,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30,
+        methods: frozenset = IDEMPOTENT_METHODS,
+        statuses: frozenset = RETRY_STATUSES
+    ) -> None:
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.methods = methods
+        self.statuses = statuses
+
+    def should_retry(self, method: str, attempt: int, status_code: int = None) -> bool:
+        """Tells whether a failed attempt is retried
+
+        Args:
+            method (str): The HTTP method
+            attempt (int): The zero based attempt that failed
+            status_code (int, optional): The response status, None for a connection error. Defaults to None.
+
+        Returns:
+            bool: True to retry
+        """
+        if attempt >= self.retries:
+            return False
+        if status_code == 429:
+            return 429 in self.statuses
+        if status_code is not None and status_code not in self.statuses:
+            return False
+        return method.upper() in self.methods
+
+    def delay(self, attempt: int, response=None) -> float:
+        """Returns the wait before the next attempt, honouring Retry-After
+
+        Args:
+            attempt (int): The zero based attempt that failed
+            response (optional): The failed response. Defaults to None.
+
+        Returns:
+            float: The delay in seconds
+        """
+        if response is not None:
+            wait = retry_after(response)
+            if wait is not None:
+                return min(wait, self.max_backoff)
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+def check_rate_limit(response) -> None:
+    """Raises RateLimitError for a 429 response
+
+    Args:
+        response: A requests or httpx response
+
+    Raises:
+        RateLimitError: When the response is a 429
+    """
+    if response.status_code == 429:
+        raise RateLimitError(
+            message='Too many requests',
+            status_code=response.status_code,
+            full_response=response.text,
+            retry_after=retry_after(response)
+        )
@@ -0,0 +1,213 @@
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Union
+from pymailtm.mime import ParsedMessage
+from pymailtm.models.messages import Message
+from pymailtm.models.sources import Source
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS search_documents (
+    rowid INTEGER PRIMARY KEY,
+    account_id TEXT,
+    message_id TEXT NOT NULL UNIQUE
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    sender, subject, intro, body,
+    content='',
+    contentless_delete=1,
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3 4'
+);
+'''
+
+# Older SQLite builds lack contentless_delete, they keep a copy of the text instead
+FALLBACK_SCHEMA = SCHEMA.replace("    content='',\n    contentless_delete=1,\n", '')
+
+_TAGS = re.compile(r'<[^>]+>')
+_TERMS = re.compile(r'\w+', re.UNICODE)
+
+
+@dataclass
+class SearchHit:
+    message_id: str
+    account_id: str
+    score: float
+
+
+def _body(source: Union[Source, ParsedMessage, str]) -> str:
+    if source is None:
+        return ''
+    if isinstance(source, str):
+        return source
+    parsed = ParsedMessage.from_source(source) if isinstance(source, Source) else source
+    text = parsed.text
+    if text is None and parsed.html is not None:
+        text = _TAGS.sub(' ', parsed.html)
+    return text or ''
+
+
+def to_query(text: str, prefix: bool = True) -> str:
+    """Turns free text into an FTS5 query matching every word
+
+    Args:
+        text (str): The words to look for
+        prefix (bool, optional): Let the last word match as a prefix. Defaults to True.
+
+    Returns:
+        str: The FTS5 query
+    """
+    terms = [f'"{term}"' for term in _TERMS.findall(text)]
+    if prefix and terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    """A SQLite FTS5 full-text index over messages
+
+    Indexes the sender, subject, intro and decoded body, and ranks matches
+    with bm25, weighting the subject and sender above the body. Messages
+    are added or replaced one at a time as they arrive.
+
+    A shared connection must be shared with its lock too, e.g.
+    `SearchIndex(mirror.db, lock=mirror.lock)`, and writes made while its
+    owner has a transaction open join that transaction instead of
+    committing it.
+
+    Args:
+        db (str | sqlite3.Connection, optional): A database path, or a connection to share, e.g. InboxMirror.db. Defaults to ':memory:'.
+        weights (tuple, optional): bm25 weights of sender, subject, intro and body. Defaults to (4, 6, 2, 1).
+        lock (threading.RLock, optional): The lock of a shared connection, e.g. InboxMirror.lock. Defaults to a new lock.
+    """
+
+    def __init__(
+        self,
+        db: Union[str, sqlite3.Connection] = ':memory:',
+        weights: tuple = (4, 6, 2, 1),
+        lock: threading.RLock = None
+    ) -> None:
+        if isinstance(db, sqlite3.Connection):
+            self.db = db
+        else:
+            self.db = sqlite3.connect(db, check_same_thread=False)
+        self.weights = weights
+        self.lock = lock or threading.RLock()
+        with self._transaction():
+            try:
+                self.db.executescript(SCHEMA)
+            except sqlite3.OperationalError:
+                self.db.executescript(FALLBACK_SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        with self.lock:
+            if self.db.in_transaction:
+                # the owner of the shared connection commits or rolls back with its own changes
+                yield
+                return
+            with self.db:
+                yield
+
+    def _add(self, message: Message, body: str) -> None:
+        row = self.db.execute(
+            'SELECT rowid FROM search_documents WHERE message_id = ?', (message.id,)
+        ).fetchone()
+        if row is not None:
+            self.db.execute('DELETE FROM search_index WHERE rowid = ?', (row[0],))
+            self.db.execute('DELETE FROM search_documents WHERE rowid = ?', (row[0],))
+        rowid = self.db.execute(
+            'INSERT INTO search_documents (account_id, message_id) VALUES (?, ?)',
+            (message.account_id, message.id)
+        ).lastrowid
+        sender = message._from
+        self.db.execute(
+            'INSERT INTO search_index (rowid, sender, subject, intro, body) VALUES (?, ?, ?, ?, ?)',
+            (
+                rowid,
+                f'{sender.name or ""} {sender.address or ""}' if sender else '',
+                message.subject or '',
+                message.intro or '',
+                body
+            )
+        )
+
+    def add(self, message: Message, source: Union[Source, ParsedMessage, str] = None) -> None:
+        """Indexes a message, replacing a previous version of it
+
+        Args:
+            message (Message): The message
+            source (Source | ParsedMessage | str, optional): Its source or already decoded body. Defaults to None.
+        """
+        body = _body(source)
+        with self._transaction():
+            self._add(message, body)
+
+    def add_many(self, items: Iterable[tuple]) -> None:
+        """Indexes many `(message, source)` pairs in one transaction
+
+        Args:
+            items (Iterable[tuple]): The messages and their sources, which may be None
+        """
+        items = [(message, _body(source)) for message, source in items]
+        with self._transaction():
+            for message, body in items:
+                self._add(message, body)
+
+    def remove(self, message_id: str) -> None:
+        """Drops a message from the index
+
+        Args:
+            message_id (str): The message's id
+        """
+        with self._transaction():
+            row = self.db.execute(
+                'SELECT rowid FROM search_documents WHERE message_id = ?', (message_id,)
+            ).fetchone()
+            if row is not None:
+                self.db.execute('DELETE FROM search_index WHERE rowid = ?', (row[0],))
+                self.db.execute('DELETE FROM search_documents WHERE rowid = ?', (row[0],))
+
+    def search(
+        self,
+        text: str,
+        account_id: str = None,
+        limit: int = 20,
+        prefix: bool = True,
+        raw: bool = False
+    ) -> list[SearchHit]:
+        """Finds the best matching messages
+
+        Args:
+            text (str): The words to look for, or an FTS5 query when raw is True
+            account_id (str, optional): Only this account. Defaults to None.
+            limit (int, optional): Maximum number of hits. Defaults to 20.
+            prefix (bool, optional): Let the last word match as a prefix. Defaults to True.
+            raw (bool, optional): Pass text to FTS5 as is, e.g. 'subject:verify AND code*'. Defaults to False.
+
+        Returns:
+            list[SearchHit]: The hits, best first
+        """
+        query = text if raw else to_query(text, prefix)
+        if not query:
+            return []
+        weights = ', '.join(str(float(weight)) for weight in self.weights)
+        sql = (
+            f'SELECT d.message_id, d.account_id, bm25(search_index, {weights}) AS score '
+            'FROM search_index JOIN search_documents d ON d.rowid = search_index.rowid '
+            'WHERE search_index MATCH ?'
+        )
+        params: list = [query]
+        if account_id is not None:
+            sql += ' AND d.account_id = ?'
+            params.append(account_id)
+        sql += ' ORDER BY score LIMIT ?'
+        params.append(limit)
+        with self.lock:
+            return [SearchHit(*row) for row in self.db.execute(sql, params)]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute('SELECT count(*) FROM search_documents').fetchone()[0]
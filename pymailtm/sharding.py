@@ -0,0 +1,329 @@
+import os
+import queue
+import pickle
+import hashlib
+import threading
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+from multiprocessing.connection import wait
+from typing import Any, Callable, Iterable, Iterator
+from pymailtm.client import MailTmClient
+from pymailtm.monitor import InboxEvent, InboxMonitor, MonitorStats
+
+
+def _weight(key: str, shard: int) -> int:
+    digest = hashlib.blake2b(f'{shard}:{key}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def shard_for(key: str, shards: Iterable[int]) -> int:
+    """Picks the shard of a key by rendezvous hashing
+
+    The result only depends on the key and the set of shards, and removing
+    a shard only moves the keys it owned.
+
+    Args:
+        key (str): The key, e.g. an account's address
+        shards (Iterable[int]): The live shards
+
+    Returns:
+        int: The owning shard, or None when there is none
+    """
+    return max(shards, key=lambda shard: _weight(key, shard), default=None)
+
+
+def _portable(error: Exception) -> Exception:
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(repr(error))
+
+
+def _worker(
+    shard: int,
+    commands: multiprocessing.Queue,
+    output: multiprocessing.Queue,
+    handler: Callable[[InboxEvent], Any],
+    client_options: dict,
+    monitor_options: dict,
+    stats_interval: float
+) -> None:
+    def emit(event: InboxEvent) -> None:
+        if handler is not None and event.error is None:
+            try:
+                value = handler(event)
+            except Exception as e:
+                value = InboxEvent(event.address, event.account_id, message=event.message, error=e)
+            if value is None:
+                return
+        else:
+            value = event
+        if isinstance(value, InboxEvent) and value.error is not None:
+            value.error = _portable(value.error)
+        output.put(('result', value))
+
+    client = MailTmClient(**client_options)
+    monitor = InboxMonitor(callback=emit, client=client, **monitor_options)
+    monitor.start()
+    try:
+        while True:
+            try:
+                command = commands.get(timeout=stats_interval)
+            except queue.Empty:
+                output.put(('stats', monitor.stats()))
+                continue
+            name, args = command
+            if name == 'add':
+                monitor.add(*args)
+            elif name == 'remove':
+                monitor.remove(*args)
+            elif name == 'stop':
+                break
+    finally:
+        monitor.stop(timeout=5)
+        client.close()
+
+
+class ShardedRunner:
+    """Spreads inbox monitoring over several processes
+
+    Every worker process runs its own InboxMonitor, with its own pooled
+    MailTmClient and TokenManager, on the accounts that `shard_for` assigns
+    to it by hashing their address. Events, or whatever `handler` returns
+    for them, come back through a multiprocessing queue per worker, so
+    decoding and MIME parsing done in the handler run on every core, and a
+    worker killed while writing to its queue can't block the others.
+
+    When a worker dies its accounts are handed to the remaining workers,
+    and when `restart` is set a new worker takes its place and gets them
+    back. Accounts of the other workers are never moved. The new owner
+    redelivers the last `replay` seconds of mail of the accounts it takes
+    over, so nothing is lost but some messages may be delivered twice.
+
+    Args:
+        processes (int, optional): Number of worker processes. Defaults to os.cpu_count().
+        handler (Callable[[InboxEvent], Any], optional): A picklable function run in the worker on every new message, None results are dropped. Defaults to None.
+        restart (bool, optional): Replace workers that die. Defaults to True.
+        client_options (dict, optional): Keyword arguments of every worker's MailTmClient. Defaults to None.
+        monitor_options (dict, optional): Keyword arguments of every worker's InboxMonitor. Defaults to None.
+        stats_interval (float, optional): Seconds between the metrics reports of the workers. Defaults to 1.
+        replay (float, optional): Seconds of mail redelivered after a worker died, at least the monitor's max_interval. Defaults to 60.
+        context (str, optional): The multiprocessing start method. Defaults to 'spawn'.
+    """
+
+    def __init__(
+        self,
+        processes: int = None,
+        handler: Callable[[InboxEvent], Any] = None,
+        restart: bool = True,
+        client_options: dict = None,
+        monitor_options: dict = None,
+        stats_interval: float = 1,
+        replay: float = 60,
+        context: str = 'spawn'
+    ) -> None:
+        self.processes = processes or os.cpu_count() or 1
+        self.handler = handler
+        self.restart = restart
+        self.client_options = client_options or {}
+        self.monitor_options = monitor_options or {}
+        self.stats_interval = stats_interval
+        self.replay = replay
+        self.context = multiprocessing.get_context(context)
+        self.results: queue.Queue = queue.Queue()
+        self._workers: dict[int, multiprocessing.Process] = {}
+        self._commands: dict[int, multiprocessing.Queue] = {}
+        self._accounts: dict[str, tuple] = {}
+        self._owners: dict[str, int] = {}
+        self._stats: dict[int, MonitorStats] = {}
+        self._lock = threading.RLock()
+        self._supervisor: threading.Thread = None
+        self._stopped = threading.Event()
+
+    def _spawn(self, shard: int) -> None:
+        commands = self.context.Queue()
+        output = self.context.Queue()
+        process = self.context.Process(
+            target=_worker,
+            args=(
+                shard, commands, output, self.handler,
+                self.client_options, self.monitor_options, self.stats_interval
+            ),
+            name=f'pymailtm-shard-{shard}',
+            daemon=True
+        )
+        process.start()
+        self._workers[shard] = process
+        self._commands[shard] = commands
+        threading.Thread(target=self._forward, args=(shard, process, output), daemon=True).start()
+
+    def _forward(self, shard: int, process: multiprocessing.Process, output: multiprocessing.Queue) -> None:
+        # a worker killed in the middle of a write leaves a torn message, and with it a thread
+        # blocked on its own queue only, so every worker gets its queue and forwarding thread
+        while True:
+            try:
+                kind, value = output.get(timeout=0.5)
+            except queue.Empty:
+                if not process.is_alive():
+                    return
+                continue
+            except (EOFError, OSError, pickle.UnpicklingError):
+                return
+            if kind == 'result':
+                self.results.put((shard, value))
+                continue
+            with self._lock:
+                if self._workers.get(shard) is process:
+                    self._stats[shard] = value
+
+    def _send(self, shard: int, name: str, *args) -> None:
+        self._commands[shard].put((name, args))
+
+    def _assign(self, address: str, since: datetime = None) -> None:
+        owner = shard_for(address, self._workers)
+        previous = self._owners.get(address)
+        if owner == previous:
+            return
+        if previous is not None and previous in self._workers:
+            self._send(previous, 'remove', address)
+        if owner is None:
+            self._owners.pop(address, None)
+            return
+        self._owners[address] = owner
+        self._send(owner, 'add', *self._accounts[address], since)
+
+    def add(self, address: str, password: str, stream: bool = False) -> int:
+        """Starts watching an account on the worker that owns it
+
+        Args:
+            address (str): The account's address
+            password (str): The account's password
+            stream (bool, optional): Follow the inbox over the Mercure hub. Defaults to False.
+
+        Returns:
+            int: The owning shard, None until the runner is started
+        """
+        with self._lock:
+            self._accounts[address] = (address, password, stream)
+            self._owners.pop(address, None)
+            self._assign(address)
+            return self._owners.get(address)
+
+    def add_many(self, accounts: Iterable[tuple]) -> None:
+        """Adds many `(address, password)` pairs, see `add`"""
+        for address, password in accounts:
+            self.add(address, password)
+
+    def remove(self, address: str) -> None:
+        """Stops watching an account
+
+        Args:
+            address (str): The account's address
+        """
+        with self._lock:
+            self._accounts.pop(address, None)
+            owner = self._owners.pop(address, None)
+            if owner is not None and owner in self._workers:
+                self._send(owner, 'remove', address)
+
+    def _rebalance(self, since: datetime = None) -> None:
+        for address in self._accounts:
+            self._assign(address, since)
+
+    def _supervise(self) -> None:
+        while not self._stopped.is_set():
+            with self._lock:
+                sentinels = {process.sentinel: shard for shard, process in self._workers.items()}
+            if not sentinels:
+                self._stopped.wait(0.5)
+                continue
+            for sentinel in wait(list(sentinels), timeout=0.5):
+                with self._lock:
+                    if self._stopped.is_set():
+                        return
+                    shard = sentinels[sentinel]
+                    self._workers.pop(shard).join()
+                    self._commands.pop(shard).close()
+                    self._stats.pop(shard, None)
+                    if self.restart:
+                        self._spawn(shard)
+                    for address, owner in list(self._owners.items()):
+                        if owner == shard:
+                            del self._owners[address]
+                    since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self.replay)
+                    self._rebalance(since)
+
+    def start(self) -> 'ShardedRunner':
+        """Starts the worker processes
+
+        Returns:
+            ShardedRunner: The runner
+        """
+        with self._lock:
+            self._stopped.clear()
+            for shard in range(self.processes):
+                self._spawn(shard)
+            self._owners.clear()
+            self._rebalance()
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+        return self
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stops the workers, terminating the ones still alive after timeout
+
+        Args:
+            timeout (float, optional): Seconds to wait for every worker. Defaults to 10.
+        """
+        self._stopped.set()
+        if self._supervisor is not None:
+            self._supervisor.join()
+        with self._lock:
+            for shard in self._workers:
+                self._send(shard, 'stop')
+            for process in self._workers.values():
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+            self._workers.clear()
+            self._commands.clear()
+            self._owners.clear()
+
+    def get(self, timeout: float = None) -> tuple:
+        """Waits for the next result of any worker
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None, forever.
+
+        Raises:
+            queue.Empty: When nothing arrived within timeout
+
+        Returns:
+            tuple: The shard and the InboxEvent, or the handler's result
+        """
+        return self.results.get(timeout=timeout)
+
+    def __iter__(self) -> Iterator[tuple]:
+        while True:
+            yield self.get()
+
+    def shards(self) -> dict[int, list[str]]:
+        """Returns the addresses owned by every live worker"""
+        with self._lock:
+            shards: dict[int, list[str]] = {shard: [] for shard in self._workers}
+            for address, owner in self._owners.items():
+                shards[owner].append(address)
+            return shards
+
+    def stats(self) -> dict[int, MonitorStats]:
+        """Returns the last metrics reported by every live worker"""
+        with self._lock:
+            return dict(self._stats)
+
+    def __enter__(self) -> 'ShardedRunner':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -1,18 +1,27 @@
-import requests
-from pymailtm import BASE_URL, SUCCESS_CODES
-from pymailtm.models.sources import Source
+import os
+import mmap
+import hashlib
+from typing import BinaryIO, Union
+from pymailtm import SUCCESS_CODES, decoder, messages
+from pymailtm.client import MailTmClient, get_default_client
+from pymailtm.models.sources import Download
 from pymailtm.models.errors import (
     UnauthorizedError,
     CannotGetSourceError
 )
 
 
-def get(id: str, token: str):
+def get(id: str, token: str, client: MailTmClient = None, use_cache: bool = False):
     """Gets a Message's source
 
+    With use_cache the source is served from `messages.cache` unless a
+    listing showed a newer `updated_at` of its message since it was stored.
+
     Args:
         id (str): The id of the source
         token (str): The user bearer token
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
+        use_cache (bool, optional): Use the message cache. Defaults to False.
 
     Raises:
         UnauthorizedError: When the token is invalid or doesn't correspond to the id
@@ -21,12 +30,17 @@ def get(id: str, token: str):
     Returns:
         Source: The source
     """
-    url = BASE_URL + f'/sources/{id}'
+    if use_cache:
+        source = messages.cache.get_source(id)
+        if source is not None:
+            return source
+    client = client or get_default_client()
+    path = f'/sources/{id}'
     headers = {
         'Authorization': f'Bearer {token}',
         'accept': 'application/ld+json',
     }
-    response = requests.get(url=url, headers=headers)
+    response = client.get(path, headers=headers)
     if response.status_code not in SUCCESS_CODES:
         if response.status_code == 401:
             raise UnauthorizedError(
@@ -41,12 +55,103 @@ def get(id: str, token: str):
                 full_response=response.text
             )
     
-    response = response.json()
-    return Source (
-        _id=response.get('@id'),
-        _type=response.get('@type'),
-        _context=response.get('@context'),
-        id=response.get('id'),
-        download_url=response.get('downloadUrl'),
-        data=response.get('data'),
+    source = decoder.parse_source(decoder.json_body(response))
+    if use_cache:
+        messages.cache.set_source(source)
+    return source
+
+
+def _open_sink(sink: Union[str, os.PathLike, BinaryIO]) -> tuple:
+    if hasattr(sink, 'write'):
+        return sink, None, getattr(sink, 'name', None)
+    path = os.fspath(sink)
+    tmp = f'{path}.part'
+    return open(tmp, 'wb'), tmp, path
+
+
+def _check_download(response) -> None:
+    if response.status_code not in SUCCESS_CODES:
+        if response.status_code == 401:
+            raise UnauthorizedError(
+                message='Invalid token',
+                status_code=response.status_code,
+                full_response=response.text
+            )
+        else:
+            raise CannotGetSourceError(
+                message='Cannot download the source',
+                status_code=response.status_code,
+                full_response=response.text
+            )
+
+
+def download(
+    download_url: str,
+    token: str,
+    sink: Union[str, os.PathLike, BinaryIO],
+    chunk_size: int = 64 * 1024,
+    hash_name: str = None,
+    client: MailTmClient = None
+) -> Download:
+    """Streams a Message's raw .eml to a file or a writable binary sink
+
+    Only one chunk is held in memory at a time. When sink is a path the
+    file is written next to it and renamed once complete.
+
+    Args:
+        download_url (str): The message's `download_url`, e.g. /messages/{id}/download
+        token (str): The user bearer token
+        sink (str | PathLike | BinaryIO): A path or a binary file object
+        chunk_size (int, optional): Bytes read per chunk. Defaults to 64 KiB.
+        hash_name (str, optional): A hashlib algorithm computed on the fly, e.g. 'sha256'. Defaults to None.
+        client (MailTmClient, optional): The client used to send the request. Defaults to the shared client.
+
+    Raises:
+        UnauthorizedError: When the token is invalid or doesn't correspond to the message
+        CannotGetSourceError: When the message can't be downloaded
+
+    Returns:
+        Download: The written path, size and hex digest
+    """
+    client = client or get_default_client()
+    headers = {
+        'Authorization': f'Bearer {token}',
+    }
+    digest = hashlib.new(hash_name) if hash_name else None
+    size = 0
+    with client.get(download_url, headers=headers, stream=True) as response:
+        _check_download(response)
+        file, tmp, path = _open_sink(sink)
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                file.write(chunk)
+                size += len(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+        except BaseException:
+            if tmp is not None:
+                file.close()
+                os.remove(tmp)
+            raise
+        if tmp is not None:
+            file.close()
+            os.replace(tmp, path)
+
+    return Download(
+        path=path,
+        size=size,
+        digest=digest.hexdigest() if digest is not None else None
     )
+
+
+def map_file(path: Union[str, os.PathLike]) -> mmap.mmap:
+    """Maps a downloaded .eml read only into memory, for parsing without reading it
+
+    Args:
+        path (str | PathLike): The file
+
+    Returns:
+        mmap.mmap: The mapping, close it when done
+    """
+    with open(path, 'rb') as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
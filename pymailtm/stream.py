@@ -0,0 +1,496 @@
+import time
+import queue
+import socket
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Iterator
+import requests
+from pymailtm import MERCURE_URL, SUCCESS_CODES
+from pymailtm.client import MailTmClient, get_default_client
+from pymailtm.decoder import loads, parse_message
+from pymailtm.ratelimit import check_rate_limit
+from pymailtm.models.messages import Message
+from pymailtm.models.errors import (
+    RateLimitError,
+    UnauthorizedError,
+    CannotGetMessageError
+)
+
+
+@dataclass
+class ServerSentEvent:
+    id: str = None
+    event: str = 'message'
+    data: str = ''
+    retry: int = None
+
+
+class EventParser:
+    """An incremental text/event-stream parser, fed one line at a time"""
+
+    def __init__(self) -> None:
+        self.last_event_id: str = None
+        self._event = ''
+        self._data: list[str] = []
+        self._retry: int = None
+
+    def feed(self, line: str) -> ServerSentEvent:
+        """Consumes a line of the stream
+
+        Args:
+            line (str): The line, without its line terminator
+
+        Returns:
+            ServerSentEvent: The event completed by this line, or None
+        """
+        if not line:
+            if not self._data:
+                self._event = ''
+                return None
+            event = ServerSentEvent(
+                id=self.last_event_id,
+                event=self._event or 'message',
+                data='\n'.join(self._data),
+                retry=self._retry
+            )
+            self._event = ''
+            self._data = []
+            self._retry = None
+            return event
+
+        if line.startswith(':'):
+            return None
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'data':
+            self._data.append(value)
+        elif field == 'event':
+            self._event = value
+        elif field == 'id' and '\0' not in value:
+            self.last_event_id = value
+        elif field == 'retry' and value.isdigit():
+            self._retry = int(value)
+        return None
+
+
+def parse_events(lines: Iterable[str]) -> Iterator[ServerSentEvent]:
+    """Parses a text/event-stream into events
+
+    Args:
+        lines (Iterable[str]): The stream's lines
+
+    Yields:
+        ServerSentEvent: The events
+    """
+    parser = EventParser()
+    for line in lines:
+        event = parser.feed(line.rstrip('\r\n'))
+        if event is not None:
+            yield event
+
+
+def _topic(account_id: str) -> str:
+    return account_id if account_id.startswith('/accounts/') else f'/accounts/{account_id}'
+
+
+def _to_message(event: ServerSentEvent) -> Message:
+    try:
+        data = loads(event.data)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or data.get('@type') != 'Message':
+        return None
+    return parse_message(data)
+
+
+def _headers(token: str, last_event_id: str) -> dict:
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'accept': 'text/event-stream',
+    }
+    if last_event_id is not None:
+        headers['Last-Event-ID'] = last_event_id
+    return headers
+
+
+def _check_subscription(response) -> bool:
+    if response.status_code in SUCCESS_CODES:
+        return True
+    if response.status_code == 401:
+        raise UnauthorizedError(
+            message='Invalid token',
+            status_code=response.status_code,
+            full_response=response.text
+        )
+    check_rate_limit(response)
+    if response.status_code >= 500:
+        return False
+    raise CannotGetMessageError(
+        message='Cannot subscribe to the message stream',
+        status_code=response.status_code,
+        full_response=response.text
+    )
+
+
+class MessageStream:
+    """Yields the Messages of an account as they arrive, over the Mercure hub
+
+    Holds one long lived connection, reconnecting with `Last-Event-ID`
+    after network errors so no event is missed.
+
+    Args:
+        account_id (str): The account's id
+        token (str): The account's bearer token
+        last_event_id (str, optional): Resume after this event. Defaults to None.
+        hub_url (str, optional): The Mercure hub. Defaults to MERCURE_URL.
+        retry (float, optional): Initial reconnection delay in seconds. Defaults to 1.
+        max_retry (float, optional): Maximum reconnection delay in seconds. Defaults to 30.
+        read_timeout (float, optional): Reconnect when nothing, not even a heartbeat, is received for this long. Defaults to 90.
+        client (MailTmClient, optional): The client used to connect. Defaults to the shared client.
+    """
+
+    def __init__(
+        self,
+        account_id: str,
+        token: str,
+        last_event_id: str = None,
+        hub_url: str = MERCURE_URL,
+        retry: float = 1,
+        max_retry: float = 30,
+        read_timeout: float = 90,
+        client: MailTmClient = None
+    ) -> None:
+        self.account_id = account_id
+        self.token = token
+        self.last_event_id = last_event_id
+        self.hub_url = hub_url
+        self.retry = retry
+        self.max_retry = max_retry
+        self.read_timeout = read_timeout
+        self.client = client or get_default_client()
+        self._closed = False
+        self._response = None
+
+    def events(self) -> Iterator[ServerSentEvent]:
+        """Yields the raw events of the account's topic, reconnecting as needed
+
+        Raises:
+            UnauthorizedError: When the token is invalid
+            CannotGetMessageError: When the hub refuses the subscription
+
+        Yields:
+            ServerSentEvent: The events
+        """
+        delay = self.retry
+        while not self._closed:
+            try:
+                response = self.client.get(
+                    self.hub_url,
+                    params={'topic': _topic(self.account_id)},
+                    headers=_headers(self.token, self.last_event_id),
+                    stream=True,
+                    timeout=(10, self.read_timeout)
+                )
+                self._response = response
+                with response:
+                    if _check_subscription(response):
+                        delay = self.retry
+                        response.encoding = 'utf-8'
+                        parser = EventParser()
+                        parser.last_event_id = self.last_event_id
+                        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                            event = parser.feed(line)
+                            if event is None:
+                                continue
+                            self.last_event_id = event.id
+                            if event.retry is not None:
+                                self.retry = delay = event.retry / 1000
+                            yield event
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                pass
+            except RateLimitError as e:
+                delay = max(delay, e.retry_after or 0)
+            except Exception:
+                # closing the response from another thread breaks the read in various ways
+                if not self._closed:
+                    raise
+            finally:
+                self._response = None
+
+            if self._closed:
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_retry)
+
+    def __iter__(self) -> Iterator[Message]:
+        for event in self.events():
+            message = _to_message(event)
+            if message is not None:
+                yield message
+
+    def close(self) -> None:
+        """Stops the stream, interrupting a blocked read"""
+        self._closed = True
+        response = self._response
+        if response is None:
+            return
+        # the blocked read holds the response's buffer, close() alone would wait for the next heartbeat
+        sock = getattr(getattr(getattr(response, 'raw', None), '_connection', None), 'sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        response.close()
+
+
+class MessageStreamGroup:
+    """Multiplexes the message streams of many accounts into one iterator
+
+    Every account keeps its own connection in a background thread, the
+    iterator yields `(account_id, Message)` pairs in arrival order. Errors of
+    a stream are raised from the iterator.
+
+    Args:
+        subscriptions (Iterable[tuple], optional): `(account_id, token)` pairs to subscribe to. Defaults to ().
+        client (MailTmClient, optional): The client used to connect. Defaults to the shared client.
+        **options: Passed to every MessageStream
+    """
+
+    def __init__(self, subscriptions: Iterable[tuple] = (), client: MailTmClient = None, **options) -> None:
+        self.client = client or get_default_client()
+        self.options = options
+        self.streams: dict[str, MessageStream] = {}
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        for account_id, token in subscriptions:
+            self.add(account_id, token)
+
+    def _run(self, stream: MessageStream) -> None:
+        try:
+            for message in stream:
+                self._queue.put((stream.account_id, message))
+        except Exception as e:
+            # any error ends the account's thread, the consumer has to know
+            if not stream._closed:
+                self._queue.put((stream.account_id, e))
+
+    def add(self, account_id: str, token: str, last_event_id: str = None) -> MessageStream:
+        """Subscribes to an account, replacing its previous stream
+
+        Args:
+            account_id (str): The account's id
+            token (str): The account's bearer token
+            last_event_id (str, optional): Resume after this event. Defaults to None.
+
+        Returns:
+            MessageStream: The account's stream
+        """
+        stream = MessageStream(account_id, token, last_event_id, client=self.client, **self.options)
+        with self._lock:
+            previous = self.streams.pop(account_id, None)
+            self.streams[account_id] = stream
+        if previous is not None:
+            previous.close()
+        threading.Thread(target=self._run, args=(stream,), daemon=True).start()
+        return stream
+
+    def remove(self, account_id: str) -> None:
+        """Unsubscribes from an account
+
+        Args:
+            account_id (str): The account's id
+        """
+        with self._lock:
+            stream = self.streams.pop(account_id, None)
+        if stream is not None:
+            stream.close()
+
+    def get(self, timeout: float = None) -> tuple:
+        """Waits for the next message of any account
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None, forever.
+
+        Raises:
+            queue.Empty: When nothing arrived within timeout
+            Exception: The error that ended a stream, e.g. a MailTmError, the account is then removed
+
+        Returns:
+            tuple: The account id and the Message
+        """
+        account_id, item = self._queue.get(timeout=timeout)
+        if isinstance(item, Exception):
+            self.remove(account_id)
+            raise item
+        return account_id, item
+
+    def __iter__(self) -> Iterator[tuple]:
+        while True:
+            yield self.get()
+
+    def close(self) -> None:
+        with self._lock:
+            streams = list(self.streams.values())
+            self.streams.clear()
+        for stream in streams:
+            stream.close()
+
+    def __enter__(self) -> 'MessageStreamGroup':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class AsyncMessageStream:
+    """The asyncio counterpart of MessageStream, connecting through an AsyncMailTm
+
+    Args:
+        client (AsyncMailTm): The client used to connect
+        account_id (str): The account's id
+        token (str): The account's bearer token
+        last_event_id (str, optional): Resume after this event. Defaults to None.
+        hub_url (str, optional): The Mercure hub. Defaults to MERCURE_URL.
+        retry (float, optional): Initial reconnection delay in seconds. Defaults to 1.
+        max_retry (float, optional): Maximum reconnection delay in seconds. Defaults to 30.
+        read_timeout (float, optional): Reconnect when nothing is received for this long. Defaults to 90.
+    """
+
+    def __init__(
+        self,
+        client,
+        account_id: str,
+        token: str,
+        last_event_id: str = None,
+        hub_url: str = MERCURE_URL,
+        retry: float = 1,
+        max_retry: float = 30,
+        read_timeout: float = 90
+    ) -> None:
+        self.client = client
+        self.account_id = account_id
+        self.token = token
+        self.last_event_id = last_event_id
+        self.hub_url = hub_url
+        self.retry = retry
+        self.max_retry = max_retry
+        self.read_timeout = read_timeout
+        self._closed = False
+
+    async def events(self) -> AsyncIterator[ServerSentEvent]:
+        """Yields the raw events of the account's topic, see `MessageStream.events`"""
+        import httpx
+
+        delay = self.retry
+        timeout = httpx.Timeout(10, read=self.read_timeout)
+        while not self._closed:
+            try:
+                response = await self.client.request(
+                    'GET', self.hub_url,
+                    params={'topic': _topic(self.account_id)},
+                    headers=_headers(self.token, self.last_event_id),
+                    timeout=timeout,
+                    stream=True
+                )
+                try:
+                    if _check_subscription(response):
+                        delay = self.retry
+                        parser = EventParser()
+                        parser.last_event_id = self.last_event_id
+                        async for line in response.aiter_lines():
+                            event = parser.feed(line.rstrip('\r\n'))
+                            if event is None:
+                                continue
+                            self.last_event_id = event.id
+                            if event.retry is not None:
+                                self.retry = delay = event.retry / 1000
+                            yield event
+                finally:
+                    await response.aclose()
+            except httpx.TransportError:
+                pass
+            except RateLimitError as e:
+                delay = max(delay, e.retry_after or 0)
+
+            if self._closed:
+                return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry)
+
+    async def __aiter__(self) -> AsyncIterator[Message]:
+        async for event in self.events():
+            message = _to_message(event)
+            if message is not None:
+                yield message
+
+    def close(self) -> None:
+        self._closed = True
+
+
+class AsyncMessageStreamGroup:
+    """The asyncio counterpart of MessageStreamGroup, one task per account
+
+    Args:
+        client (AsyncMailTm): The client used to connect
+        subscriptions (Iterable[tuple], optional): `(account_id, token)` pairs to subscribe to. Defaults to ().
+        **options: Passed to every AsyncMessageStream
+    """
+
+    def __init__(self, client, subscriptions: Iterable[tuple] = (), **options) -> None:
+        self.client = client
+        self.options = options
+        self.streams: dict[str, AsyncMessageStream] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        for account_id, token in subscriptions:
+            self.add(account_id, token)
+
+    async def _run(self, stream: AsyncMessageStream) -> None:
+        try:
+            async for message in stream:
+                await self._queue.put((stream.account_id, message))
+        except Exception as e:
+            if not stream._closed:
+                await self._queue.put((stream.account_id, e))
+
+    def add(self, account_id: str, token: str, last_event_id: str = None) -> AsyncMessageStream:
+        """Subscribes to an account, replacing its previous stream, see `MessageStreamGroup.add`"""
+        self.remove(account_id)
+        stream = AsyncMessageStream(self.client, account_id, token, last_event_id, **self.options)
+        self.streams[account_id] = stream
+        self._tasks[account_id] = asyncio.ensure_future(self._run(stream))
+        return stream
+
+    def remove(self, account_id: str) -> None:
+        """Unsubscribes from an account"""
+        stream = self.streams.pop(account_id, None)
+        task = self._tasks.pop(account_id, None)
+        if stream is not None:
+            stream.close()
+        if task is not None:
+            task.cancel()
+
+    async def get(self) -> tuple:
+        """Waits for the next message of any account, see `MessageStreamGroup.get`"""
+        account_id, item = await self._queue.get()
+        if isinstance(item, Exception):
+            self.remove(account_id)
+            raise item
+        return account_id, item
+
+    async def __aiter__(self) -> AsyncIterator[tuple]:
+        while True:
+            yield await self.get()
+
+    def close(self) -> None:
+        for account_id in list(self.streams):
+            self.remove(account_id)
+
+    async def __aenter__(self) -> 'AsyncMessageStreamGroup':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
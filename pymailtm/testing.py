@@ -0,0 +1,918 @@
+import re
+import gzip
+import json
+import time
+import random
+import socket
+import struct
+import hashlib
+import secrets
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from email.message import EmailMessage, Message
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Union
+from urllib.parse import parse_qs, urlsplit
+from pymailtm.instrumentation import endpoint_name
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.errors
+    import h2.events
+    import h2.exceptions
+except ImportError:
+    h2 = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HUB_PATH = '/.well-known/mercure'
+H2_PREFACE = b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n'
+# Bodies shorter than this are sent uncompressed, like most servers do
+COMPRESS_MIN_SIZE = 256
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def _content_coding(accept_encoding: str) -> str:
+    accepted = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+class _Exchange:
+    """What the routes see of a request, whether it came over HTTP/1.1 or HTTP/2"""
+    command: str
+    path: str
+    headers: Message
+    fake: 'FakeMailTm'
+
+    def bearer(self) -> str:
+        authorization = self.headers.get('Authorization', '')
+        return authorization[7:] if authorization.startswith('Bearer ') else None
+
+    def respond(self, status: int, payload: Any = None, headers: dict = None) -> None:
+        data, headers = self.fake._encode(payload, headers, self.headers.get('Accept-Encoding', ''))
+        self._respond(status, headers, data)
+
+    def _respond(self, status: int, headers: dict, data: bytes) -> None:
+        raise NotImplementedError
+
+    def start_stream(self, headers: dict) -> None:
+        raise NotImplementedError
+
+    def write(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def end_stream(self) -> None:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+
+class _Handler(_Exchange, BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server: '_Server'
+
+    @property
+    def fake(self) -> 'FakeMailTm':
+        return self.server.fake
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def handle(self) -> None:
+        with self.fake._lock:
+            self.fake.connections += 1
+        if self.fake.http2 and self._h2_preface():
+            _H2Connection(self.fake, self.request).serve()
+        else:
+            super().handle()
+
+    def _h2_preface(self) -> bool:
+        try:
+            data = self.request.recv(len(H2_PREFACE), socket.MSG_PEEK)
+            if data and len(data) < len(H2_PREFACE) and H2_PREFACE.startswith(data):
+                data = self.request.recv(len(H2_PREFACE), socket.MSG_PEEK | socket.MSG_WAITALL)
+        except OSError:
+            return False
+        return data == H2_PREFACE
+
+    def _handle(self) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.fake._dispatch(self, body)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+    def reset(self) -> None:
+        # a zero linger makes the close send a RST instead of a FIN
+        self.request.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        self.close_connection = True
+
+    def _respond(self, status: int, headers: dict, data: bytes) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if data and self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def start_stream(self, headers: dict) -> None:
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self.close_connection = True
+
+    def write(self, data: bytes) -> None:
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def end_stream(self) -> None:
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class _H2Exchange(_Exchange):
+    def __init__(self, connection: '_H2Connection', stream_id: int, headers: list) -> None:
+        self.connection = connection
+        self.stream_id = stream_id
+        self.fake = connection.fake
+        self.command = self.path = None
+        self.headers = Message()
+        for name, value in headers:
+            if name == ':method':
+                self.command = value
+            elif name == ':path':
+                self.path = value
+            elif not name.startswith(':'):
+                self.headers[name] = value
+
+    def _respond(self, status: int, headers: dict, data: bytes) -> None:
+        headers = {**headers, 'Content-Length': str(len(data))}
+        self.connection.send_headers(self.stream_id, status, headers, end=not data)
+        if data:
+            self.connection.send_data(self.stream_id, data, end=True)
+
+    def start_stream(self, headers: dict) -> None:
+        self.connection.send_headers(self.stream_id, 200, headers)
+
+    def write(self, data: bytes) -> None:
+        self.connection.send_data(self.stream_id, data)
+
+    def end_stream(self) -> None:
+        self.connection.send_data(self.stream_id, b'', end=True)
+
+    def reset(self) -> None:
+        self.connection.reset_stream(self.stream_id)
+
+
+class _H2Connection:
+    """Serves HTTP/2 with prior knowledge on one socket, every stream on its own thread"""
+
+    def __init__(self, fake: 'FakeMailTm', sock: socket.socket) -> None:
+        self.fake = fake
+        self.sock = sock
+        self.h2 = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+        self.pending: dict[int, tuple[list, bytearray]] = {}
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def _flush(self) -> None:
+        data = self.h2.data_to_send()
+        if data:
+            self.sock.sendall(data)
+
+    def serve(self) -> None:
+        try:
+            with self._cond:
+                self.h2.initiate_connection()
+                self._flush()
+            while not self.closed:
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                with self._cond:
+                    for event in self.h2.receive_data(data):
+                        self._event(event)
+                    self._flush()
+        except (OSError, h2.exceptions.ProtocolError):
+            pass
+        finally:
+            with self._cond:
+                self.closed = True
+                self._cond.notify_all()
+
+    def _event(self, event) -> None:
+        if isinstance(event, h2.events.RequestReceived):
+            self.pending[event.stream_id] = (event.headers, bytearray())
+        elif isinstance(event, h2.events.DataReceived):
+            self.pending[event.stream_id][1].extend(event.data)
+            self.h2.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, h2.events.StreamEnded):
+            headers, body = self.pending.pop(event.stream_id)
+            exchange = _H2Exchange(self, event.stream_id, headers)
+            threading.Thread(target=self._dispatch, args=(exchange, bytes(body)), daemon=True).start()
+        elif isinstance(event, h2.events.StreamReset):
+            self.pending.pop(event.stream_id, None)
+            self._cond.notify_all()
+        elif isinstance(event, (h2.events.WindowUpdated, h2.events.RemoteSettingsChanged)):
+            self._cond.notify_all()
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            self.closed = True
+            self._cond.notify_all()
+
+    def _dispatch(self, exchange: _H2Exchange, body: bytes) -> None:
+        try:
+            self.fake._dispatch(exchange, body)
+        except OSError:
+            pass
+
+    def send_headers(self, stream_id: int, status: int, headers: dict, end: bool = False) -> None:
+        fields = [(':status', str(status))] + [(name.lower(), str(value)) for name, value in headers.items()]
+        with self._cond:
+            if self.closed:
+                raise ConnectionResetError('The HTTP/2 connection is closed')
+            try:
+                self.h2.send_headers(stream_id, fields, end_stream=end)
+            except h2.exceptions.ProtocolError as e:
+                raise ConnectionResetError(str(e)) from e
+            self._flush()
+
+    def reset_stream(self, stream_id: int) -> None:
+        with self._cond:
+            if self.closed:
+                return
+            try:
+                self.h2.reset_stream(stream_id, h2.errors.ErrorCodes.INTERNAL_ERROR)
+            except h2.exceptions.ProtocolError:
+                return
+            self._flush()
+
+    def send_data(self, stream_id: int, data: bytes, end: bool = False) -> None:
+        view = memoryview(data)
+        with self._cond:
+            while True:
+                if self.closed:
+                    raise ConnectionResetError('The HTTP/2 connection is closed')
+                if not view:
+                    if end:
+                        try:
+                            self.h2.end_stream(stream_id)
+                        except h2.exceptions.ProtocolError as e:
+                            raise ConnectionResetError(str(e)) from e
+                        self._flush()
+                    return
+                try:
+                    size = min(self.h2.local_flow_control_window(stream_id), self.h2.max_outbound_frame_size)
+                    if size <= 0:
+                        self._cond.wait()
+                        continue
+                    chunk, view = view[:size], view[size:]
+                    self.h2.send_data(stream_id, bytes(chunk), end_stream=end and not view)
+                except h2.exceptions.ProtocolError as e:
+                    raise ConnectionResetError(str(e)) from e
+                self._flush()
+                if not view:
+                    return
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    block_on_close = False
+    fake: 'FakeMailTm'
+
+
+class FakeMailTm:
+    """A local stand-in for the mail.tm API and its Mercure hub
+
+    Serves `/domains`, `/accounts`, `/me`, `/token`, `/messages`, `/sources`
+    and the `/.well-known/mercure` hub with the same hydra shaped JSON as
+    mail.tm, from memory, on a background thread. Point a client at it
+    with `MailTmClient(base_url=fake.url)` and the streams at `fake.hub_url`.
+
+    Faults are injected before routing, in this order: requests above
+    `rate_limit` get a 429 with Retry-After, every request waits `latency`
+    seconds, then a share `error_rate` of them get a 500. All three can be
+    changed while the server runs. `reset` drops the connection of chosen
+    requests without answering them.
+
+    With `http2` the same port also serves HTTP/2 with prior knowledge,
+    h2c, to the clients that start with its preface, every stream handled
+    on its own thread. With `compression` responses are sent with brotli
+    or gzip when the client accepts it. `connections` counts the accepted
+    connections and `bytes_sent` the response bodies as sent.
+
+    Args:
+        domains (tuple, optional): The served domains. Defaults to ('example.test',).
+        latency (Union[float, tuple], optional): Seconds added to every response, or a (low, high) range. Defaults to 0.
+        error_rate (float, optional): Share of requests answered with a 500. Defaults to 0.
+        rate_limit (float, optional): Requests per second above which 429s are returned. Defaults to None, no limit.
+        page_size (int, optional): Items per collection page. Defaults to 30.
+        heartbeat (float, optional): Seconds between the hub's keep-alive comments. Defaults to 15.
+        seed (int, optional): Seed of the fault injection. Defaults to None.
+        host (str, optional): The interface to listen on. Defaults to '127.0.0.1'.
+        port (int, optional): The port, 0 picks a free one. Defaults to 0.
+        http2 (bool, optional): Also serve h2c, requires the h2 package. Defaults to False.
+        compression (bool, optional): Compress the bodies of at least COMPRESS_MIN_SIZE bytes. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        domains: tuple = ('example.test',),
+        latency: Union[float, tuple] = 0,
+        error_rate: float = 0,
+        rate_limit: float = None,
+        page_size: int = 30,
+        heartbeat: float = 15,
+        seed: int = None,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        http2: bool = False,
+        compression: bool = False
+    ) -> None:
+        if http2 and h2 is None:
+            raise ImportError('FakeMailTm(http2=True) requires h2, install it with `pip install h2`')
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.page_size = page_size
+        self.heartbeat = heartbeat
+        self.http2 = http2
+        self.compression = compression
+        self.requests: Counter = Counter()
+        self._resets: Counter = Counter()
+        self.connections = 0
+        self.bytes_sent = 0
+        self.domains: dict[str, dict] = {}
+        self.accounts: dict[str, dict] = {}
+        self.messages: dict[str, list[dict]] = {}
+        self._addresses: dict[str, str] = {}
+        self._passwords: dict[str, str] = {}
+        self._tokens: dict[str, str] = {}
+        self._sources: dict[str, str] = {}
+        self._events: list[tuple] = []
+        self._subscribers = 0
+        self._ids = 0
+        self._random = random.Random(seed)
+        self._allowance = 0.0
+        self._checked = time.monotonic()
+        self._lock = threading.Condition()
+        self._closed = False
+        self._thread: threading.Thread = None
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        for domain in domains:
+            self.add_domain(domain)
+        self._routes: list[tuple[str, re.Pattern, Callable]] = [
+            ('GET', re.compile(r'/domains'), self._get_domains),
+            ('GET', re.compile(r'/domains/([^/]+)'), self._get_domain),
+            ('POST', re.compile(r'/accounts'), self._create_account),
+            ('GET', re.compile(r'/accounts/([^/]+)'), self._get_account),
+            ('DELETE', re.compile(r'/accounts/([^/]+)'), self._delete_account),
+            ('GET', re.compile(r'/me'), self._me),
+            ('POST', re.compile(r'/token'), self._token),
+            ('GET', re.compile(r'/messages'), self._get_messages),
+            ('GET', re.compile(r'/messages/([^/]+)'), self._get_message),
+            ('PATCH', re.compile(r'/messages/([^/]+)'), self._patch_message),
+            ('DELETE', re.compile(r'/messages/([^/]+)'), self._delete_message),
+            ('GET', re.compile(r'/messages/([^/]+)/download'), self._download),
+            ('GET', re.compile(r'/sources/([^/]+)'), self._get_source),
+        ]
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def hub_url(self) -> str:
+        return self.url + HUB_PATH
+
+    def start(self) -> 'FakeMailTm':
+        """Starts serving on a background thread
+
+        Returns:
+            FakeMailTm: The server
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name='pymailtm-fake', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server and closes the open hub subscriptions"""
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeMailTm':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _next_id(self) -> str:
+        self._ids += 1
+        return f'{self._ids:024x}'
+
+    # state helpers
+
+    def add_domain(self, domain: str) -> dict:
+        """Serves another domain
+
+        Args:
+            domain (str): The domain, e.g. 'example.test'
+
+        Returns:
+            dict: The domain's JSON
+        """
+        with self._lock:
+            id = self._next_id()
+            now = _now()
+            self.domains[id] = {
+                '@id': f'/domains/{id}',
+                '@type': 'Domain',
+                'id': id,
+                'domain': domain,
+                'isActive': True,
+                'isPrivate': False,
+                'createdAt': now,
+                'updatedAt': now,
+            }
+            return self.domains[id]
+
+    def create_account(self, address: str, password: str) -> dict:
+        """Creates an account without going through the API
+
+        Args:
+            address (str): The address, on one of the served domains
+            password (str): The password
+
+        Raises:
+            ValueError: When the address is taken or its domain isn't served
+
+        Returns:
+            dict: The account's JSON
+        """
+        with self._lock:
+            if address in self._addresses:
+                raise ValueError('address: This value is already used.')
+            domain = address.rpartition('@')[2]
+            if not any(item['domain'] == domain for item in self.domains.values()):
+                raise ValueError('address: The domain is not valid.')
+            id = self._next_id()
+            now = _now()
+            self.accounts[id] = {
+                '@context': '/contexts/Account',
+                '@id': f'/accounts/{id}',
+                '@type': 'Account',
+                'id': id,
+                'address': address,
+                'quota': 40000000,
+                'used': 0,
+                'isDisabled': False,
+                'isDeleted': False,
+                'createdAt': now,
+                'updatedAt': now,
+            }
+            self.messages[id] = []
+            self._addresses[address] = id
+            self._passwords[id] = password
+            return self.accounts[id]
+
+    def account_id(self, address: str) -> str:
+        """Returns the id of the account of an address, or None"""
+        return self._addresses.get(address)
+
+    def subscribers(self) -> int:
+        """Returns the number of open hub subscriptions"""
+        with self._lock:
+            return self._subscribers
+
+    def issue_token(self, address: str) -> str:
+        """Issues a bearer token without going through the API
+
+        Args:
+            address (str): The account's address
+
+        Returns:
+            str: The token
+        """
+        with self._lock:
+            token = secrets.token_hex(16)
+            self._tokens[token] = self._addresses[address]
+            return token
+
+    def expire_tokens(self, address: str = None) -> None:
+        """Invalidates the tokens of an account, or of every account, to exercise the 401 paths
+
+        Args:
+            address (str, optional): The account's address. Defaults to None, every account.
+        """
+        with self._lock:
+            account_id = self._addresses.get(address)
+            for token, owner in list(self._tokens.items()):
+                if address is None or owner == account_id:
+                    del self._tokens[token]
+
+    def reset(self, method: str, endpoint: str, count: int = 1) -> None:
+        """Resets the connection of the next requests to an endpoint instead of answering them
+
+        Args:
+            method (str): The HTTP method, e.g. 'POST'
+            endpoint (str): The endpoint, as counted in `requests`, e.g. '/accounts'
+            count (int, optional): Number of requests reset. Defaults to 1.
+        """
+        with self._lock:
+            self._resets[method, endpoint] += count
+
+    def deliver(
+        self,
+        address: str,
+        subject: str = 'Hello',
+        text: str = 'Hello there',
+        sender: str = 'sender@example.com',
+        count: int = 1
+    ) -> list[dict]:
+        """Adds messages to an inbox and publishes them on the hub
+
+        Args:
+            address (str): The recipient's address
+            subject (str, optional): The subject. Defaults to 'Hello'.
+            text (str, optional): The plain text body. Defaults to 'Hello there'.
+            sender (str, optional): The sender's address. Defaults to 'sender@example.com'.
+            count (int, optional): Number of identical messages. Defaults to 1.
+
+        Returns:
+            list[dict]: The delivered messages' JSON, as listed in `/messages`
+        """
+        delivered = []
+        with self._lock:
+            account_id = self._addresses[address]
+            for _ in range(count):
+                id = self._next_id()
+                now = _now()
+                source = EmailMessage()
+                source['From'] = sender
+                source['To'] = address
+                source['Subject'] = subject
+                source['Message-ID'] = f'<{id}@{sender.rpartition("@")[2]}>'
+                source.set_content(text)
+                raw = source.as_string()
+                message = {
+                    '@id': f'/messages/{id}',
+                    '@type': 'Message',
+                    'id': id,
+                    'accountId': f'/accounts/{account_id}',
+                    'msgid': source['Message-ID'],
+                    'from': {'name': '', 'address': sender},
+                    'to': [{'name': '', 'address': address}],
+                    'subject': subject,
+                    'intro': text[:120],
+                    'seen': False,
+                    'isDeleted': False,
+                    'hasAttachments': False,
+                    'size': len(raw.encode()),
+                    'downloadUrl': f'/messages/{id}/download',
+                    'createdAt': now,
+                    'updatedAt': now,
+                    'text': text,
+                }
+                self.messages[account_id].insert(0, message)
+                self._sources[id] = raw
+                self.accounts[account_id]['used'] += message['size']
+                summary = self._summary(message)
+                self._publish(f'/accounts/{account_id}', summary)
+                delivered.append(summary)
+        return delivered
+
+    def _publish(self, topic: str, data: dict) -> None:
+        self._events.append((str(len(self._events) + 1), topic, json.dumps(data)))
+        self._lock.notify_all()
+
+    @staticmethod
+    def _summary(message: dict) -> dict:
+        return {key: value for key, value in message.items() if key != 'text'}
+
+    # serving
+
+    def _dispatch(self, exchange: _Exchange, body: bytes) -> None:
+        url = urlsplit(exchange.path)
+        key = (exchange.command, endpoint_name(url.path))
+        with self._lock:
+            self.requests[key] += 1
+            reset = self._resets[key] > 0
+            if reset:
+                self._resets[key] -= 1
+        if reset:
+            return exchange.reset()
+
+        fault = self._fault()
+        if fault is not None:
+            return exchange.respond(*fault)
+        if url.path == HUB_PATH and exchange.command == 'GET':
+            return self._subscribe(exchange, parse_qs(url.query))
+        for method, pattern, route in self._routes:
+            if method != exchange.command:
+                continue
+            match = pattern.fullmatch(url.path)
+            if match is not None:
+                return exchange.respond(*route(exchange, *match.groups(), query=parse_qs(url.query), body=body))
+        exchange.respond(404, {'@type': 'hydra:Error', 'hydra:title': 'An error occurred', 'hydra:description': 'Not Found'})
+
+    def _encode(self, payload: Any, headers: dict, accept_encoding: str) -> tuple[bytes, dict]:
+        if payload is None:
+            data = b''
+        elif isinstance(payload, (bytes, str)):
+            data = payload.encode() if isinstance(payload, str) else payload
+        else:
+            data = json.dumps(payload).encode()
+        headers = dict(headers or {})
+        if data and 'Content-Type' not in headers:
+            headers['Content-Type'] = 'application/ld+json; charset=utf-8'
+        if self.compression and len(data) >= COMPRESS_MIN_SIZE:
+            coding = _content_coding(accept_encoding)
+            if coding is not None:
+                data = brotli.compress(data, quality=4) if coding == 'br' else gzip.compress(data, 6)
+                headers['Content-Encoding'] = coding
+                headers['Vary'] = 'Accept-Encoding'
+        with self._lock:
+            self.bytes_sent += len(data)
+        return data, headers
+
+    # faults
+
+    def _fault(self) -> tuple:
+        if self.rate_limit:
+            with self._lock:
+                now = time.monotonic()
+                self._allowance = min(self.rate_limit, self._allowance + (now - self._checked) * self.rate_limit)
+                self._checked = now
+                if self._allowance < 1:
+                    wait = (1 - self._allowance) / self.rate_limit
+                    return 429, {'code': 429, 'message': 'Too Many Requests'}, {'Retry-After': str(max(1, round(wait)))}
+                self._allowance -= 1
+        latency = self.latency
+        if isinstance(latency, tuple):
+            latency = self._random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return 500, {'@type': 'hydra:Error', 'hydra:title': 'An error occurred', 'hydra:description': 'Injected error'}
+        return None
+
+    # routes
+
+    def _account_of(self, handler: _Exchange) -> str:
+        return self._tokens.get(handler.bearer())
+
+    def _unauthorized(self) -> tuple:
+        return 401, {'code': 401, 'message': 'JWT Token not found'}
+
+    def _collection(self, path: str, items: list, query: dict) -> dict:
+        try:
+            page = max(int(query.get('page', ['1'])[0]), 1)
+        except ValueError:
+            return None
+        last = max((len(items) - 1) // self.page_size + 1, 1)
+        view = {
+            '@id': f'{path}?page={page}',
+            '@type': 'hydra:PartialCollectionView',
+            'hydra:first': f'{path}?page=1',
+            'hydra:last': f'{path}?page={last}',
+        }
+        if page > 1:
+            view['hydra:previous'] = f'{path}?page={page - 1}'
+        if page < last:
+            view['hydra:next'] = f'{path}?page={page + 1}'
+        start = (page - 1) * self.page_size
+        return {
+            '@context': f'/contexts/{path[1:-1].capitalize()}',
+            '@id': path,
+            '@type': 'hydra:Collection',
+            'hydra:member': items[start:start + self.page_size],
+            'hydra:totalItems': len(items),
+            'hydra:view': view,
+            'hydra:search': {
+                '@type': 'hydra:IriTemplate',
+                'hydra:template': f'{path}{{?page}}',
+                'hydra:variableRepresentation': 'BasicRepresentation',
+                'hydra:mapping': [{'@type': 'IriTemplateMapping', 'variable': 'page', 'property': None, 'required': False}],
+            },
+        }
+
+    def _get_domains(self, handler: _Exchange, query: dict, body: bytes) -> tuple:
+        with self._lock:
+            payload = self._collection('/domains', list(self.domains.values()), query)
+        if payload is None:
+            return 400, {'hydra:description': 'Invalid page'}
+        data = json.dumps(payload).encode()
+        etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+        if handler.headers.get('If-None-Match') == etag:
+            return 304, None, {'ETag': etag}
+        return 200, data, {'ETag': etag, 'Content-Type': 'application/ld+json; charset=utf-8'}
+
+    def _get_domain(self, handler: _Exchange, id: str, query: dict, body: bytes) -> tuple:
+        domain = self.domains.get(id)
+        if domain is None:
+            return 404, {'hydra:description': 'Not Found'}
+        return 200, domain
+
+    def _create_account(self, handler: _Exchange, query: dict, body: bytes) -> tuple:
+        try:
+            data = json.loads(body)
+            account = self.create_account(data['address'], data['password'])
+        except (ValueError, KeyError, TypeError) as e:
+            return 422, {
+                '@type': 'ConstraintViolationList',
+                'hydra:title': 'An error occurred',
+                'hydra:description': str(e),
+                'violations': [{'propertyPath': 'address', 'message': str(e)}],
+            }
+        return 201, account
+
+    def _get_account(self, handler: _Exchange, id: str, query: dict, body: bytes) -> tuple:
+        account_id = self._account_of(handler)
+        if account_id is None:
+            return self._unauthorized()
+        if account_id != id:
+            return 404, {'hydra:description': 'Not Found'}
+        return 200, self.accounts[id]
+
+    def _delete_account(self, handler: _Exchange, id: str, query: dict, body: bytes) -> tuple:
+        with self._lock:
+            account_id = self._account_of(handler)
+            if account_id is None:
+                return self._unauthorized()
+            if account_id != id:
+                return 404, {'hydra:description': 'Not Found'}
+            account = self.accounts.pop(id)
+            for message in self.messages.pop(id):
+                self._sources.pop(message['id'], None)
+            del self._addresses[account['address']]
+            del self._passwords[id]
+            for token, owner in list(self._tokens.items()):
+                if owner == id:
+                    del self._tokens[token]
+        return 204, None
+
+    def _me(self, handler: _Exchange, query: dict, body: bytes) -> tuple:
+        account_id = self._account_of(handler)
+        if account_id is None:
+            return self._unauthorized()
+        return 200, self.accounts[account_id]
+
+    def _token(self, handler: _Exchange, query: dict, body: bytes) -> tuple:
+        try:
+            data = json.loads(body)
+            address, password = data['address'], data['password']
+        except (ValueError, KeyError, TypeError):
+            return 400, {'hydra:description': 'Invalid body'}
+        account_id = self._addresses.get(address)
+        if account_id is None or self._passwords.get(account_id) != password:
+            return 401, {'code': 401, 'message': 'Invalid credentials.'}
+        return 200, {'token': self.issue_token(address), '@id': f'/accounts/{account_id}', 'id': account_id}
+
+    def _find_message(self, handler: _Exchange, id: str) -> tuple:
+        account_id = self._account_of(handler)
+        if account_id is None:
+            return None, self._unauthorized()
+        for message in self.messages.get(account_id, ()):
+            if message['id'] == id:
+                return message, None
+        return None, (404, {'hydra:description': 'Not Found'})
+
+    def _get_messages(self, handler: _Exchange, query: dict, body: bytes) -> tuple:
+        account_id = self._account_of(handler)
+        if account_id is None:
+            return self._unauthorized()
+        with self._lock:
+            items = [self._summary(message) for message in self.messages[account_id]]
+        payload = self._collection('/messages', items, query)
+        if payload is None:
+            return 400, {'hydra:description': 'Invalid page'}
+        return 200, payload
+
+    def _get_message(self, handler: _Exchange, id: str, query: dict, body: bytes) -> tuple:
+        message, error = self._find_message(handler, id)
+        if error is not None:
+            return error
+        return 200, {
+            **message,
+            '@context': '/contexts/Message',
+            'cc': [],
+            'bcc': [],
+            'flagged': False,
+            'verifications': [],
+            'retention': True,
+            'html': [],
+            'attachments': [],
+        }
+
+    def _patch_message(self, handler: _Exchange, id: str, query: dict, body: bytes) -> tuple:
+        with self._lock:
+            message, error = self._find_message(handler, id)
+            if error is not None:
+                return error
+            message['seen'] = True
+            message['updatedAt'] = _now()
+            return 200, {**self._summary(message), '@context': '/contexts/Message'}
+
+    def _delete_message(self, handler: _Exchange, id: str, query: dict, body: bytes) -> tuple:
+        with self._lock:
+            message, error = self._find_message(handler, id)
+            if error is not None:
+                return error
+            account_id = self._tokens[handler.bearer()]
+            self.messages[account_id].remove(message)
+            self.accounts[account_id]['used'] -= message['size']
+            self._sources.pop(id, None)
+        return 204, None
+
+    def _download(self, handler: _Exchange, id: str, query: dict, body: bytes) -> tuple:
+        message, error = self._find_message(handler, id)
+        if error is not None:
+            return error
+        return 200, self._sources[id], {'Content-Type': 'message/rfc822'}
+
+    def _get_source(self, handler: _Exchange, id: str, query: dict, body: bytes) -> tuple:
+        message, error = self._find_message(handler, id)
+        if error is not None:
+            return error
+        return 200, {
+            '@context': '/contexts/Source',
+            '@id': f'/sources/{id}',
+            '@type': 'Source',
+            'id': id,
+            'downloadUrl': message['downloadUrl'],
+            'data': self._sources[id],
+        }
+
+    # hub
+
+    def _subscribe(self, handler: _Exchange, query: dict) -> None:
+        topics = query.get('topic', [])
+        account_id = self._account_of(handler)
+        if account_id is None:
+            return handler.respond(*self._unauthorized())
+        if any(topic != f'/accounts/{account_id}' for topic in topics) or not topics:
+            return handler.respond(403, {'hydra:description': 'Forbidden topic'})
+
+        handler.start_stream({'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+
+        def write(text: str) -> None:
+            handler.write(text.encode())
+
+        last_event_id = handler.headers.get('Last-Event-ID')
+        with self._lock:
+            position = len(self._events)
+            if last_event_id is not None:
+                position = next(
+                    (i + 1 for i, event in enumerate(self._events) if event[0] == last_event_id), 0
+                )
+        with self._lock:
+            self._subscribers += 1
+        try:
+            write(':\n\n')
+            while True:
+                with self._lock:
+                    if position >= len(self._events) and not self._closed:
+                        self._lock.wait(self.heartbeat)
+                    if self._closed:
+                        break
+                    events = self._events[position:]
+                    position = len(self._events)
+                sent = False
+                for id, topic, data in events:
+                    if topic in topics:
+                        write(f'id: {id}\ndata: {data}\n\n')
+                        sent = True
+                if not sent and not events:
+                    write(':\n\n')
+            handler.end_stream()
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._subscribers -= 1
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import threading
+from typing import Any, Callable
+from pymailtm.misc import get_token
+from pymailtm.client import MailTmClient
+from pymailtm.models import Token
+from pymailtm.models.errors import UnauthorizedError
+
+
+def decode_jwt(token: str) -> dict:
+    """Decodes the claims of a JWT without verifying its signature
+
+    Args:
+        token (str): The bearer token
+
+    Returns:
+        dict: The claims, empty if the token can't be decoded
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError):
+        return {}
+
+
+def jwt_expiry(token: str) -> float:
+    """Returns the `exp` claim of a JWT as a unix timestamp
+
+    Args:
+        token (str): The bearer token
+
+    Returns:
+        float: The expiry time, or None when the token has no `exp` claim
+    """
+    exp = decode_jwt(token).get('exp')
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+class _TokenStore:
+    def __init__(self, leeway: float, default_ttl: float, path: str) -> None:
+        self.leeway = leeway
+        self.default_ttl = default_ttl
+        self.path = path
+        self._tokens: dict[str, tuple[Token, float]] = {}
+        self._passwords: dict[str, str] = {}
+        self._store_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        if path is not None:
+            self.load()
+
+    def add(self, address: str, password: str) -> None:
+        """Registers the credentials used to log in an address
+
+        Args:
+            address (str): The account's address
+            password (str): The account's password
+        """
+        self._passwords[address] = password
+
+    def cached(self, address: str) -> Token:
+        """Returns the cached token of an address if it isn't about to expire
+
+        Args:
+            address (str): The account's address
+
+        Returns:
+            Token: The token, or None
+        """
+        entry = self._tokens.get(address)
+        if entry is not None and entry[1] - self.leeway > time.time():
+            return entry[0]
+        return None
+
+    def invalidate(self, address: str) -> None:
+        """Drops the cached token of an address
+
+        Args:
+            address (str): The account's address
+        """
+        with self._store_lock:
+            self._tokens.pop(address, None)
+        self._persist()
+
+    def _password(self, address: str, password: str) -> str:
+        if password is not None:
+            self._passwords[address] = password
+            return password
+        if address not in self._passwords:
+            raise KeyError(f'No password registered for {address}')
+        return self._passwords[address]
+
+    def _current(self, address: str, stale: str) -> Token:
+        token = self.cached(address)
+        if token is not None and token.token != stale:
+            return token
+        return None
+
+    def _store(self, address: str, token: Token) -> Token:
+        expiry = jwt_expiry(token.token) or time.time() + self.default_ttl
+        with self._store_lock:
+            self._tokens[address] = (token, expiry)
+        return token
+
+    def _put(self, address: str, token: Token) -> Token:
+        self._store(address, token)
+        self._persist()
+        return token
+
+    def _persist(self) -> None:
+        if self.path is None:
+            return
+        # the snapshot is taken once the previous write is done, so the last write is the newest
+        with self._write_lock:
+            with self._store_lock:
+                data = {
+                    address: {'id': token.id, 'token': token.token, 'expiry': expiry}
+                    for address, (token, expiry) in self._tokens.items()
+                }
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            # bearer tokens, readable by the owner only
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as file:
+                json.dump(data, file)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+
+    def load(self) -> None:
+        """Loads the tokens persisted at `path`, skipping the expired ones"""
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self._store_lock:
+            for address, entry in data.items():
+                if entry.get('expiry', 0) - self.leeway > now:
+                    token = Token(id=entry.get('id'), token=entry.get('token'))
+                    self._tokens[address] = (token, entry['expiry'])
+
+
+class TokenManager(_TokenStore):
+    """Caches bearer tokens by address and reuses them until they expire
+
+    The expiry is read from the JWT `exp` claim. Concurrent refreshes of the
+    same address from several threads result in a single `/token` request.
+
+    Args:
+        client (MailTmClient, optional): The client used to log in. Defaults to the shared client.
+        leeway (float, optional): Seconds before expiry at which a token is refreshed. Defaults to 60.
+        default_ttl (float, optional): Lifetime assumed for tokens without an `exp` claim. Defaults to 600.
+        path (str, optional): A JSON file to persist tokens to, passwords are never written. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        client: MailTmClient = None,
+        leeway: float = 60,
+        default_ttl: float = 600,
+        path: str = None
+    ) -> None:
+        super().__init__(leeway, default_ttl, path)
+        self.client = client
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, address: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(address, threading.Lock())
+
+    def get(self, address: str, password: str = None) -> Token:
+        """Returns a valid token for the address, logging in only when needed
+
+        Args:
+            address (str): The account's address
+            password (str, optional): The account's password. Defaults to the registered one.
+
+        Raises:
+            CannotGetTokenError: When the credentials don't match the account
+
+        Returns:
+            Token: The token
+        """
+        token = self.cached(address)
+        if token is not None:
+            return token
+        return self.refresh(address, password)
+
+    def refresh(self, address: str, password: str = None, stale: str = None) -> Token:
+        """Logs in again, unless another thread already replaced the stale token
+
+        Args:
+            address (str): The account's address
+            password (str, optional): The account's password. Defaults to the registered one.
+            stale (str, optional): The token known to be invalid. Defaults to None.
+
+        Returns:
+            Token: The new token
+        """
+        password = self._password(address, password)
+        with self._lock(address):
+            token = self._current(address, stale)
+            if token is not None:
+                return token
+            return self._put(address, get_token(address, password, client=self.client))
+
+    def call(self, address: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Calls an endpoint function with the address' token, refreshing it once on UnauthorizedError
+
+        Args:
+            address (str): The account's address
+            func (Callable): An endpoint function taking a `token` keyword, e.g. `messages.getall`
+
+        Returns:
+            Any: The result of func
+        """
+        token = self.get(address)
+        try:
+            return func(*args, token=token.token, **kwargs)
+        except UnauthorizedError:
+            token = self.refresh(address, stale=token.token)
+            return func(*args, token=token.token, **kwargs)
+
+
+class AsyncTokenManager(_TokenStore):
+    """The asyncio counterpart of TokenManager
+
+    Concurrent refreshes of the same address from several tasks result in a
+    single `/token` request, and the token file is written from a worker
+    thread so refreshes don't block the event loop.
+
+    Args:
+        client (AsyncMailTm): The client used to log in
+        leeway (float, optional): Seconds before expiry at which a token is refreshed. Defaults to 60.
+        default_ttl (float, optional): Lifetime assumed for tokens without an `exp` claim. Defaults to 600.
+        path (str, optional): A JSON file to persist tokens to, passwords are never written. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        client,
+        leeway: float = 60,
+        default_ttl: float = 600,
+        path: str = None
+    ) -> None:
+        super().__init__(leeway, default_ttl, path)
+        self.client = client
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def get(self, address: str, password: str = None) -> Token:
+        """Returns a valid token for the address, logging in only when needed, see `TokenManager.get`"""
+        token = self.cached(address)
+        if token is not None:
+            return token
+        return await self.refresh(address, password)
+
+    async def refresh(self, address: str, password: str = None, stale: str = None) -> Token:
+        """Logs in again, unless another task already replaced the stale token, see `TokenManager.refresh`"""
+        password = self._password(address, password)
+        async with self._locks.setdefault(address, asyncio.Lock()):
+            token = self._current(address, stale)
+            if token is not None:
+                return token
+            token = self._store(address, await self.client.get_token(address, password))
+            if self.path is not None:
+                await asyncio.to_thread(self._persist)
+            return token
+
+    async def call(self, address: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Awaits a client method with the address' token, refreshing it once on UnauthorizedError
+
+        Args:
+            address (str): The account's address
+            func (Callable): A coroutine function taking a `token` keyword, e.g. `client.get_messages`
+
+        Returns:
+            Any: The result of func
+        """
+        token = await self.get(address)
+        try:
+            return await func(*args, token=token.token, **kwargs)
+        except UnauthorizedError:
+            token = await self.refresh(address, stale=token.token)
+            return await func(*args, token=token.token, **kwargs)
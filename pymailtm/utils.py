@@ -2,6 +2,7 @@ import string
 import random
 
 CHARS = string.ascii_letters + string.digits
+USERNAME_CHARS = string.ascii_lowercase + string.digits
 
 def generate_password(length: int = 10):
     """Generates a random password of given length 
@@ -13,4 +14,17 @@ def generate_password(length: int = 10):
         str: The random generated password
     """
     chatset = [random.choice(CHARS) for _ in range(length)]
-    return ''.join(chatset)
\ No newline at end of file
+    return ''.join(chatset)
+
+
+def generate_username(length: int = 12):
+    """Generates a random lowercase username of given length
+
+    Args:
+        length (int, optional): The length of username. Defaults to 12.
+
+    Returns:
+        str: The random generated username
+    """
+    charset = [random.choice(USERNAME_CHARS) for _ in range(length)]
+    return ''.join(charset)
@@ -0,0 +1,150 @@
+import time
+import random
+from datetime import datetime
+from typing import Callable, Pattern, Union
+from pymailtm import messages
+from pymailtm.client import MailTmClient
+from pymailtm.models.messages import Message
+
+Matcher = Union[str, Pattern]
+
+
+def _matches(value: str, matcher: Matcher) -> bool:
+    if matcher is None:
+        return True
+    if value is None:
+        return False
+    if isinstance(matcher, str):
+        return matcher.lower() in value.lower()
+    return matcher.search(value) is not None
+
+
+def match(
+    sender: Matcher = None,
+    subject: Matcher = None,
+    intro: Matcher = None
+) -> Callable[[Message], bool]:
+    """Builds a predicate on the fields every listed Message carries
+
+    Strings match case insensitive substrings, compiled patterns are searched.
+
+    Args:
+        sender (str | Pattern, optional): Matched against the sender's address and name. Defaults to None.
+        subject (str | Pattern, optional): Matched against the subject. Defaults to None.
+        intro (str | Pattern, optional): Matched against the intro. Defaults to None.
+
+    Returns:
+        Callable[[Message], bool]: The predicate
+    """
+    def predicate(message: Message) -> bool:
+        _from = message._from
+        return (
+            (_matches(_from.address, sender) or _matches(_from.name, sender))
+            and _matches(message.subject, subject)
+            and _matches(message.intro, intro)
+        )
+
+    return predicate
+
+
+class Backoff:
+    """An exponential backoff with jitter that resets whenever something changes
+
+    Args:
+        initial (float, optional): The first and minimum delay in seconds. Defaults to 1.
+        maximum (float, optional): The maximum delay in seconds. Defaults to 15.
+        factor (float, optional): The growth of the delay after every idle poll. Defaults to 1.5.
+        jitter (float, optional): The random fraction added to or removed from every delay. Defaults to 0.1.
+    """
+
+    def __init__(self, initial: float = 1, maximum: float = 15, factor: float = 1.5, jitter: float = 0.1) -> None:
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.delay = initial
+
+    def reset(self) -> None:
+        self.delay = self.initial
+
+    def next(self) -> float:
+        """Returns the delay to wait now and grows the following one
+
+        Returns:
+            float: The delay in seconds
+        """
+        delay = self.delay * (1 + random.uniform(-self.jitter, self.jitter))
+        self.delay = min(self.delay * self.factor, self.maximum)
+        return delay
+
+
+def wait_for_message(
+    token: str,
+    predicate: Callable[[Message], bool] = None,
+    timeout: float = 60,
+    sender: Matcher = None,
+    subject: Matcher = None,
+    intro: Matcher = None,
+    since: datetime = None,
+    fetch: bool = True,
+    backoff: Backoff = None,
+    client: MailTmClient = None
+) -> Message:
+    """Polls an inbox until a message matching the predicate arrives
+
+    Only the first page is listed on every poll, `hydra:totalItems` and the
+    newest message tell whether anything changed. The delay between polls
+    grows while the inbox is idle and resets on every change. The full
+    message is fetched only once a listed message matches.
+
+    Args:
+        token (str): The user bearer token
+        predicate (Callable[[Message], bool], optional): Tested against listed messages. Defaults to None.
+        timeout (float, optional): Seconds to wait before giving up. Defaults to 60.
+        sender (str | Pattern, optional): Shortcut for `match(sender=...)`. Defaults to None.
+        subject (str | Pattern, optional): Shortcut for `match(subject=...)`. Defaults to None.
+        intro (str | Pattern, optional): Shortcut for `match(intro=...)`. Defaults to None.
+        since (datetime, optional): Ignore messages created before this naive UTC time. Defaults to None.
+        fetch (bool, optional): Return the message from `messages.get` instead of the listing. Defaults to True.
+        backoff (Backoff, optional): The polling schedule. Defaults to Backoff().
+        client (MailTmClient, optional): The client used to send the requests. Defaults to the shared client.
+
+    Raises:
+        UnauthorizedError: When the token is invalid
+        TimeoutError: When no matching message arrived in time
+
+    Returns:
+        Message: The first matching message
+    """
+    fields = match(sender, subject, intro)
+    backoff = backoff or Backoff()
+    deadline = time.monotonic() + timeout
+    seen: set[str] = set()
+    last_state = None
+
+    while True:
+        page = messages.getall(1, token, client=client)
+        newest = page.member[0] if page.member else None
+        state = (page.total_items, newest.id if newest else None, newest.created_at if newest else None)
+
+        if state != last_state:
+            last_state = state
+            backoff.reset()
+            page_number = 1
+            while page is not None:
+                for message in page.member:
+                    if message.id in seen or (since is not None and message.created_at < since):
+                        page = None
+                        break
+                    seen.add(message.id)
+                    if fields(message) and (predicate is None or predicate(message)):
+                        return messages.get(message.id, token, client=client) if fetch else message
+                else:
+                    page_number += 1
+                    has_next = page.view is not None and page.view.next
+                    page = messages.getall(page_number, token, client=client) if has_next else None
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f'No matching message arrived within {timeout} seconds')
+        time.sleep(min(backoff.next(), remaining))
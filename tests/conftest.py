@@ -0,0 +1,44 @@
+import pytest
+from pymailtm import domains, messages, misc
+from pymailtm.client import MailTmClient
+from pymailtm.instrumentation import Hook
+from pymailtm.testing import FakeMailTm
+
+ADDRESS = 'user@example.test'
+PASSWORD = 'password'
+
+
+class Recover(Hook):
+    """Stops the injected errors of a FakeMailTm after the first one"""
+
+    def __init__(self, fake) -> None:
+        self.fake = fake
+
+    def request_end(self, info) -> None:
+        if info.status_code == 500:
+            self.fake.error_rate = 0
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    domains.cache.clear()
+    messages.cache.clear()
+
+
+@pytest.fixture
+def fake():
+    with FakeMailTm(seed=0) as fake:
+        yield fake
+
+
+@pytest.fixture
+def client(fake):
+    with MailTmClient(base_url=fake.url) as client:
+        yield client
+
+
+@pytest.fixture
+def token(fake, client):
+    fake.create_account(ADDRESS, PASSWORD)
+    return misc.get_token(ADDRESS, PASSWORD, client=client).token
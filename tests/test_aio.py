@@ -0,0 +1,41 @@
+import io
+import asyncio
+import pytest
+from pymailtm import sources
+from pymailtm.models.errors import UnauthorizedError
+from pymailtm.metrics import MetricsCollector
+from pymailtm.ratelimit import RetryPolicy
+from tests.conftest import ADDRESS, Recover
+
+pytest.importorskip('httpx')
+
+from pymailtm.aio import AsyncMailTm  # noqa: E402
+
+DOWNLOAD = '/messages/{id}/download'
+
+
+def download(fake, client, token, **options):
+    async def run():
+        async with AsyncMailTm(base_url=fake.url, **options) as mailtm:
+            sink = io.BytesIO()
+            await mailtm.download_source(message['downloadUrl'], token, sink)
+            return sink.getvalue()
+
+    message = fake.messages[fake.account_id(ADDRESS)][0]
+    return asyncio.run(run()), sources.get(message['id'], token, client=client).data
+
+
+def test_download_source_is_retried_and_instrumented(fake, client, token):
+    fake.deliver(ADDRESS, text='Hello')
+    collector = MetricsCollector()
+    fake.error_rate = 1
+    data, source = download(fake, client, token, retry=RetryPolicy(backoff=0), hooks=[collector, Recover(fake)])
+    assert data.decode() == source
+    stats = collector.endpoint('GET', DOWNLOAD)
+    assert (stats.requests, stats.retries, stats.errors) == (2, 1, 1)
+
+
+def test_download_source_reports_a_bad_token(fake, client, token):
+    fake.deliver(ADDRESS, text='Hello')
+    with pytest.raises(UnauthorizedError):
+        download(fake, client, 'invalid')
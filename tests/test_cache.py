@@ -0,0 +1,84 @@
+from pymailtm import domains, messages, sources
+from tests.conftest import ADDRESS
+
+
+def test_domains_are_served_from_the_cache(fake, client):
+    first = domains.get(client=client)
+    assert domains.get(client=client) == first
+    assert fake.requests['GET', '/domains'] == 1
+    assert domains.cache.hits == 1
+
+
+def test_cached_domains_are_copies(fake, client):
+    first = domains.get(client=client)
+    first.member[0].is_active = False
+    first.member.clear()
+    first.search.mapping.clear()
+    second = domains.get(client=client)
+    assert second.member[0].is_active and second.search.mapping
+    assert second.member[0] is not domains.get(client=client).member[0]
+
+
+def test_expired_domains_are_revalidated(fake, client, monkeypatch):
+    monkeypatch.setattr(domains.cache, 'ttl', 0)
+    first = domains.get(client=client)
+    assert domains.get(client=client) == first
+    assert fake.requests['GET', '/domains'] == 2
+    assert domains.cache.revalidations == 1
+
+
+def test_changed_domains_are_fetched_again(fake, client, monkeypatch):
+    monkeypatch.setattr(domains.cache, 'ttl', 0)
+    domains.get(client=client)
+    fake.add_domain('other.test')
+    assert domains.get(client=client).total_items == 2
+    assert domains.cache.revalidations == 0
+
+
+def test_messages_are_served_from_the_cache(fake, client, token):
+    id = fake.deliver(ADDRESS)[0]['id']
+    first = messages.get(id, token, client=client, use_cache=True)
+    assert messages.get(id, token, client=client, use_cache=True) is first
+    assert fake.requests['GET', '/messages/{id}'] == 1
+
+
+def test_mark_as_read_updates_the_cached_message(fake, client, token):
+    id = fake.deliver(ADDRESS)[0]['id']
+    messages.get(id, token, client=client, use_cache=True)
+    assert messages.mark_as_read(id, token, client=client)
+    assert messages.get(id, token, client=client, use_cache=True).seen
+    assert fake.requests['GET', '/messages/{id}'] == 1
+
+
+def test_mark_as_read_leaves_returned_messages_alone(fake, client, token):
+    id = fake.deliver(ADDRESS)[0]['id']
+    first = messages.get(id, token, client=client, use_cache=True)
+    messages.mark_as_read(id, token, client=client)
+    assert not first.seen
+    assert messages.get(id, token, client=client, use_cache=True) is not first
+
+
+def test_sources_fetched_after_the_first_listing_stay_cached(fake, client, token):
+    id = fake.deliver(ADDRESS)[0]['id']
+    messages.getall(1, token, client=client)
+    first = sources.get(id, token, client=client, use_cache=True)
+    messages.getall(1, token, client=client)
+    assert sources.get(id, token, client=client, use_cache=True) is first
+    assert fake.requests['GET', '/sources/{id}'] == 1
+
+
+def test_listed_updates_make_cached_messages_stale(fake, client, token):
+    id = fake.deliver(ADDRESS)[0]['id']
+    messages.get(id, token, client=client, use_cache=True)
+    fake.messages[fake.account_id(ADDRESS)][0]['updatedAt'] = '2100-01-01T00:00:00+00:00'
+    messages.getall(1, token, client=client)
+    messages.get(id, token, client=client, use_cache=True)
+    assert fake.requests['GET', '/messages/{id}'] == 2
+    assert messages.cache.stale == 1
+
+
+def test_deleted_messages_leave_the_cache(fake, client, token):
+    id = fake.deliver(ADDRESS)[0]['id']
+    messages.get(id, token, client=client, use_cache=True)
+    messages.delete(id, token, client=client)
+    assert messages.cache.get_message(id) is None
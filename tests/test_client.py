@@ -0,0 +1,46 @@
+import time
+import pytest
+from pymailtm import domains
+from pymailtm.client import MailTmClient
+from pymailtm.metrics import MetricsCollector
+from pymailtm.models.errors import RateLimitError
+from pymailtm.ratelimit import RetryPolicy, TokenBucket
+from tests.conftest import Recover
+
+
+def test_server_errors_are_retried(fake):
+    collector = MetricsCollector()
+    fake.error_rate = 1
+    with MailTmClient(base_url=fake.url, retry=RetryPolicy(backoff=0), hooks=[collector, Recover(fake)]) as client:
+        assert domains.get(client=client, use_cache=False).total_items == 1
+    stats = collector.endpoint('GET', '/domains')
+    assert (stats.requests, stats.retries, stats.errors) == (2, 1, 1)
+
+
+def test_rate_limit_is_raised_after_the_retries(fake):
+    fake.rate_limit = 0.001
+    with MailTmClient(base_url=fake.url, retry=RetryPolicy(retries=1, max_backoff=0)) as client:
+        with pytest.raises(RateLimitError) as info:
+            domains.get(client=client, use_cache=False)
+    assert info.value.retry_after >= 1
+    assert fake.requests['GET', '/domains'] == 2
+
+
+def test_rate_limited_requests_are_retried(fake):
+    collector = MetricsCollector()
+    fake.rate_limit = 5
+    with MailTmClient(base_url=fake.url, retry=RetryPolicy(retries=10, max_backoff=0.2), hooks=[collector]) as client:
+        for _ in range(8):
+            assert domains.get(client=client, use_cache=False).total_items == 1
+    stats = collector.endpoint('GET', '/domains')
+    assert stats.retries > 0
+    assert stats.requests == 8 + stats.retries
+
+
+def test_limiter_spaces_the_requests(fake):
+    limiter = TokenBucket(rate=20, capacity=1)
+    with MailTmClient(base_url=fake.url, limiter=limiter) as client:
+        start = time.monotonic()
+        for _ in range(5):
+            domains.get(client=client, use_cache=False)
+    assert time.monotonic() - start >= 0.2 - 0.01
@@ -0,0 +1,91 @@
+import dataclasses
+from pymailtm import decoder, domains, messages
+from pymailtm.models.common import Mapping
+from tests.conftest import ADDRESS
+
+# A messages page as mail.tm sends it
+PAGE = {
+    '@context': '/contexts/Message',
+    '@id': '/messages',
+    '@type': 'hydra:Collection',
+    'hydra:member': [
+        {
+            '@id': '/messages/6283a2b1c2a3f04a1e0b5c2d',
+            '@type': 'Message',
+            'id': '6283a2b1c2a3f04a1e0b5c2d',
+            'accountId': '/accounts/6283a2a0c2a3f04a1e0b5c1a',
+            'msgid': '<abc@mail.example.com>',
+            'from': {'address': 'sender@example.com', 'name': 'Sender'},
+            'to': [{'address': 'user@example.test', 'name': ''}],
+            'subject': 'Your code',
+            'intro': 'Your code is 123456',
+            'seen': False,
+            'isDeleted': False,
+            'hasAttachments': False,
+            'size': 1804,
+            'downloadUrl': '/messages/6283a2b1c2a3f04a1e0b5c2d/download',
+            'createdAt': '2022-05-17T13:28:49+00:00',
+            'updatedAt': '2022-05-17T13:28:50+00:00',
+        },
+    ],
+    'hydra:totalItems': 1,
+    'hydra:search': {
+        '@type': 'hydra:IriTemplate',
+        'hydra:template': '/messages{?page}',
+        'hydra:variableRepresentation': 'BasicRepresentation',
+        'hydra:mapping': [
+            {'@type': 'IriTemplateMapping', 'variable': 'page', 'property': None, 'required': False},
+        ],
+    },
+}
+
+
+def test_search_mapping_is_a_list():
+    page = decoder.parse_messages(PAGE)
+    assert page.search.template == '/messages{?page}'
+    assert page.search.mapping == [Mapping('IriTemplateMapping', 'page', None, False)]
+    assert page.view.next is None
+
+
+def test_single_mapping_object_is_accepted():
+    search = dict(PAGE['hydra:search'], **{'hydra:mapping': PAGE['hydra:search']['hydra:mapping'][0]})
+    assert decoder.parse_search(search).mapping == [Mapping('IriTemplateMapping', 'page', None, False)]
+    assert decoder.parse_search(None).mapping == []
+
+
+def test_raw_page_has_the_same_metadata():
+    page, raw = decoder.parse_messages(PAGE), decoder.parse_raw_messages(PAGE)
+    assert raw.search == page.search
+    assert raw.member[0].to_message() == page.member[0]
+
+
+def test_raw_messages_share_the_addresses():
+    page, raw = decoder.parse_messages(PAGE), decoder.parse_raw_messages(PAGE)
+    message, view = page.member[0], raw.member[0]
+    assert view._from is message._from and view.to[0] is message.to[0]
+    assert view.created_at == message.created_at and view._context is None
+    view.to.append(None)
+    assert view.to_message() == message and view == message
+    assert decoder.RawMessage({'id': 'x'}).to_message().to == []
+
+
+def test_pages_from_the_fake_server(fake, client, token):
+    fake.deliver(ADDRESS, count=3)
+    page = messages.getall(1, token, client=client)
+    assert page.total_items == 3
+    assert page.search.mapping[0].variable == 'page'
+    assert 'Messages(' in repr(page)
+    assert page == messages.getall(1, token, client=client)
+    assert domains.get(client=client).search.mapping[0].variable == 'page'
+
+
+def test_timestamps_are_naive_utc():
+    assert decoder.parse_datetime('2022-05-17T15:28:49+02:00').isoformat() == '2022-05-17T13:28:49'
+
+
+def test_pages_are_dataclasses(fake, client, token):
+    fake.deliver(ADDRESS, count=2)
+    page = messages.getall(1, token, client=client)
+    assert [field.name for field in dataclasses.fields(page)] == ['member', 'total_items', 'view', 'search']
+    assert dataclasses.asdict(page)['search']['mapping'][0]['variable'] == 'page'
+    assert dataclasses.replace(page, member=[]).total_items == 2
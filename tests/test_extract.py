@@ -0,0 +1,34 @@
+from pymailtm import messages
+from pymailtm.extract import Extractor
+from tests.conftest import ADDRESS
+
+PADDING = 'Thanks for signing up, we are happy to have you on board. ' * 4
+
+
+def inbox(token, client):
+    return messages.getall(1, token, client=client).member
+
+
+def test_intro_matches_skip_the_source(fake, client, token):
+    fake.deliver(ADDRESS, subject='Welcome', text='Your verification code is 482913.')
+    extractor = Extractor(client=client)
+    result = extractor.extract(inbox(token, client)[0], token=token)
+    assert (result.value, result.field) == ('482913', 'intro')
+    assert extractor.fetches == 0
+    assert fake.requests['GET', '/sources/{id}'] == 0
+
+
+def test_source_is_fetched_when_the_intro_misses(fake, client, token):
+    fake.deliver(ADDRESS, subject='Welcome', text=PADDING + 'Your verification code is 482913.')
+    extractor = Extractor(client=client)
+    result = extractor.extract(inbox(token, client)[0], token=token)
+    assert (result.value, result.field) == ('482913', 'text')
+    assert extractor.fetches == 1
+
+
+def test_extract_many_reports_every_message(fake, client, token):
+    fake.deliver(ADDRESS, subject='Your code is 1111')
+    fake.deliver(ADDRESS, subject='Welcome', text=PADDING + 'Use code 2222 to log in.')
+    fake.deliver(ADDRESS, subject='Welcome', text=PADDING)
+    results = list(Extractor(client=client).extract_many(inbox(token, client), token=token))
+    assert sorted(str(result.value) for result in results) == ['1111', '2222', 'None']
@@ -0,0 +1,50 @@
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from pymailtm import messages, misc, sources
+from pymailtm.stream import MessageStream
+from pymailtm.testing import FakeMailTm
+from tests.conftest import ADDRESS, PASSWORD
+from tests.test_stream import wait_for
+
+pytest.importorskip('httpx')
+pytest.importorskip('h2')
+
+from pymailtm.http2 import Http2Client  # noqa: E402
+
+
+@pytest.fixture
+def fake():
+    with FakeMailTm(seed=0, http2=True, compression=True) as fake:
+        yield fake
+
+
+def test_threads_share_one_connection(fake):
+    fake.create_account(ADDRESS, PASSWORD)
+    ids = [message['id'] for message in fake.deliver(ADDRESS, text='Your code is 482913. ' * 50, count=4)]
+    with Http2Client(base_url=fake.url, h2c=True) as client:
+        token = misc.get_token(ADDRESS, PASSWORD, client=client).token
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda id: sources.get(id, token, client=client), ids * 5))
+        assert client.http_version == 'HTTP/2'
+        assert messages.getall(1, token, client=client).total_items == 4
+    assert all('482913' in source.data for source in results)
+    assert fake.connections == 1
+
+
+def test_streams_close_without_breaking_the_connection(fake):
+    fake.create_account(ADDRESS, PASSWORD)
+    with Http2Client(base_url=fake.url, h2c=True) as client:
+        token = misc.get_token(ADDRESS, PASSWORD, client=client).token
+        stream = MessageStream(fake.account_id(ADDRESS), token, hub_url=fake.hub_url, client=client)
+        received = []
+        reader = threading.Thread(target=lambda: received.extend(stream), daemon=True)
+        reader.start()
+        wait_for(lambda: fake.subscribers() == 1)
+        fake.deliver(ADDRESS, subject='Streamed')
+        wait_for(lambda: received)
+        stream.close()
+        reader.join(5)
+        assert not reader.is_alive()
+        assert [message.subject for message in received] == ['Streamed']
+        assert messages.getall(1, token, client=client).total_items == 1
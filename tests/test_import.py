@@ -0,0 +1,35 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=60, check=True
+    )
+    return result.stdout.strip()
+
+
+def test_import_is_lazy():
+    output = run(
+        'import sys, pymailtm\n'
+        'print(sorted(name for name in ("requests", "httpx", "pymailtm.client") if name in sys.modules))\n'
+        'pymailtm.MailTmClient\n'
+        'print("requests" in sys.modules, "httpx" in sys.modules)\n'
+        'print("domains" in dir(pymailtm))'
+    )
+    assert output.splitlines() == ['[]', 'True False', 'True']
+
+
+def test_unknown_attributes_raise():
+    output = run(
+        'import pymailtm\n'
+        'try:\n'
+        '    pymailtm.nonexistent\n'
+        'except AttributeError as e:\n'
+        '    print(e)\n'
+        'print(hasattr(pymailtm, "nonexistent"))'
+    )
+    assert output.splitlines() == ["module 'pymailtm' has no attribute 'nonexistent'", 'False']
@@ -0,0 +1,195 @@
+import pytest
+import requests
+from pymailtm import domains, instrumentation, misc
+from pymailtm.cache import TTLCache
+from pymailtm.client import MailTmClient
+from pymailtm.instrumentation import Hook, endpoint_name
+from pymailtm.metrics import Histogram, MetricsCollector
+from pymailtm.ratelimit import RetryPolicy
+from tests.conftest import ADDRESS, PASSWORD, Recover
+
+
+class Recorder(Hook):
+    """Keeps every event it sees"""
+
+    def __init__(self) -> None:
+        self.events = []
+
+    def request_start(self, info) -> None:
+        self.events.append(('start', info, info.attempt))
+
+    def request_end(self, info) -> None:
+        self.events.append(('end', info, info.status_code))
+
+
+def test_endpoint_names_hide_the_ids():
+    assert endpoint_name('/messages/abc/download') == '/messages/{id}/download'
+    assert endpoint_name('https://api.mail.tm/domains/42?page=2') == '/domains/{id}'
+    assert endpoint_name('/token') == '/token'
+    assert endpoint_name('') == '/'
+
+
+def test_hooks_see_every_attempt(fake):
+    recorder = Recorder()
+    fake.error_rate = 1
+    with MailTmClient(base_url=fake.url, retry=RetryPolicy(backoff=0), hooks=[Recover(fake), recorder]) as client:
+        domains.get(client=client, use_cache=False)
+    assert [(event, attempt) for event, _, attempt in recorder.events] == [
+        ('start', 0), ('end', 500), ('start', 1), ('end', 200)
+    ]
+    first, retry = recorder.events[0][1], recorder.events[2][1]
+    assert recorder.events[1][1] is first and recorder.events[3][1] is retry
+    assert (retry.method, retry.endpoint, retry.url) == ('GET', '/domains', fake.url + '/domains')
+    assert retry.duration >= 0 and retry.bytes_received > 0 and retry.error is None
+
+
+def test_hooks_see_transport_errors(fake):
+    recorder = Recorder()
+    fake.reset('GET', '/domains')
+    with MailTmClient(base_url=fake.url, retry=RetryPolicy(backoff=0), hooks=[recorder]) as client:
+        domains.get(client=client, use_cache=False)
+    failed = recorder.events[1][1]
+    assert isinstance(failed.error, requests.ConnectionError)
+    assert failed.status_code is None and failed.bytes_received is None
+    assert [attempt for event, _, attempt in recorder.events if event == 'start'] == [0, 1]
+
+
+def test_global_hooks_run_before_the_client_ones(fake, client):
+    order = []
+
+    class Named(Hook):
+        def __init__(self, name) -> None:
+            self.name = name
+
+        def request_start(self, info) -> None:
+            order.append(self.name)
+
+    shared = Named('global')
+    instrumentation.add_hook(shared)
+    instrumentation.add_hook(shared)
+    try:
+        with MailTmClient(base_url=fake.url, hooks=[Named('client')]) as own:
+            domains.get(client=own, use_cache=False)
+    finally:
+        instrumentation.remove_hook(shared)
+    domains.get(client=client, use_cache=False)
+    assert order == ['global', 'client']
+    assert instrumentation.hooks == ()
+
+
+def test_collector_aggregates_per_endpoint(fake):
+    collector = MetricsCollector()
+    fake.create_account(ADDRESS, PASSWORD)
+    fake.error_rate = 1
+    with MailTmClient(base_url=fake.url, retry=RetryPolicy(backoff=0), hooks=[collector, Recover(fake)]) as client:
+        domains.get(client=client, use_cache=False)
+        domains.get(client=client, use_cache=False)
+        misc.get_token(ADDRESS, PASSWORD, client=client)
+        fake.reset('GET', '/domains')
+        domains.get(client=client, use_cache=False)
+
+    stats = collector.endpoint('GET', '/domains')
+    assert (stats.requests, stats.retries, stats.errors, stats.in_flight) == (5, 2, 2, 0)
+    assert stats.statuses == {500: 1, 200: 3}
+    assert stats.exceptions == {'ConnectionError': 1}
+    assert stats.latency.count == 5 and stats.bytes_received > 0
+    token = collector.endpoint('POST', '/token')
+    assert (token.requests, token.errors) == (1, 0)
+    assert token.bytes_sent > 0
+    assert collector.endpoint('GET', '/messages') is None
+    assert {(s.method, s.endpoint) for s in collector.endpoints()} == {('GET', '/domains'), ('POST', '/token')}
+
+    collector.reset()
+    assert collector.endpoints() == []
+
+
+def test_collector_returns_copies(fake, client):
+    collector = MetricsCollector()
+    with MailTmClient(base_url=fake.url, hooks=[collector]) as own:
+        domains.get(client=own, use_cache=False)
+        stats = collector.endpoint('GET', '/domains')
+        stats.statuses[200] = 100
+        stats.latency.counts[0] = 100
+        domains.get(client=own, use_cache=False)
+    stats = collector.endpoint('GET', '/domains')
+    assert stats.statuses == {200: 2}
+    assert stats.latency.count == sum(stats.latency.counts) == 2
+
+
+def test_collector_reports_the_caches(fake, client):
+    extra = TTLCache(maxsize=4, ttl=60)
+    collector = MetricsCollector(caches={'domains': domains.cache})
+    collector.watch_cache('extra', extra)
+    domains.get(client=client)
+    domains.get(client=client)
+    extra.get('missing')
+    stats = collector.cache_stats()
+    assert (stats['domains'].hits, stats['domains'].misses, stats['domains'].hit_ratio) == (1, 1, 0.5)
+    assert (stats['extra'].hits, stats['extra'].misses, stats['extra'].revalidations) == (0, 1, 0)
+
+
+def test_histogram_quantiles():
+    histogram = Histogram((1, 2, 4))
+    assert histogram.quantile(0.5) == 0.0
+    for value in (0.5, 1.5, 1.5, 3, 10):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.mean == pytest.approx(16.5 / 5)
+    assert histogram.quantile(0.2) == pytest.approx(1.0)
+    assert histogram.quantile(0.5) == pytest.approx(1.75)
+    assert histogram.quantile(1) == 4
+
+
+def test_prometheus_hook(fake):
+    prometheus_client = pytest.importorskip('prometheus_client')
+    from pymailtm.prometheus import PrometheusHook
+
+    registry = prometheus_client.CollectorRegistry()
+    hook = PrometheusHook(registry=registry, caches={'domains': domains.cache})
+    fake.error_rate = 1
+    with MailTmClient(base_url=fake.url, retry=RetryPolicy(backoff=0), hooks=[hook, Recover(fake)]) as client:
+        domains.get(client=client)
+        domains.get(client=client)
+
+    labels = {'method': 'GET', 'endpoint': '/domains'}
+    assert registry.get_sample_value('pymailtm_requests_total', {**labels, 'status': '200'}) == 1
+    assert registry.get_sample_value('pymailtm_requests_total', {**labels, 'status': '500'}) == 1
+    assert registry.get_sample_value('pymailtm_retries_total', labels) == 1
+    assert registry.get_sample_value('pymailtm_errors_total', {**labels, 'error': '500'}) == 1
+    assert registry.get_sample_value('pymailtm_requests_in_flight', labels) == 0
+    assert registry.get_sample_value('pymailtm_request_duration_seconds_count', labels) == 2
+    assert registry.get_sample_value('pymailtm_cache_hit_ratio', {'cache': 'domains'}) == 0.5
+
+
+def test_opentelemetry_hook(fake):
+    pytest.importorskip('opentelemetry.sdk')
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from pymailtm.otel import OpenTelemetryHook
+
+    reader = InMemoryMetricReader()
+    exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
+    hook = OpenTelemetryHook(MeterProvider(metric_readers=[reader]), tracer_provider, caches={'domains': domains.cache})
+    fake.error_rate = 1
+    with MailTmClient(base_url=fake.url, retry=RetryPolicy(backoff=0), hooks=[hook, Recover(fake)]) as client:
+        domains.get(client=client)
+
+    spans = exporter.get_finished_spans()
+    assert [span.name for span in spans] == ['GET /domains', 'GET /domains']
+    assert [span.attributes['http.response.status_code'] for span in spans] == [500, 200]
+    assert spans[0].attributes['error.type'] == '500'
+    assert spans[1].attributes['http.request.resend_count'] == 1
+    metrics = {
+        metric.name: metric
+        for resource in reader.get_metrics_data().resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+    }
+    assert sum(point.count for point in metrics['http.client.request.duration'].data.data_points) == 2
+    assert sum(point.value for point in metrics['pymailtm.client.retries'].data.data_points) == 1
+    assert 'pymailtm.cache.hit_ratio' in metrics
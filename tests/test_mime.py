@@ -0,0 +1,71 @@
+import base64
+from pymailtm.mime import CHUNK_SIZE, ParsedMessage
+
+PAYLOAD = bytes(range(256)) * (CHUNK_SIZE // 64)
+
+
+def make_eml(subject: str = 'Invoice') -> bytes:
+    encoded = base64.encodebytes(PAYLOAD).decode()
+    return (
+        f'From: Sender <sender@example.com>\r\n'
+        f'To: user@example.test\r\n'
+        f'Subject: {subject}\r\n'
+        f'MIME-Version: 1.0\r\n'
+        f'Content-Type: multipart/mixed; boundary="b"\r\n'
+        f'\r\n'
+        f'--b\r\n'
+        f'Content-Type: text/plain; charset=utf-8\r\n'
+        f'\r\n'
+        f'Your code is 123456\r\n'
+        f'--b\r\n'
+        f'Content-Type: application/octet-stream\r\n'
+        f'Content-Disposition: attachment; filename="data.bin"\r\n'
+        f'Content-Transfer-Encoding: base64\r\n'
+        f'\r\n'
+        f'{encoded}'
+        f'--b--\r\n'
+    ).encode()
+
+
+def test_headers_are_parsed_eagerly():
+    parsed = ParsedMessage(make_eml())
+    assert parsed.subject == 'Invoice'
+    assert parsed.sender == 'Sender <sender@example.com>'
+    assert 'message' not in parsed.__dict__
+
+
+def test_memoryview_slice_is_parsed_not_its_buffer():
+    data = b'garbage!' + make_eml('Sliced')
+    parsed = ParsedMessage(memoryview(data)[8:])
+    assert parsed.subject == 'Sliced'
+    assert parsed.text.strip() == 'Your code is 123456'
+
+
+def test_bodies_and_attachments_are_cached():
+    parsed = ParsedMessage(make_eml())
+    assert parsed.text is parsed.text
+    [attachment] = parsed.attachments
+    assert parsed.attachments[0] is attachment
+    assert attachment.filename == 'data.bin'
+    assert attachment.payload == PAYLOAD
+    assert attachment.open().read() == PAYLOAD
+
+
+def test_memory_mapped_file(tmp_path):
+    path = tmp_path / 'message.eml'
+    path.write_bytes(make_eml('Mapped'))
+    parsed = ParsedMessage.from_file(path)
+    assert parsed.subject == 'Mapped'
+    assert parsed.attachments[0].size == len(PAYLOAD)
+    saved = tmp_path / 'data.bin'
+    assert parsed.attachments[0].save(saved) == len(PAYLOAD)
+    parsed.close()
+    assert parsed.raw.closed
+    assert saved.read_bytes() == PAYLOAD
+
+
+def test_message_without_body():
+    parsed = ParsedMessage(b'Subject: Empty\n')
+    assert parsed.subject == 'Empty'
+    assert parsed.html is None
+    assert parsed.attachments == []
@@ -0,0 +1,46 @@
+from pymailtm import messages
+from pymailtm.mirror import InboxMirror
+from pymailtm.search import SearchIndex
+from tests.conftest import ADDRESS
+
+
+def test_sync_only_writes_changes(fake, client, token):
+    fake.deliver(ADDRESS, subject='Welcome', count=3)
+    with InboxMirror(client=client) as mirror:
+        first = mirror.sync(token)
+        assert (first.added, first.updated) == (3, 0)
+        assert first.account_id == f'/accounts/{fake.account_id(ADDRESS)}'
+        again = mirror.sync(token)
+        assert (again.added, again.updated) == (0, 0)
+
+        fake.deliver(ADDRESS, subject='Reset')
+        assert mirror.sync(token).added == 1
+        assert len(mirror.unseen()) == 4
+        assert len(mirror.query(subject='welc')) == 3
+
+
+def test_full_sync_drops_deleted_messages(fake, client, token):
+    fake.deliver(ADDRESS, count=3)
+    with InboxMirror(client=client) as mirror:
+        mirror.index = SearchIndex(mirror.db, lock=mirror.lock)
+        mirror.sync(token)
+        id = messages.getall(1, token, client=client).member[0].id
+        messages.delete(id, token, client=client)
+        result = mirror.sync(token, full=True)
+        assert result.removed == 1
+        assert mirror.get(id) is None
+        assert len(mirror.index) == 2
+
+
+def test_full_sync_of_an_emptied_inbox(fake, client, token):
+    fake.deliver(ADDRESS, count=7)
+    with InboxMirror(client=client) as mirror:
+        mirror.index = SearchIndex(mirror.db, lock=mirror.lock)
+        mirror.sync(token)
+        assert len(mirror.query()) == 7
+        assert messages.purge(token, client=client).ok
+        result = mirror.sync(token, full=True)
+        assert result.account_id == f'/accounts/{fake.account_id(ADDRESS)}'
+        assert result.removed == 7
+        assert mirror.query() == []
+        assert len(mirror.index) == 0
@@ -0,0 +1,74 @@
+from datetime import datetime
+from pymailtm import stream
+from pymailtm.monitor import InboxMonitor
+from tests.conftest import ADDRESS, PASSWORD
+from tests.test_stream import wait_for
+
+# deliver everything the first poll finds, however early it runs
+SINCE = datetime(2000, 1, 1)
+
+
+def test_delivers_new_messages(fake, client, token):
+    with InboxMonitor(workers=2, min_interval=0.05, max_interval=0.2, client=client) as monitor:
+        monitor.add(ADDRESS, PASSWORD, since=SINCE)
+        fake.deliver(ADDRESS, subject='Hello')
+        event = monitor.get(timeout=5)
+        assert event.error is None
+        assert event.message.subject == 'Hello'
+
+
+def test_unexpected_errors_are_reported_and_retried(fake, client, token):
+    with InboxMonitor(workers=1, min_interval=0.05, max_interval=0.2, client=client) as monitor:
+        poll = monitor._poll
+        calls = []
+
+        def flaky(inbox):
+            calls.append(inbox)
+            if len(calls) == 1:
+                raise ValueError('unexpected')
+            return poll(inbox)
+
+        monitor._poll = flaky
+        monitor.add(ADDRESS, PASSWORD, since=SINCE)
+        event = monitor.get(timeout=5)
+        assert isinstance(event.error, ValueError)
+        assert event.address == ADDRESS
+
+        fake.deliver(ADDRESS, subject='After the error')
+        event = monitor.get(timeout=5)
+        assert event.message.subject == 'After the error'
+        assert monitor.stats().errors == 1
+
+
+def test_failing_inbox_is_dropped(fake, client, token):
+    with InboxMonitor(workers=1, min_interval=0.01, max_interval=0.02, max_failures=2, client=client) as monitor:
+        monitor._poll = lambda inbox: 1 / 0
+        monitor.add(ADDRESS, PASSWORD)
+        errors = [monitor.get(timeout=5).error for _ in range(2)]
+        assert all(isinstance(error, ZeroDivisionError) for error in errors)
+        assert monitor.stats().inboxes == 0
+
+
+def test_stream_errors_are_reported_and_resubscribed(fake, client, token, monkeypatch):
+    to_message = stream._to_message
+    calls = []
+
+    def malformed(event):
+        calls.append(event)
+        if len(calls) == 1:
+            raise ValueError('bad createdAt')
+        return to_message(event)
+
+    monkeypatch.setattr(stream, '_to_message', malformed)
+    with InboxMonitor(min_interval=0.05, max_interval=0.2, hub_url=fake.hub_url, client=client) as monitor:
+        monitor.add(ADDRESS, PASSWORD, stream=True)
+        wait_for(lambda: fake.subscribers() == 1)
+        fake.deliver(ADDRESS, subject='Malformed')
+        event = monitor.get(timeout=5)
+        assert isinstance(event.error, ValueError)
+
+        fake.deliver(ADDRESS, subject='After the error')
+        event = monitor.get(timeout=5)
+        assert event.message.subject == 'After the error'
+        assert monitor.stats().errors == 1
+        assert monitor.stats().streams == 1
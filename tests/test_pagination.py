@@ -0,0 +1,29 @@
+import pytest
+from pymailtm import messages
+from pymailtm.models.errors import CannotDeleteMessageError
+from pymailtm.pagination import iter_messages
+from tests.conftest import ADDRESS
+
+
+@pytest.mark.parametrize('read_ahead', [False, True])
+def test_iter_messages_follows_the_pages(fake, client, token, read_ahead):
+    fake.page_size = 5
+    delivered = fake.deliver(ADDRESS, count=12)
+    ids = [message.id for message in iter_messages(token, read_ahead=read_ahead, client=client)]
+    assert sorted(ids) == sorted(message['id'] for message in delivered)
+    assert fake.requests['GET', '/messages'] == 3
+
+
+def test_purge_deletes_every_message(fake, client, token):
+    fake.page_size = 5
+    fake.deliver(ADDRESS, count=12)
+    report = messages.purge(token, client=client)
+    assert report.ok and len(report.succeeded) == 12
+    assert fake.messages[fake.account_id(ADDRESS)] == []
+
+
+def test_batch_keeps_going_after_a_failure(fake, client, token):
+    id = fake.deliver(ADDRESS)[0]['id']
+    report = messages.delete_many([id, 'missing'], token, client=client)
+    assert report.succeeded == [id]
+    assert isinstance(report.errors['missing'], CannotDeleteMessageError)
@@ -0,0 +1,62 @@
+import threading
+from pymailtm import messages
+from pymailtm.pool import AccountPool
+
+
+def make_pool(client, size: int = 2) -> AccountPool:
+    return AccountPool(size=size, workers=1, rate=None, client=client)
+
+
+def test_lease_and_give_back(fake, client):
+    with make_pool(client) as pool:
+        with pool.leased(timeout=5) as account:
+            fake.deliver(account.account.address, count=2)
+            assert account.token.token
+        assert fake.messages[account.account.id] == []
+        stats = pool.stats()
+        assert (stats.leased, stats.retired) == (0, 0)
+        assert stats.waits.count == 1
+
+
+def test_retire_deletes_the_account(fake, client):
+    with make_pool(client) as pool:
+        account = pool.lease(timeout=5)
+        assert pool.retire(account)
+        assert account.account.id not in fake.accounts
+        assert not pool.retire(account)
+        assert pool.stats().retired == 1
+
+
+def test_concurrent_give_backs_return_the_account_once(fake, client):
+    with make_pool(client, size=1) as pool:
+        account = pool.lease(timeout=5)
+        barrier = threading.Barrier(4)
+        results = []
+
+        def give_back():
+            barrier.wait()
+            results.append(pool.give_back(account))
+
+        threads = [threading.Thread(target=give_back) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(results) == [False, False, False, True]
+        assert list(pool._ready).count(account) == 1
+
+
+def test_retire_during_purge(fake, client, monkeypatch):
+    with make_pool(client) as pool:
+        account = pool.lease(timeout=5)
+        purge = messages.purge
+
+        def purge_and_retire(token, client=None):
+            report = purge(token, client=client)
+            pool.retire(account)
+            return report
+
+        monkeypatch.setattr(messages, 'purge', purge_and_retire)
+        assert not pool.give_back(account)
+        assert account not in pool._ready
+        assert pool.stats().retired == 1
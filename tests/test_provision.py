@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+import pytest
+import requests
+from pymailtm.models.errors import MailTmError
+from pymailtm.provision import Provisioner, aprovision, provision
+
+
+def test_provision_logs_every_account_in(fake, client):
+    created = list(provision(4, rate=None, client=client))
+    assert len(created) == 4
+    assert len({account.account.address for account in created}) == 4
+    assert all(account.token.token for account in created)
+    assert len(fake.accounts) == 4
+
+
+def test_failures_are_collected(fake, client):
+    provisioner = Provisioner(rate=None, retries=0, domains=['example.test', 'unknown.test'], client=client)
+    assert len(list(provisioner.run(4))) == 2
+    assert len(provisioner.failures) == 2
+
+
+def test_connection_resets_are_retried(fake, client):
+    fake.reset('POST', '/accounts', count=2)
+    provisioner = Provisioner(concurrency=2, rate=None, client=client)
+    assert len(list(provisioner.run(6))) == 6
+    assert provisioner.failures == []
+    assert fake.requests['POST', '/accounts'] == 8
+
+
+def test_connection_resets_are_collected(fake, client):
+    fake.reset('POST', '/accounts', count=2)
+    provisioner = Provisioner(concurrency=1, rate=None, retries=0, client=client)
+    assert len(list(provisioner.run(6))) == 4
+    assert len(provisioner.failures) == 2
+    assert all(isinstance(error, requests.ConnectionError) for error in provisioner.failures)
+
+
+def test_aprovision_collects_failures(fake):
+    pytest.importorskip('httpx')
+    from pymailtm.aio import AsyncMailTm
+
+    async def main():
+        failures = []
+        async with AsyncMailTm(base_url=fake.url) as client:
+            created = [
+                account async for account in aprovision(
+                    client, 4, rate=None, retries=0, domains=['example.test', 'unknown.test'], failures=failures
+                )
+            ]
+        return created, failures
+
+    created, failures = asyncio.run(main())
+    assert len(created) == 2
+    assert len(failures) == 2
+    assert all(isinstance(error, MailTmError) for error in failures)
+
+
+def test_closing_aprovision_cancels_the_rest(fake):
+    pytest.importorskip('httpx')
+    from pymailtm.aio import AsyncMailTm
+
+    async def main():
+        async with AsyncMailTm(base_url=fake.url) as client:
+            async with contextlib.aclosing(aprovision(client, 20, concurrency=1, rate=None)) as accounts:
+                async for _ in accounts:
+                    break
+            created = len(fake.accounts)
+            await asyncio.sleep(0.2)
+            return created, len(fake.accounts)
+
+    created, later = asyncio.run(main())
+    assert created == later < 20
+
+
+def test_aprovision_retries_connection_resets(fake):
+    httpx = pytest.importorskip('httpx')
+    from pymailtm.aio import AsyncMailTm
+
+    async def main(retries):
+        failures = []
+        async with AsyncMailTm(base_url=fake.url) as client:
+            created = [
+                account async for account in aprovision(client, 3, rate=None, retries=retries, failures=failures)
+            ]
+        return len(created), failures
+
+    fake.reset('POST', '/accounts')
+    assert asyncio.run(main(3)) == (3, [])
+    fake.reset('POST', '/accounts')
+    created, failures = asyncio.run(main(0))
+    assert created == 2
+    assert len(failures) == 1
+    assert isinstance(failures[0], httpx.TransportError)
@@ -0,0 +1,79 @@
+import sqlite3
+import pytest
+from pymailtm import messages, search
+from pymailtm.mirror import InboxMirror
+from pymailtm.search import SearchIndex
+from tests.conftest import ADDRESS
+
+
+def listed(fake, client, token, **deliveries):
+    for subject, text in deliveries.items():
+        fake.deliver(ADDRESS, subject=subject, text=text)
+    return {message.subject: message for message in messages.getall(1, token, client=client).member}
+
+
+@pytest.fixture
+def inbox(fake, client, token):
+    return listed(
+        fake, client, token,
+        Verification='Please confirm your address.',
+        Newsletter='This week: verification flows explained in depth.',
+        Invoice='Your invoice is attached.'
+    )
+
+
+@pytest.fixture(params=['fts5', 'fallback'])
+def index(request, monkeypatch):
+    if request.param == 'fallback':
+        # what a SQLite build without contentless_delete fails with
+        monkeypatch.setattr(search, 'SCHEMA', 'CREATE VIRTUAL TABLE search_index USING no_such_module(body);')
+    index = SearchIndex()
+    yield index
+    index.db.close()
+
+
+def test_prefix_search(index, inbox):
+    index.add_many((message, message.intro) for message in inbox.values())
+    assert {hit.message_id for hit in index.search('verif')} == {inbox['Verification'].id, inbox['Newsletter'].id}
+    assert index.search('verif', prefix=False) == []
+    assert [hit.message_id for hit in index.search('invoice attached')] == [inbox['Invoice'].id]
+
+
+def test_subject_matches_rank_first(index, inbox):
+    index.add_many((message, message.intro) for message in inbox.values())
+    hits = index.search('verification')
+    assert [hit.message_id for hit in hits] == [inbox['Verification'].id, inbox['Newsletter'].id]
+    assert hits[0].score < hits[1].score
+
+
+def test_replace_and_remove(index, inbox):
+    message = inbox['Invoice']
+    index.add(message, 'first body')
+    index.add(message, 'second body')
+    assert len(index) == 1
+    assert index.search('first') == []
+    assert index.search('second')[0].account_id == message.account_id
+    index.remove(message.id)
+    assert len(index) == 0
+    assert index.search('second') == []
+
+
+def test_fallback_schema_keeps_the_text(monkeypatch):
+    monkeypatch.setattr(search, 'SCHEMA', 'CREATE VIRTUAL TABLE search_index USING no_such_module(body);')
+    index = SearchIndex()
+    sql = index.db.execute("SELECT sql FROM sqlite_master WHERE name = 'search_index'").fetchone()[0]
+    assert 'contentless_delete' not in sql and 'fts5' in sql
+
+
+def test_shared_connection_joins_the_owner_transaction(fake, client, token, inbox):
+    with InboxMirror(client=client) as mirror:
+        mirror.index = SearchIndex(mirror.db, lock=mirror.lock)
+        mirror.sync(token)
+        message = inbox['Invoice']
+        with pytest.raises(sqlite3.IntegrityError):
+            with mirror.lock, mirror.db:
+                mirror.db.execute('DELETE FROM messages WHERE id = ?', (message.id,))
+                mirror.index.remove(message.id)
+                mirror.db.execute('INSERT INTO messages (id) VALUES (NULL)')
+        assert mirror.get(message.id) is not None
+        assert [hit.message_id for hit in mirror.index.search('invoice')] == [message.id]
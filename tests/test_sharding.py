@@ -0,0 +1,52 @@
+import time
+from pymailtm.sharding import ShardedRunner, shard_for
+from tests.test_stream import wait_for
+
+ADDRESSES = [f'user{i}@example.test' for i in range(6)]
+MONITOR = {'min_interval': 0.05, 'max_interval': 0.2, 'backlog': True}
+
+
+def test_removing_a_shard_only_moves_its_keys():
+    owners = {key: shard_for(key, [0, 1, 2]) for key in ADDRESSES * 5}
+    assert owners == {key: shard_for(key, [2, 1, 0]) for key in owners}
+    assert set(owners.values()) == {0, 1, 2}
+    for key, owner in owners.items():
+        if owner != 1:
+            assert shard_for(key, [0, 2]) == owner
+    assert shard_for('anything', []) is None
+
+
+def collect(runner, subjects: set, timeout: float = 10) -> dict:
+    """Reads events until one of every subject arrived, replays and errors are skipped"""
+    deadline = time.monotonic() + timeout
+    events = {}
+    while not subjects <= events.keys():
+        shard, event = runner.get(timeout=max(deadline - time.monotonic(), 0.01))
+        if event.message is not None:
+            events.setdefault(event.message.subject, (shard, event.address))
+    return events
+
+
+def test_events_come_from_the_owners_and_move_when_a_worker_dies(fake):
+    for address in ADDRESSES:
+        fake.create_account(address, 'password')
+    runner = ShardedRunner(2, restart=False, client_options={'base_url': fake.url}, monitor_options=MONITOR, stats_interval=0.2)
+    with runner:
+        runner.add_many((address, 'password') for address in ADDRESSES)
+        owners = {address: owner for owner, addresses in runner.shards().items() for address in addresses}
+        assert owners == {address: shard_for(address, [0, 1]) for address in ADDRESSES}
+
+        for address in ADDRESSES:
+            fake.deliver(address, subject=address)
+        events = collect(runner, set(ADDRESSES))
+        assert {subject: events[subject] for subject in ADDRESSES} == {
+            address: (owners[address], address) for address in ADDRESSES
+        }
+
+        moved = next(address for address in ADDRESSES if owners[address] == 0)
+        runner._workers[0].kill()
+        wait_for(lambda: list(runner.shards()) == [1], timeout=10)
+        assert sorted(runner.shards()[1]) == sorted(ADDRESSES)
+        fake.deliver(moved, subject='After the failover')
+        assert collect(runner, {'After the failover'})['After the failover'] == (1, moved)
+        wait_for(lambda: 1 in runner.stats(), timeout=5)
@@ -0,0 +1,86 @@
+import time
+import asyncio
+import pytest
+import requests
+from pymailtm.stream import AsyncMessageStreamGroup, MessageStreamGroup
+from tests.conftest import ADDRESS
+
+
+def wait_for(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def subscriptions(fake) -> int:
+    return sum(count for (method, path), count in fake.requests.items() if 'mercure' in path)
+
+
+def test_group_yields_delivered_messages(fake, client, token):
+    account_id = fake.account_id(ADDRESS)
+    with MessageStreamGroup([(account_id, token)], client=client, hub_url=fake.hub_url) as group:
+        wait_for(lambda: fake.subscribers() == 1)
+        fake.deliver(ADDRESS, subject='First')
+        fake.deliver(ADDRESS, subject='Second')
+        assert [group.get(timeout=5)[1].subject for _ in range(2)] == ['First', 'Second']
+
+
+def test_resumes_after_last_event_id(fake, client, token):
+    account_id = fake.account_id(ADDRESS)
+    with MessageStreamGroup(client=client, hub_url=fake.hub_url) as group:
+        stream = group.add(account_id, token)
+        wait_for(lambda: fake.subscribers() == 1)
+        fake.deliver(ADDRESS, subject='Seen')
+        group.get(timeout=5)
+        group.remove(account_id)
+        fake.deliver(ADDRESS, subject='Missed', count=2)
+        group.add(account_id, token, last_event_id=stream.last_event_id)
+        assert [group.get(timeout=5)[1].subject for _ in range(2)] == ['Missed', 'Missed']
+
+
+def test_reconnects_after_read_timeout(fake, client, token):
+    fake.heartbeat = 30
+    account_id = fake.account_id(ADDRESS)
+    with MessageStreamGroup(
+        [(account_id, token)], client=client, hub_url=fake.hub_url, read_timeout=0.2, retry=0.01
+    ) as group:
+        wait_for(lambda: fake.subscribers() == 1)
+        fake.deliver(ADDRESS, subject='Before')
+        assert group.get(timeout=5)[1].subject == 'Before'
+        reconnected = subscriptions(fake) + 2
+        wait_for(lambda: subscriptions(fake) >= reconnected)
+        fake.deliver(ADDRESS, subject='After')
+        assert group.get(timeout=5)[1].subject == 'After'
+
+
+def test_group_raises_any_stream_error(fake, client, token):
+    with MessageStreamGroup(client=client, hub_url='http://[::1') as group:
+        group.add('broken', token)
+        with pytest.raises(requests.exceptions.InvalidURL):
+            group.get(timeout=5)
+        assert 'broken' not in group.streams
+
+
+def test_async_group_raises_any_stream_error(fake, token):
+    httpx = pytest.importorskip('httpx')
+    from pymailtm.aio import AsyncMailTm
+
+    async def main():
+        async with AsyncMailTm(base_url=fake.url) as client:
+            group = AsyncMessageStreamGroup(client, hub_url=fake.hub_url)
+            group.add(fake.account_id(ADDRESS), token)
+            group.add('broken', token, last_event_id=None)
+            group.streams['broken'].hub_url = 'http://[::1'
+            with pytest.raises(httpx.InvalidURL):
+                await asyncio.wait_for(group.get(), 5)
+            assert 'broken' not in group.streams
+
+            while fake.subscribers() == 0:
+                await asyncio.sleep(0.01)
+            fake.deliver(ADDRESS, subject='Still streaming')
+            account_id, message = await asyncio.wait_for(group.get(), 5)
+            assert message.subject == 'Still streaming'
+            group.remove(account_id)
+
+    asyncio.run(main())
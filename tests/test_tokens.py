@@ -0,0 +1,69 @@
+import os
+import stat
+import asyncio
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from pymailtm import messages
+from pymailtm.tokens import AsyncTokenManager, TokenManager
+from tests.conftest import ADDRESS, PASSWORD
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='POSIX permissions')
+def test_persisted_tokens_are_private(fake, client, tmp_path):
+    fake.create_account(ADDRESS, PASSWORD)
+    path = tmp_path / 'tokens.json'
+    (tmp_path / f'tokens.json.{os.getpid()}.tmp').write_text('{}')
+    os.chmod(tmp_path / f'tokens.json.{os.getpid()}.tmp', 0o644)
+    manager = TokenManager(client=client, path=str(path))
+    manager.get(ADDRESS, PASSWORD)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+
+def test_persisted_tokens_are_loaded(fake, client, tmp_path):
+    fake.create_account(ADDRESS, PASSWORD)
+    path = str(tmp_path / 'tokens.json')
+    token = TokenManager(client=client, path=path).get(ADDRESS, PASSWORD)
+    before = fake.requests['POST', '/token']
+    assert before == 1
+    assert TokenManager(client=client, path=path).get(ADDRESS) == token
+    assert fake.requests['POST', '/token'] == before
+
+
+def test_concurrent_refreshes_log_in_once(fake, client):
+    fake.create_account(ADDRESS, PASSWORD)
+    manager = TokenManager(client=client)
+    manager.add(ADDRESS, PASSWORD)
+    with ThreadPoolExecutor(8) as pool:
+        tokens = set(pool.map(lambda _: manager.get(ADDRESS).token, range(32)))
+    assert len(tokens) == 1
+    assert fake.requests['POST', '/token'] == 1
+
+
+def test_call_refreshes_an_expired_token(fake, client):
+    fake.create_account(ADDRESS, PASSWORD)
+    manager = TokenManager(client=client)
+    first = manager.get(ADDRESS, PASSWORD)
+    fake.expire_tokens(ADDRESS)
+    assert manager.call(ADDRESS, messages.getall, 1, client=client).total_items == 0
+    assert manager.get(ADDRESS).token != first.token
+    assert fake.requests['POST', '/token'] == 2
+
+
+def test_async_refreshes_persist_off_the_event_loop(fake, tmp_path, monkeypatch):
+    pytest.importorskip('httpx')
+    from pymailtm.aio import AsyncMailTm
+
+    fake.create_account(ADDRESS, PASSWORD)
+    path = str(tmp_path / 'tokens.json')
+    writers = []
+    persist = AsyncTokenManager._persist
+    monkeypatch.setattr(AsyncTokenManager, '_persist', lambda self: writers.append(threading.current_thread()) or persist(self))
+
+    async def run():
+        async with AsyncMailTm(base_url=fake.url) as mailtm:
+            return await AsyncTokenManager(mailtm, path=path).get(ADDRESS, PASSWORD)
+
+    token = asyncio.run(run())
+    assert writers and threading.main_thread() not in writers
+    assert TokenManager(client=None, path=path).cached(ADDRESS) == token
@@ -0,0 +1,67 @@
+import re
+import threading
+from datetime import datetime
+import pytest
+from pymailtm.wait import Backoff, wait_for_message
+from tests.conftest import ADDRESS
+
+FAST = dict(initial=0.01, maximum=0.05, jitter=0)
+
+
+def test_only_the_match_is_fetched(fake, client, token):
+    fake.deliver(ADDRESS, subject='Newsletter', count=3)
+    fake.deliver(ADDRESS, subject='Your code', sender='noreply@service.test')
+    fake.deliver(ADDRESS, subject='Another newsletter')
+    message = wait_for_message(token, subject='code', sender='service.test', timeout=1, client=client)
+    assert message.subject == 'Your code'
+    assert fake.requests['GET', '/messages/{id}'] == 1
+    assert fake.requests['GET', '/messages'] == 1
+
+
+def test_listed_message_is_returned_without_fetch(fake, client, token):
+    fake.deliver(ADDRESS, subject='Welcome')
+    message = wait_for_message(token, subject=re.compile('^wel', re.I), fetch=False, timeout=1, client=client)
+    assert message.subject == 'Welcome'
+    assert fake.requests['GET', '/messages/{id}'] == 0
+
+
+def test_predicate_filters_the_listing(fake, client, token):
+    fake.deliver(ADDRESS, subject='Code 1111')
+    fake.deliver(ADDRESS, subject='Code 2222')
+    message = wait_for_message(token, lambda message: '1111' in message.subject, timeout=1, client=client)
+    assert message.subject == 'Code 1111'
+    assert fake.requests['GET', '/messages/{id}'] == 1
+
+
+def test_older_messages_are_ignored(fake, client, token):
+    fake.deliver(ADDRESS, subject='Old code')
+    fake.messages[fake.account_id(ADDRESS)][0]['createdAt'] = '2000-01-01T00:00:00+00:00'
+    with pytest.raises(TimeoutError):
+        wait_for_message(token, subject='code', since=datetime(2020, 1, 1), timeout=0.1, backoff=Backoff(**FAST), client=client)
+    fake.deliver(ADDRESS, subject='New code')
+    message = wait_for_message(token, subject='code', since=datetime(2020, 1, 1), timeout=1, client=client)
+    assert message.subject == 'New code'
+
+
+def test_polls_until_the_message_arrives(fake, client, token):
+    timer = threading.Timer(0.2, fake.deliver, (ADDRESS,), {'subject': 'Late code'})
+    timer.start()
+    try:
+        message = wait_for_message(token, subject='code', timeout=5, backoff=Backoff(**FAST), client=client)
+    finally:
+        timer.cancel()
+    assert message.subject == 'Late code'
+    assert fake.requests['GET', '/messages'] > 2
+
+
+def test_times_out(fake, client, token):
+    fake.deliver(ADDRESS, subject='Unrelated')
+    with pytest.raises(TimeoutError):
+        wait_for_message(token, subject='code', timeout=0.1, backoff=Backoff(**FAST), client=client)
+
+
+def test_backoff_grows_and_resets():
+    backoff = Backoff(initial=1, maximum=3, factor=2, jitter=0)
+    assert [backoff.next() for _ in range(4)] == [1, 2, 3, 3]
+    backoff.reset()
+    assert backoff.next() == 1